@@ -73,6 +73,10 @@ set +a
 echo -e "${YELLOW}Running database migrations...${NC}"
 python manage.py migrate --noinput
 
+# Rebuild denormalized read models
+echo -e "${YELLOW}Rebuilding area need summaries...${NC}"
+python manage.py rebuild_need_summaries
+
 # Collect static files
 echo -e "${YELLOW}Collecting static files...${NC}"
 python manage.py collectstatic --noinput
@@ -8,9 +8,32 @@ import os
 bind = "unix:/home/django/projects/hurricaneHeroes/gunicorn.sock"
 backlog = 2048
 
+# ASGI mode (RELIEF_ASGI=True): uvicorn workers serving relief_system.asgi,
+# which switches the public read views to their async versions. One event
+# loop per worker keeps serving while slow clients trickle requests in or
+# read responses out, instead of each of them holding a whole sync worker.
+# Sync workers are faster per request when clients are well behaved, so
+# compare both with 'manage.py bench_slow_clients' before switching.
+asgi_mode = os.getenv("RELIEF_ASGI", "False") == "True"
+
+# Threaded WSGI mode (GUNICORN_THREADS > 1): gthread workers. Either mode
+# can hold the dashboards' live update streams open (relief_app/changefeed.py);
+# sync workers can't, since a stream would hold the whole worker until the
+# timeout below kills it, so dashboards don't open them there.
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+
 # Worker processes
 workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
+if asgi_mode:
+    wsgi_app = "relief_system.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+elif threads > 1:
+    wsgi_app = "relief_system.wsgi:application"
+    worker_class = "gthread"
+    raw_env = ["CHANGE_FEED_LIVE=True"]
+else:
+    wsgi_app = "relief_system.wsgi:application"
+    worker_class = "sync"
 worker_connections = 1000
 timeout = 30
 keepalive = 2
@@ -28,8 +51,8 @@ proc_name = "hurricaneHeroes"
 daemon = False
 pidfile = None
 umask = 0
-user = "django"
-group = "www-data"
+user = os.getenv("GUNICORN_USER", "django")
+group = os.getenv("GUNICORN_GROUP", "www-data")
 tmp_upload_dir = None
 
 # SSL (if using HTTPS directly with Gunicorn)
@@ -32,9 +32,9 @@ class CategoryAdmin(admin.ModelAdmin):
 # Area Admin
 @admin.register(Area)
 class AreaModelAdmin(admin.ModelAdmin):
-    list_display = ('name', 'description', 'address', 'pincode', 'created_at')
+    list_display = ('name', 'incident', 'description', 'address', 'pincode', 'created_at')
     search_fields = ('name', 'address', 'pincode')
-    list_filter = ('created_at',)
+    list_filter = ('incident', 'created_at')
 
 
 # Product Admin
@@ -60,7 +60,7 @@ class AreaAdminProfileAdmin(admin.ModelAdmin):
 class NeedAdmin(admin.ModelAdmin):
     list_display = ('product', 'area', 'quantity', 'priority', 'status', 'created_by', 'created_at')
     search_fields = ('product__name', 'area__name', 'notes')
-    list_filter = ('priority', 'status', 'created_at', 'area')
+    list_filter = ('incident', 'priority', 'status', 'created_at', 'area')
     readonly_fields = ('created_at', 'updated_at')
     autocomplete_fields = ['area', 'product', 'created_by']
     
@@ -78,26 +78,20 @@ class NeedAdmin(admin.ModelAdmin):
     
     def has_change_permission(self, request, obj=None):
         """Allow area admins to change their own area's needs"""
-        if request.user.user_type == 'super_admin':
+        profile = request.relief_profile
+        if profile.is_super_admin:
             return True
-        if request.user.user_type == 'area_admin' and obj:
-            try:
-                area_admin = AreaAdmin.objects.get(user=request.user)
-                return obj.area == area_admin.area
-            except AreaAdmin.DoesNotExist:
-                return False
+        if profile.is_area_admin and obj:
+            return profile.area is not None and obj.area_id == profile.area_id
         return True
     
     def has_delete_permission(self, request, obj=None):
         """Allow area admins to delete their own area's needs"""
-        if request.user.user_type == 'super_admin':
+        profile = request.relief_profile
+        if profile.is_super_admin:
             return True
-        if request.user.user_type == 'area_admin' and obj:
-            try:
-                area_admin = AreaAdmin.objects.get(user=request.user)
-                return obj.area == area_admin.area
-            except AreaAdmin.DoesNotExist:
-                return False
+        if profile.is_area_admin and obj:
+            return profile.area is not None and obj.area_id == profile.area_id
         return True
 
 
@@ -125,17 +119,19 @@ class ContactAdmin(admin.ModelAdmin):
 # Volunteer Admin
 @admin.register(Volunteer)
 class VolunteerAdmin(admin.ModelAdmin):
-    list_display = ('name', 'email', 'phone', 'area', 'availability', 'created_at')
+    list_display = ('name', 'email', 'phone', 'area', 'availability', 'duplicate_count', 'created_at')
     search_fields = ('name', 'email', 'phone')
     list_filter = ('area', 'availability', 'created_at')
+    raw_id_fields = ('duplicate_of',)
 
 
 # Need Request Admin
 @admin.register(NeedRequest)
 class NeedRequestAdmin(admin.ModelAdmin):
-    list_display = ('name', 'item_needed', 'quantity', 'urgency', 'area', 'status', 'created_at')
+    list_display = ('name', 'item_needed', 'quantity', 'urgency', 'area', 'status', 'duplicate_count', 'created_at')
     search_fields = ('name', 'email', 'item_needed')
     list_filter = ('status', 'urgency', 'area', 'created_at')
+    raw_id_fields = ('duplicate_of',)
 
 
 # Donation Admin
@@ -143,11 +139,21 @@ from .models import Donation
 
 @admin.register(Donation)
 class DonationAdmin(admin.ModelAdmin):
-    list_display = ('donor_name', 'item_name', 'quantity', 'area', 'created_at')
+    list_display = ('donor_name', 'item_name', 'quantity', 'product', 'allocated_quantity', 'area', 'created_at')
     search_fields = ('donor_name', 'email', 'item_name')
     list_filter = ('area', 'created_at')
 
 
+# Donation Allocation Admin
+from .models import DonationAllocation
+
+@admin.register(DonationAllocation)
+class DonationAllocationAdmin(admin.ModelAdmin):
+    list_display = ('donation', 'need', 'quantity', 'created_at')
+    list_filter = ('created_at',)
+    raw_id_fields = ('donation', 'need')
+
+
 # Article Admin
 from .models import Article
 
@@ -157,3 +163,152 @@ class ArticleAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('title',)}
     search_fields = ('title', 'content')
     list_filter = ('is_published', 'created_at')
+
+
+# Area Need Summary Admin (read-only, maintained by signals)
+from .models import AreaNeedSummary
+
+@admin.register(AreaNeedSummary)
+class AreaNeedSummaryAdmin(admin.ModelAdmin):
+    list_display = ('area', 'total_count', 'open_count', 'urgent_count', 'fulfilled_count', 'open_quantity', 'updated_at')
+    search_fields = ('area__name',)
+    readonly_fields = ('area', 'total_count', 'open_count', 'urgent_count', 'fulfilled_count',
+                       'open_quantity', 'quantity_by_category', 'updated_at')
+    
+    def has_add_permission(self, request):
+        return False
+
+
+# Inventory Ledger Admin (append-only: entries go through relief_app.ledger)
+from .models import InventoryEntry, InventoryBalance
+
+@admin.register(InventoryEntry)
+class InventoryEntryAdmin(admin.ModelAdmin):
+    list_display = ('area', 'product', 'entry_type', 'quantity', 'reference', 'created_by', 'created_at')
+    search_fields = ('area__name', 'product__name', 'reference', 'notes')
+    list_filter = ('entry_type', 'area', 'created_at')
+    autocomplete_fields = ['area', 'product']
+    fields = ('area', 'product', 'entry_type', 'quantity', 'reference', 'notes')
+    
+    def has_change_permission(self, request, obj=None):
+        return obj is None
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
+    def save_model(self, request, obj, form, change):
+        from .ledger import record_entry
+        entry = record_entry(obj.area_id, obj.product_id, obj.entry_type, obj.quantity,
+                             reference=obj.reference, notes=obj.notes, user=request.user,
+                             allow_negative=True)
+        obj.pk = entry.pk
+
+
+@admin.register(InventoryBalance)
+class InventoryBalanceAdmin(admin.ModelAdmin):
+    list_display = ('area', 'product', 'balance', 'entry_count', 'updated_at')
+    search_fields = ('area__name', 'product__name')
+    list_filter = ('area',)
+    readonly_fields = ('area', 'product', 'balance', 'entry_count', 'updated_at')
+    
+    def has_add_permission(self, request):
+        return False
+
+
+# Change Feed Admin (append-only: events are written by relief_app.changefeed)
+from .models import ChangeEvent
+
+
+@admin.register(ChangeEvent)
+class ChangeEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'action', 'object_id', 'area_id', 'incident_id', 'created_at')
+    list_filter = ('kind', 'action')
+    search_fields = ('object_id',)
+    readonly_fields = ('kind', 'action', 'object_id', 'area_id', 'incident_id', 'data', 'created_at')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# Delta sync tombstones
+from .models import Tombstone
+
+
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'object_id', 'area_id', 'reason', 'deleted_at')
+    list_filter = ('kind', 'reason')
+    search_fields = ('object_id',)
+    readonly_fields = ('kind', 'object_id', 'area_id', 'reason', 'deleted_at')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# Trend rollups
+from .models import Rollup
+
+
+@admin.register(Rollup)
+class RollupAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'period', 'start', 'area', 'category', 'priority', 'count', 'quantity')
+    list_filter = ('kind', 'period', 'priority')
+    date_hierarchy = 'start'
+    readonly_fields = ('kind', 'period', 'start', 'area', 'category', 'priority', 'count', 'quantity')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# Archived needs (moved out of Need by 'manage.py archive_needs')
+from .models import ArchivedNeed
+
+
+@admin.register(ArchivedNeed)
+class ArchivedNeedAdmin(admin.ModelAdmin):
+    list_display = ('id', 'product', 'area', 'quantity', 'priority', 'status', 'created_at', 'archived_at')
+    list_filter = ('incident', 'status', 'priority', 'area', 'product__category')
+    search_fields = ('=id', 'product__name', 'area__name', 'notes')
+    date_hierarchy = 'created_at'
+    list_select_related = ('product', 'area')
+    readonly_fields = ('id', 'area', 'incident', 'product', 'quantity', 'notes', 'priority', 'status', 'created_by',
+                       'created_at', 'updated_at', 'allocations', 'archived_at')
+    actions = ['restore']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        # Trend rollups still count archived needs
+        return False
+    
+    @admin.action(description='Restore selected needs')
+    def restore(self, request, queryset):
+        from .archive import restore_needs
+        restored = restore_needs(queryset.values_list('id', flat=True))
+        self.message_user(request, f'{restored} needs restored.')
+
+
+# Incidents (areas and what is recorded at them belong to one, see relief_app/incidents.py)
+from .models import Incident
+
+
+@admin.register(Incident)
+class IncidentAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'is_active', 'started_at', 'ended_at')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'slug')
+    prepopulated_fields = {'slug': ('name',)}
+    date_hierarchy = 'started_at'
@@ -0,0 +1,200 @@
+"""
+Regional allocation optimizer
+
+Suggests transfers of surplus stock between nearby shelters. A shelter
+has a surplus of a product when donations for it exceed what was
+allocated to its own needs; it has a deficit when open needs for the
+product are still not covered.
+
+For each product the optimizer links every deficit shelter to its k
+nearest surplus shelters (NumPy haversine distances computed in chunks,
+kept as a sparse edge list) and then fills deficits greedily along the
+cheapest edges, where cost is distance divided by the need's priority
+weight so urgent needs are served first.
+"""
+from collections import defaultdict
+
+import numpy as np
+from django.db.models import F, Sum
+
+from .models import Area, Donation, DonationAllocation, Need, Product
+
+EARTH_RADIUS_KM = 6371.0
+PRIORITY_WEIGHT = {'urgent': 8.0, 'high': 4.0, 'medium': 2.0, 'low': 1.0}
+OPEN_STATUSES = ('pending', 'in_progress')
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Pairwise great-circle distances; inputs broadcast like NumPy arrays"""
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest_edges(src_coords, dst_coords, k=5, max_distance_km=None, chunk_size=2048):
+    """
+    Sparse k-nearest-source edge list for every destination.
+
+    Returns (src_index, dst_index, distance_km) arrays. Distances are
+    computed one chunk of destinations at a time so memory stays at
+    chunk_size x len(src) floats however many shelters there are.
+    """
+    src_coords = np.asarray(src_coords, dtype=np.float64).reshape(-1, 2)
+    dst_coords = np.asarray(dst_coords, dtype=np.float64).reshape(-1, 2)
+    n_src = len(src_coords)
+    k = min(k, n_src)
+    if not n_src or not len(dst_coords) or k == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0)
+
+    src_parts, dst_parts, dist_parts = [], [], []
+    for start in range(0, len(dst_coords), chunk_size):
+        chunk = dst_coords[start:start + chunk_size]
+        dist = haversine_km(chunk[:, None, 0], chunk[:, None, 1], src_coords[None, :, 0], src_coords[None, :, 1])
+        if k < n_src:
+            nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        else:
+            nearest = np.broadcast_to(np.arange(n_src), (len(chunk), n_src))
+        rows = np.repeat(np.arange(len(chunk)), k)
+        cols = nearest.reshape(-1)
+        src_parts.append(cols)
+        dst_parts.append(rows + start)
+        dist_parts.append(dist[rows, cols])
+
+    src = np.concatenate(src_parts)
+    dst = np.concatenate(dst_parts)
+    dist = np.concatenate(dist_parts)
+    if max_distance_km is not None:
+        keep = dist <= max_distance_km
+        src, dst, dist = src[keep], dst[keep], dist[keep]
+    return src, dst, dist
+
+
+def greedy_transfers(supply, demand, weight, src, dst, dist):
+    """
+    Fill demand from supply along the given edges, cheapest first.
+
+    supply/demand/weight are per-node arrays; src/dst/dist describe the
+    candidate edges. Returns a list of (src_index, dst_index, quantity).
+    """
+    supply = np.array(supply, dtype=np.int64)
+    demand = np.array(demand, dtype=np.int64)
+    cost = dist / np.asarray(weight, dtype=np.float64)[dst]
+    order = np.lexsort((dist, cost))
+
+    transfers = []
+    for s, d in zip(src[order].tolist(), dst[order].tolist()):
+        if supply[s] <= 0 or demand[d] <= 0:
+            continue
+        qty = int(min(supply[s], demand[d]))
+        supply[s] -= qty
+        demand[d] -= qty
+        transfers.append((s, d, qty))
+    return transfers
+
+
+def _surplus_by_area_product():
+    """Unallocated donated quantity per (area, product)"""
+    rows = (
+        Donation.objects.filter(product__isnull=False, quantity__gt=F('allocated_quantity'))
+        .values('area_id', 'product_id')
+        .annotate(total=Sum(F('quantity') - F('allocated_quantity')))
+        .order_by()
+    )
+    return {(r['area_id'], r['product_id']): r['total'] for r in rows}
+
+
+def _deficit_by_area_product():
+    """Uncovered open need quantity and best priority per (area, product)"""
+    allocated = dict(
+        DonationAllocation.objects.filter(need__status__in=OPEN_STATUSES)
+        .values('need_id').annotate(total=Sum('quantity')).order_by()
+        .values_list('need_id', 'total')
+    )
+    deficit = defaultdict(int)
+    weight = defaultdict(float)
+    needs = Need.objects.filter(status__in=OPEN_STATUSES).values_list(
+        'id', 'area_id', 'product_id', 'quantity', 'priority'
+    )
+    for need_id, area_id, product_id, quantity, priority in needs:
+        remaining = quantity - allocated.get(need_id, 0)
+        if remaining <= 0:
+            continue
+        key = (area_id, product_id)
+        deficit[key] += remaining
+        weight[key] = max(weight[key], PRIORITY_WEIGHT.get(priority, 1.0))
+    return deficit, weight
+
+
+def suggest_transfers(k=5, max_distance_km=None, min_quantity=1):
+    """
+    Compute suggested surplus transfers across all shelters and products.
+
+    Returns a list of dicts sorted by product then distance.
+    """
+    surplus = _surplus_by_area_product()
+    deficit, weight = _deficit_by_area_product()
+
+    # A shelter only has spare stock after covering its own needs
+    for key in list(surplus):
+        own = min(surplus[key], deficit.get(key, 0))
+        surplus[key] -= own
+        if own:
+            deficit[key] -= own
+
+    coords = {
+        area_id: (lat, lng)
+        for area_id, name, lat, lng in Area.objects.filter(
+            latitude__isnull=False, longitude__isnull=False
+        ).values_list('id', 'name', 'latitude', 'longitude')
+    }
+    area_names = dict(Area.objects.values_list('id', 'name'))
+    products = {pid: (name, unit) for pid, name, unit in Product.objects.values_list('id', 'name', 'unit')}
+
+    sources = defaultdict(list)
+    sinks = defaultdict(list)
+    for (area_id, product_id), qty in surplus.items():
+        if qty > 0 and area_id in coords:
+            sources[product_id].append((area_id, qty))
+    for (area_id, product_id), qty in deficit.items():
+        if qty > 0 and area_id in coords:
+            sinks[product_id].append((area_id, qty, weight[(area_id, product_id)]))
+
+    suggestions = []
+    for product_id in sorted(set(sources) & set(sinks)):
+        src_nodes = sources[product_id]
+        dst_nodes = sinks[product_id]
+        src, dst, dist = nearest_edges(
+            [coords[a] for a, _ in src_nodes],
+            [coords[a] for a, _, _ in dst_nodes],
+            k=k,
+            max_distance_km=max_distance_km,
+        )
+        transfers = greedy_transfers(
+            [q for _, q in src_nodes],
+            [q for _, q, _ in dst_nodes],
+            [w for _, _, w in dst_nodes],
+            src, dst, dist,
+        )
+        edge_distance = {(s, d): km for s, d, km in zip(src.tolist(), dst.tolist(), dist.tolist())}
+        product_name, unit = products.get(product_id, ('', ''))
+        for s, d, qty in transfers:
+            if qty < min_quantity:
+                continue
+            from_area, to_area = src_nodes[s][0], dst_nodes[d][0]
+            suggestions.append({
+                'product_id': product_id,
+                'product': product_name,
+                'unit': unit,
+                'from_area_id': from_area,
+                'from_area': area_names.get(from_area, ''),
+                'to_area_id': to_area,
+                'to_area': area_names.get(to_area, ''),
+                'quantity': qty,
+                'distance_km': round(edge_distance[(s, d)], 1),
+                'priority_weight': dst_nodes[d][2],
+            })
+
+    suggestions.sort(key=lambda t: (t['product'], t['distance_km']))
+    return suggestions
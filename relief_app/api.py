@@ -0,0 +1,277 @@
+"""
+Read-only JSON API for partner organizations
+
+    GET /api/v1/<resource>/            list, oldest first
+    GET /api/v1/<resource>/<id>/       one object
+
+Resources are areas, needs, products and categories (RESOURCES below).
+Query parameters on lists:
+
+    fields=id,name,...   only these fields (default: all of the resource's fields)
+    limit=N              page size, API_PAGE_SIZE by default, at most API_MAX_PAGE_SIZE
+    cursor=...           the page after the one that returned it as "next"
+    <filter>=a,b         the resource's filters, e.g. needs?area=3&status=pending,in_progress
+
+A list returns {"data": [...], "next": <url of the next page or null>}
+and an object {"data": {...}}. Errors are {"error": "..."} with a 400 or
+404 status.
+
+Rows come from values_list() with the related names joined in the same
+query, so no model instances are built, and are encoded by a Schema
+compiled once per resource and fieldset (relief_app/serializers.py). Pages are cut by id (cursor = the last
+id sent), so a page costs the same however deep into the list it is, and
+rows added meanwhile don't shift later pages.
+
+Every response has an ETag. A list's is computed before its page is
+read, from the count and the newest updated_at of the page's rows and of
+the rows they join to, so a partner polling with If-None-Match gets a
+304 for the price of the page's id lookup and one aggregate query. Any
+change that can alter the page changes one of those: edits and new rows
+move an updated_at, deletes and rows leaving the filter change the count.
+"""
+import base64
+import binascii
+import hashlib
+import json
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import HttpResponse, JsonResponse
+
+from .models import Area, Category, Need, Product
+from .serializers import Schema, dumps_object, json_response
+
+VERSION = 'v1'
+CACHE_CONTROL = 'public, max-age=30'
+
+
+class Resource:
+    """
+    One API resource: fields maps the public field names to values()
+    lookups, filters maps query parameters to (lookup, type), where type
+    is int or a list of the allowed values.
+    """
+
+    def __init__(self, model, fields, filters=None):
+        self.model = model
+        self.fields = fields
+        self.filters = filters or {}
+        self._schemas = {}
+
+    def lookups(self, fields):
+        return [self.fields[name] for name in fields]
+
+    def schema(self, fields):
+        """The compiled Schema for a fieldset, built on first use"""
+        key = tuple(fields)
+        if key not in self._schemas:
+            self._schemas[key] = Schema.for_model(self.model, self.lookups(fields), names=fields)
+        return self._schemas[key]
+
+    def joins(self, fields):
+        """Related paths the fields read through, e.g. product__category for product__category__name"""
+        paths = set()
+        for name in fields:
+            parts = self.fields[name].split('__')[:-1]
+            for i in range(1, len(parts) + 1):
+                paths.add('__'.join(parts[:i]))
+        return sorted(paths)
+
+
+RESOURCES = {
+    'categories': Resource(Category, {
+        'id': 'id',
+        'name': 'name',
+        'description': 'description',
+        'updated_at': 'updated_at',
+    }),
+    'products': Resource(Product, {
+        'id': 'id',
+        'name': 'name',
+        'description': 'description',
+        'unit': 'unit',
+        'category': 'category_id',
+        'category_name': 'category__name',
+        'updated_at': 'updated_at',
+    }, filters={
+        'category': ('category_id', int),
+    }),
+    'areas': Resource(Area, {
+        'id': 'id',
+        'incident': 'incident_id',
+        'name': 'name',
+        'description': 'description',
+        'address': 'address',
+        'pincode': 'pincode',
+        'latitude': 'latitude',
+        'longitude': 'longitude',
+        # From AreaNeedSummary, null until the area's first need
+        'total_needs': 'need_summary__total_count',
+        'open_needs': 'need_summary__open_count',
+        'urgent_needs': 'need_summary__urgent_count',
+        'updated_at': 'updated_at',
+    }, filters={
+        'incident': ('incident_id', int),
+        'pincode': ('pincode', str),
+    }),
+    'needs': Resource(Need, {
+        'id': 'id',
+        'incident': 'incident_id',
+        'area': 'area_id',
+        'area_name': 'area__name',
+        'product': 'product_id',
+        'product_name': 'product__name',
+        'unit': 'product__unit',
+        'category': 'product__category_id',
+        'category_name': 'product__category__name',
+        'quantity': 'quantity',
+        'priority': 'priority',
+        'status': 'status',
+        'notes': 'notes',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    }, filters={
+        'incident': ('incident_id', int),
+        'area': ('area_id', int),
+        'product': ('product_id', int),
+        'category': ('product__category_id', int),
+        'priority': ('priority', [value for value, _ in Need.PRIORITY_CHOICES]),
+        'status': ('status', [value for value, _ in Need.STATUS_CHOICES]),
+    }),
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _fields(resource, params):
+    requested = params.get('fields')
+    if not requested:
+        return list(resource.fields)
+    fields = [f for f in requested.split(',') if f]
+    unknown = [f for f in fields if f not in resource.fields]
+    if unknown:
+        raise BadRequest(f'Unknown field: {unknown[0]}')
+    return fields
+
+
+def _filter(resource, queryset, params):
+    for param, (lookup, kind) in resource.filters.items():
+        value = params.get(param)
+        if not value:
+            continue
+        values = value.split(',')
+        if kind is int:
+            try:
+                values = [int(v) for v in values]
+            except ValueError:
+                raise BadRequest(f'Invalid {param}')
+        elif isinstance(kind, list) and not set(values) <= set(kind):
+            raise BadRequest(f'Invalid {param}, expected one of {", ".join(kind)}')
+        queryset = queryset.filter(**{f'{lookup}__in': values})
+    return queryset
+
+
+def _limit(params):
+    default = getattr(settings, 'API_PAGE_SIZE', 100)
+    try:
+        limit = int(params.get('limit', default))
+    except ValueError:
+        raise BadRequest('Invalid limit')
+    return max(1, min(limit, getattr(settings, 'API_MAX_PAGE_SIZE', 1000)))
+
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(json.dumps({'i': last_id}).encode()).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return 0
+    try:
+        last_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))['i']
+    except (ValueError, binascii.Error, KeyError, TypeError):
+        raise BadRequest('Invalid cursor')
+    if not isinstance(last_id, int):
+        raise BadRequest('Invalid cursor')
+    return last_id
+
+
+def _etag(*parts):
+    return 'W/"%s"' % hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+
+
+def _not_modified(request, etag):
+    return etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]
+
+
+def _respond(request, body, etag):
+    if _not_modified(request, etag):
+        response = HttpResponse(status=304)
+    else:
+        response = json_response(body)
+    response['ETag'] = etag
+    response['Cache-Control'] = CACHE_CONTROL
+    return response
+
+
+def _next_url(request, last_id):
+    params = request.GET.copy()
+    params['cursor'] = encode_cursor(last_id)
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+def list_response(request, name):
+    resource = RESOURCES.get(name)
+    if resource is None:
+        return _error('Unknown resource', status=404)
+    try:
+        fields = _fields(resource, request.GET)
+        queryset = _filter(resource, resource.model.objects.all(), request.GET)
+        limit = _limit(request.GET)
+        after = decode_cursor(request.GET.get('cursor'))
+    except BadRequest as e:
+        return _error(str(e))
+
+    queryset = queryset.filter(id__gt=after).order_by('id')
+    # One row past the page tells whether there is a next page
+    ids = list(queryset.values_list('id', flat=True)[:limit + 1])
+    more = len(ids) > limit
+    ids = ids[:limit]
+    # The last page stays open-ended, so new rows at the end change its ETag
+    page = queryset.filter(id__lte=ids[-1]) if more else queryset
+    stamp = page.aggregate(
+        count=Count('id'), updated=Max('updated_at'),
+        **{f'updated_{i}': Max(f'{path}__updated_at') for i, path in enumerate(resource.joins(fields))},
+    )
+    etag = _etag(VERSION, name, sorted(request.GET.lists()), stamp)
+    if _not_modified(request, etag):
+        return _respond(request, None, etag)
+
+    rows = page.values_list(*resource.lookups(fields))
+    return _respond(request, dumps_object({
+        'data': resource.schema(fields).encode_rows(rows),
+        'next': _next_url(request, ids[-1]) if more else None,
+    }), etag)
+
+
+def detail_response(request, name, object_id):
+    resource = RESOURCES.get(name)
+    if resource is None:
+        return _error('Unknown resource', status=404)
+    try:
+        fields = _fields(resource, request.GET)
+    except BadRequest as e:
+        return _error(str(e))
+
+    row = resource.model.objects.filter(id=object_id).values_list(*resource.lookups(fields)).first()
+    if row is None:
+        return _error('Not found', status=404)
+    body = dumps_object({'data': resource.schema(fields).encode_row(row)})
+    # One query either way, so the ETag is just the content's
+    return _respond(request, body, _etag(VERSION, name, body.decode()))
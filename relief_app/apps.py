@@ -5,4 +5,5 @@ class ReliefAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'relief_app'
 
-
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,142 @@
+"""
+Archival of closed needs
+
+Fulfilled and cancelled needs that haven't changed for
+NEED_ARCHIVE_AFTER_DAYS are moved from Need to ArchivedNeed, a table
+with the same columns and ids, in batches of NEED_ARCHIVE_BATCH_SIZE.
+Every listing, the status filters and the summaries then only ever read
+live needs, however many seasons of history pile up. Run
+'manage.py archive_needs' nightly.
+
+A need's donation allocations are folded into its archived row (they
+only matter to the matching engine while a need is open). Needs are
+removed with a plain DELETE, not through the ORM, so archiving doesn't
+look like a wave of deletions:
+
+- The change feed gets no events.
+- Need trend rollups count archived needs too (relief_app/rollups.py),
+  so they don't change.
+- Summaries of the areas involved are refreshed, since they count live
+  needs only.
+- Delta sync clients get an 'archived' tombstone and drop the need.
+
+Archived needs are browsable in the admin, which can also restore them,
+and exports can include them (iter_needs()).
+"""
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import sync
+from .models import ArchivedNeed, DonationAllocation, Need
+from .summaries import refresh_area_summaries
+
+CLOSED_STATUSES = ('fulfilled', 'cancelled')
+# Columns copied both ways, by attname (area_id, product_id, ...)
+COLUMNS = [f.attname for f in Need._meta.concrete_fields]
+AREA = COLUMNS.index('area_id')
+
+
+def archivable(days=None):
+    """Needs closed and unchanged for the last `days` days"""
+    days = getattr(settings, 'NEED_ARCHIVE_AFTER_DAYS', 90) if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    return Need.objects.filter(status__in=CLOSED_STATUSES, updated_at__lt=cutoff)
+
+
+def _delete(model, ids):
+    """DELETE by id without the ORM's collector and signals"""
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {qn(model._meta.db_table)} WHERE id IN ({", ".join(["%s"] * len(ids))})', ids,
+        )
+
+
+def _archive_batch(ids, days):
+    with transaction.atomic():
+        # Checked again inside the transaction: one may have been reopened since
+        rows = list(archivable(days).filter(id__in=ids).values_list(*COLUMNS))
+        if not rows:
+            return 0
+        ids = [row[0] for row in rows]
+        allocations = {}
+        for need_id, donation_id, quantity, created_at in DonationAllocation.objects.filter(
+                need_id__in=ids).values_list('need_id', 'donation_id', 'quantity', 'created_at'):
+            allocations.setdefault(need_id, []).append([donation_id, quantity, created_at.isoformat()])
+
+        ArchivedNeed.objects.bulk_create([
+            ArchivedNeed(allocations=allocations.get(row[0], []), **dict(zip(COLUMNS, row))) for row in rows
+        ])
+        DonationAllocation.objects.filter(need_id__in=ids).delete()
+        _delete(Need, ids)
+        moves = [(row[0], row[AREA]) for row in rows]
+        sync.record_moves(moves, reason='archived')
+        refresh_area_summaries({area_id for _, area_id in moves})
+    return len(rows)
+
+
+def archive_needs(days=None, batch_size=None, log=None):
+    """Move every archivable need to ArchivedNeed, a batch per transaction; returns how many moved"""
+    batch_size = batch_size or getattr(settings, 'NEED_ARCHIVE_BATCH_SIZE', 1000)
+    moved = 0
+    last_id = 0
+    while True:
+        ids = list(archivable(days).filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return moved
+        moved += _archive_batch(ids, days)
+        last_id = ids[-1]
+        if log:
+            log(f'{moved:,} needs archived')
+
+
+def restore_needs(ids):
+    """Move archived needs back into Need, with their allocations; returns how many moved"""
+    with transaction.atomic():
+        archived = list(ArchivedNeed.objects.filter(id__in=list(ids)))
+        if not archived:
+            return 0
+        needs = Need.objects.bulk_create([
+            Need(**{column: getattr(a, column) for column in COLUMNS}) for a in archived
+        ])
+        allocations = DonationAllocation.objects.bulk_create([
+            DonationAllocation(need_id=a.id, donation_id=donation_id, quantity=quantity)
+            for a in archived for donation_id, quantity, _ in a.allocations
+        ])
+        # bulk_create stamps auto_now_add fields with now; rollups bucket by
+        # created_at, so put the original ones back. updated_at stays fresh,
+        # which is what makes delta sync clients fetch the need again.
+        for need, a in zip(needs, archived):
+            need.created_at = a.created_at
+        Need.objects.bulk_update(needs, ['created_at'], batch_size=500)
+        allocated = iter([parse_datetime(at) for a in archived for _, _, at in a.allocations])
+        for allocation in allocations:
+            allocation.created_at = next(allocated)
+        DonationAllocation.objects.bulk_update(allocations, ['created_at'], batch_size=500)
+        _delete(ArchivedNeed, [a.id for a in archived])
+        refresh_area_summaries({a.area_id for a in archived})
+    return len(archived)
+
+
+def iter_needs(scope='active', incident_ids=None):
+    """
+    Needs for exports, newest first: 'active' (the Need table), 'archived'
+    or 'all' (both, merged by created_at), of the given incidents or all.
+    Rows are Need or ArchivedNeed instances with area, product and
+    category loaded.
+    """
+    models = {'active': [Need], 'archived': [ArchivedNeed], 'all': [Need, ArchivedNeed]}[scope]
+    querysets = [
+        model.objects.for_incident(incident_ids).select_related('product', 'area', 'product__category')
+        .order_by('-created_at')
+        for model in models
+    ]
+    if len(querysets) == 1:
+        return iter(querysets[0].iterator(chunk_size=2000))
+    return heapq.merge(*(qs.iterator(chunk_size=2000) for qs in querysets),
+                       key=lambda need: need.created_at, reverse=True)
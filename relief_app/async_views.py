@@ -0,0 +1,150 @@
+"""
+Async versions of the read-heavy public views, for ASGI mode
+
+Served instead of their views.py twins when ASYNC_PUBLIC_VIEWS is on
+(relief_system/asgi.py turns it on). They render the same templates with
+the same context, but query through the async ORM, so a worker's event
+loop keeps serving other connections while one waits on the database or
+on a slow client.
+
+Templates run in the event loop, where lazy database access is not
+allowed: every queryset is fetched into a list before rendering and the
+user is resolved up front (see arender).
+"""
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.shortcuts import aget_object_or_404, render
+
+from . import incidents
+from .caching import stale_while_revalidate
+from .models import Area, AreaAdmin, Article, Category, Donation, Need, Product, Volunteer
+from .views import SHELTER_LOOKUPS, map_shelters, public_needs_query
+
+
+async def arender(request, template_name, context):
+    """render() for async views: resolve request.user first so templates don't hit the DB"""
+    request.user = await request.auser()
+    return render(request, template_name, context)
+
+
+async def aget_statistics(incident_ids=None):
+    """views.get_statistics() through the async ORM"""
+    area_admins = AreaAdmin.objects.filter(is_active=True)
+    if incident_ids is not None:
+        area_admins = area_admins.filter(area__incident_id__in=incident_ids)
+    return {
+        'total_areas': await Area.objects.for_incident(incident_ids).acount(),
+        'total_needs': await Need.objects.for_incident(incident_ids).acount(),
+        'total_products': await Product.objects.acount(),
+        'total_area_admins': await area_admins.acount(),
+        'total_volunteers': await Volunteer.objects.for_incident(incident_ids).acount(),
+        'total_donations': await Donation.objects.for_incident(incident_ids).acount(),
+    }
+
+
+@stale_while_revalidate()
+async def public_home(request):
+    """Home page for public users with filtering and sorting"""
+    scope = await incidents.ascope(request)
+    stats = await aget_statistics(scope)
+    needs_query, filters = public_needs_query(request.GET, scope)
+
+    recent_needs = [
+        {
+            'need': need,
+            'product': need.product,
+            'category': need.product.category if need.product else None,
+            'area': need.area,
+        }
+        async for need in needs_query[:50]
+    ]
+
+    context = {
+        'stats': stats,
+        'recent_needs': recent_needs,
+        'all_areas': [area async for area in Area.objects.for_incident(scope).order_by('name')],
+        'all_categories': [category async for category in Category.objects.all().order_by('name')],
+        **filters,
+    }
+    return await arender(request, 'public/home.html', context)
+
+
+@stale_while_revalidate()
+async def public_areas(request):
+    """List all areas for public view"""
+    areas = Area.objects.for_incident(await incidents.ascope(request)).annotate(
+        needs_count=Coalesce('need_summary__total_count', 0)
+    ).order_by('name')
+    context = {
+        'areas': [area async for area in areas],
+    }
+    return await arender(request, 'public/areas.html', context)
+
+
+@stale_while_revalidate()
+async def shelter_map(request):
+    """Interactive map showing all shelter locations"""
+    areas = Area.objects.for_incident(await incidents.ascope(request)).annotate(
+        needs_count=Coalesce('need_summary__total_count', 0))
+    shelters, total_shelters = map_shelters([row async for row in areas.values_list(*SHELTER_LOOKUPS)])
+
+    context = {
+        'shelters': shelters,
+        'total_shelters': total_shelters,
+    }
+    return await arender(request, 'public/map.html', context)
+
+
+async def global_search(request):
+    """Search across shelters, products, and needs"""
+    query = request.GET.get('q', '').strip()
+
+    results = {
+        'areas': [],
+        'products': [],
+        'needs': [],
+    }
+
+    if query:
+        scope = await incidents.ascope(request)
+        areas = Area.objects.for_incident(scope).filter(
+            Q(name__icontains=query) |
+            Q(address__icontains=query) |
+            Q(pincode__icontains=query)
+        )[:10]
+        products = Product.objects.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(category__name__icontains=query)
+        ).select_related('category')[:10]
+        needs = Need.objects.for_incident(scope).filter(
+            Q(product__name__icontains=query) |
+            Q(area__name__icontains=query) |
+            Q(notes__icontains=query)
+        ).select_related('product', 'area')[:10]
+        results['areas'] = [area async for area in areas]
+        results['products'] = [product async for product in products]
+        results['needs'] = [need async for need in needs]
+
+    context = {
+        'query': query,
+        'results': results,
+        'total_results': len(results['areas']) + len(results['products']) + len(results['needs']),
+    }
+    return await arender(request, 'public/search.html', context)
+
+
+@stale_while_revalidate()
+async def blog_list(request):
+    """List all blog articles"""
+    articles = Article.objects.filter(is_published=True).order_by('-created_at')
+    context = {'articles': [article async for article in articles]}
+    return await arender(request, 'public/blog.html', context)
+
+
+@stale_while_revalidate()
+async def blog_detail(request, slug):
+    """View a single blog article"""
+    article = await aget_object_or_404(Article, slug=slug, is_published=True)
+    context = {'article': article}
+    return await arender(request, 'public/blog_detail.html', context)
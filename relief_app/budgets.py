@@ -0,0 +1,123 @@
+"""
+Query-count and latency budgets for every named URL in relief_app/urls.py
+
+The check_budgets command seeds a synthetic dataset into a throwaway test
+database, requests each URL below as the given user type and fails when
+a view runs more queries, or is slower at p95, than its budget allows.
+
+Budget entries:
+    user      None (anonymous), 'super_admin' or 'area_admin'
+    kwargs    URL kwargs; string values name a seeded fixture (see seed_dataset)
+    query     query string parameters
+    queries   maximum number of SQL queries for one request, after the first
+    p95_ms    maximum 95th percentile latency in milliseconds
+    iterations  timed requests, for views too slow for the default count
+    skip      reason the URL is not requested (destructive or POST-only)
+
+Every named URL must have an entry, so a new view fails the check until
+someone declares its budget. Query budgets are tight on purpose: an N+1
+regression shows up as extra queries long before it shows up as latency.
+Latency budgets are loose enough for a laptop at the default scale.
+
+A session's first request also resolves its user's role and shelter, once
+(relief_app/roles.py); it is reported as first_request_queries.
+
+Caches are off during the check, so pages showing the active incident's
+data (relief_app/incidents.py) count the query for the incident list,
+which in production is cached.
+"""
+from .models import Article, Need
+from .synthetic import generate
+
+BUDGETS = {
+    # Public
+    'public_home': {'user': None, 'queries': 10, 'p95_ms': 250},
+    'public_about': {'user': None, 'queries': 7, 'p95_ms': 50},
+    'public_services': {'user': None, 'queries': 8, 'p95_ms': 50},
+    'public_contact': {'user': None, 'queries': 1, 'p95_ms': 50},
+    'public_areas': {'user': None, 'queries': 2, 'p95_ms': 100},
+    # Lists every need of the busiest shelter
+    'public_area_detail': {'user': None, 'kwargs': {'area_id': 'area_id'}, 'queries': 3, 'p95_ms': 1000},
+    'shelter_map': {'user': None, 'queries': 2, 'p95_ms': 50},
+    'volunteer_signup': {'user': None, 'queries': 2, 'p95_ms': 100},
+    'public_need_request': {'user': None, 'queries': 2, 'p95_ms': 100},
+    'donate': {'user': None, 'queries': 4, 'p95_ms': 100},
+    'global_search': {'user': None, 'query': {'q': 'water'}, 'queries': 4, 'p95_ms': 100},
+    'faq': {'user': None, 'queries': 0, 'p95_ms': 50},
+    'weather_alerts': {'user': None, 'queries': 0, 'p95_ms': 50},
+    'blog_list': {'user': None, 'queries': 1, 'p95_ms': 100},
+    'blog_detail': {'user': None, 'kwargs': {'slug': 'article_slug'}, 'queries': 1, 'p95_ms': 50},
+
+    # Authentication
+    'login': {'user': None, 'queries': 0, 'p95_ms': 50},
+    'logout': {'skip': 'ends the session used by the other checks'},
+
+    # Area admin panel; the shelter comes with the session (relief_app/roles.py)
+    'area_admin_dashboard': {'user': 'area_admin', 'queries': 6, 'p95_ms': 1500},
+    'area_admin_needs': {'user': 'area_admin', 'queries': 5, 'p95_ms': 2000},
+    'area_admin_categories': {'user': 'area_admin', 'queries': 3, 'p95_ms': 50},
+    'area_admin_products': {'user': 'area_admin', 'queries': 4, 'p95_ms': 50},
+    'delete_need_area_admin': {'skip': 'destructive'},
+
+    # Super admin panel
+    # +1 for the change feed cursor the live updates start from
+    'super_admin_dashboard': {'user': 'super_admin', 'queries': 13, 'p95_ms': 250},
+    'super_admin_incidents': {'user': 'super_admin', 'queries': 11, 'p95_ms': 150},
+    'select_incident': {'skip': 'POST only, changes the session'},
+    'super_admin_areas': {'user': 'super_admin', 'queries': 4, 'p95_ms': 100},
+    'super_admin_area_admins': {'user': 'super_admin', 'queries': 4, 'p95_ms': 100},
+    # Unpaginated: renders every need in the system
+    'super_admin_all_needs': {'user': 'super_admin', 'queries': 8, 'p95_ms': 25000, 'iterations': 3},
+    'super_admin_categories': {'user': 'super_admin', 'queries': 3, 'p95_ms': 50},
+    'super_admin_products': {'user': 'super_admin', 'queries': 4, 'p95_ms': 100},
+    'delete_product': {'skip': 'destructive'},
+    'super_admin_contacts': {'user': 'super_admin', 'queries': 5, 'p95_ms': 1000},
+    'super_admin_volunteers': {'user': 'super_admin', 'queries': 5, 'p95_ms': 2000},
+    'super_admin_need_requests': {'user': 'super_admin', 'queries': 4, 'p95_ms': 2000},
+    'super_admin_donations': {'user': 'super_admin', 'queries': 6, 'p95_ms': 1500},
+    'run_donation_matching': {'skip': 'POST only, rewrites allocations'},
+    'super_admin_transfers': {'user': 'super_admin', 'queries': 8, 'p95_ms': 250},
+    'transfer_suggestions_json': {'user': 'super_admin', 'queries': 8, 'p95_ms': 250},
+    'dashboard_charts_data': {'user': 'super_admin', 'queries': 7, 'p95_ms': 100},
+    'trend_data': {'user': 'super_admin', 'query': {'group': 'priority'}, 'queries': 3, 'p95_ms': 50},
+    'view_need_detail': {'user': 'super_admin', 'kwargs': {'need_id': 'need_id'}, 'queries': 4, 'p95_ms': 100},
+    'delete_need': {'skip': 'destructive'},
+    'delete_category': {'skip': 'destructive'},
+    'delete_area': {'skip': 'destructive'},
+    'delete_area_admin': {'skip': 'destructive'},
+    'delete_contact': {'skip': 'destructive'},
+    # Streams every need as CSV
+    'export_needs': {'user': 'super_admin', 'kwargs': {'format': 'csv'}, 'queries': 4, 'p95_ms': 8000, 'iterations': 3},
+    'bulk_action': {'skip': 'POST only, destructive'},
+    'rate_limit_stats': {'user': 'super_admin', 'queries': 2, 'p95_ms': 25},
+    'request_profiles': {'user': 'super_admin', 'queries': 2, 'p95_ms': 50},
+    'change_feed': {'skip': 'endless event stream'},
+    'metrics': {'user': 'super_admin', 'queries': 0, 'p95_ms': 50},
+    # A full sync's first page: one query per table
+    'sync_changes': {'user': None, 'queries': 4, 'p95_ms': 400},
+    # Page ids, ETag aggregate, rows
+    'api_list': {'user': None, 'kwargs': {'resource': 'needs'}, 'queries': 3, 'p95_ms': 100},
+    'api_detail': {'user': None, 'kwargs': {'resource': 'needs', 'object_id': 'need_id'}, 'queries': 1, 'p95_ms': 25},
+    'database_management': {'user': 'super_admin', 'queries': 2, 'p95_ms': 50},
+    'export_database': {'skip': 'reads the live database file, not the seeded test database'},
+    'import_database': {'skip': 'POST only, replaces the database'},
+    'import_data': {'user': 'super_admin', 'queries': 2, 'p95_ms': 50},
+}
+
+# check_budgets --scale 1 is a fifth of generate_data --scale 1: 200 shelters, 20k needs
+BUDGET_SCALE = 0.2
+
+
+def seed_dataset(scale=1, seed=42):
+    """
+    Fill an empty database with the synthetic dataset (relief_app/synthetic.py)
+    and return the fixtures the budgets refer to.
+    """
+    generator = generate(scale=scale * BUDGET_SCALE, seed=seed)
+    busiest_area = generator.area_ids[0]
+    return {
+        'users': {'super_admin': generator.super_admin, 'area_admin': generator.area_admin_users[0]},
+        'area_id': busiest_area,
+        'need_id': Need.objects.filter(area_id=busiest_area).values_list('pk', flat=True).first(),
+        'article_slug': Article.objects.values_list('slug', flat=True).first(),
+    }
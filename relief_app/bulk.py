@@ -0,0 +1,143 @@
+"""
+Bulk actions for the super admin panel
+
+Each bulk request names a target (needs, need_requests, contacts,
+products, categories), a list of ids and an action. The action runs as a
+single queryset update() or delete() inside one transaction, and the
+caller gets a result for every id it sent.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from . import changefeed, rollups, sync
+from .models import Area, Category, Contact, Need, NeedRequest, Product
+from .summaries import deferred_summary_refresh, refresh_area_summaries
+
+MAX_IDS = 5000
+
+
+class BulkActionError(Exception):
+    """Raised when a bulk request is malformed"""
+
+
+def _status_values(model):
+    return {value for value, _ in model.STATUS_CHOICES}
+
+
+# target -> model and the actions it supports
+BULK_TARGETS = {
+    'needs': {
+        'model': Need,
+        'actions': {'delete', 'set_status', 'reassign_area'},
+        'statuses': _status_values(Need),
+    },
+    'need_requests': {
+        'model': NeedRequest,
+        'actions': {'delete', 'set_status', 'reassign_area'},
+        'statuses': _status_values(NeedRequest),
+    },
+    'contacts': {
+        'model': Contact,
+        'actions': {'delete', 'set_status'},
+        'statuses': _status_values(Contact),
+    },
+    'products': {
+        'model': Product,
+        'actions': {'delete'},
+    },
+    'categories': {
+        'model': Category,
+        'actions': {'delete'},
+    },
+}
+
+
+def parse_ids(raw_ids):
+    """Turn a list of ids (ints or numeric strings) into unique ints, keeping order"""
+    if not isinstance(raw_ids, (list, tuple)):
+        raise BulkActionError('ids must be a list')
+    if len(raw_ids) > MAX_IDS:
+        raise BulkActionError(f'At most {MAX_IDS} ids per request')
+    ids = []
+    seen = set()
+    for raw in raw_ids:
+        try:
+            value = int(raw)
+        except (TypeError, ValueError):
+            raise BulkActionError(f'Invalid id: {raw!r}')
+        if value not in seen:
+            seen.add(value)
+            ids.append(value)
+    if not ids:
+        raise BulkActionError('No ids given')
+    return ids
+
+
+def run_bulk_action(target, action, raw_ids, status=None, area_id=None):
+    """
+    Apply one action to many rows.
+
+    Returns {'processed': n, 'results': {id: 'updated'|'deleted'|'not_found'}}.
+    Raises BulkActionError for unknown targets/actions or bad parameters.
+    """
+    config = BULK_TARGETS.get(target)
+    if config is None:
+        raise BulkActionError(f'Unknown target: {target}')
+    if action not in config['actions']:
+        raise BulkActionError(f'Action "{action}" is not supported for {target}')
+    ids = parse_ids(raw_ids)
+
+    model = config['model']
+    updates = {}
+    if action == 'set_status':
+        if status not in config['statuses']:
+            raise BulkActionError(f'Invalid status: {status}')
+        updates['status'] = status
+    elif action == 'reassign_area':
+        try:
+            area_id = int(area_id)
+        except (TypeError, ValueError):
+            raise BulkActionError('area_id is required')
+        incident = list(Area.objects.filter(id=area_id).values_list('incident_id', flat=True))
+        if not incident:
+            raise BulkActionError('Area not found')
+        updates['area_id'] = area_id
+        # update() skips the signal that copies the area's incident
+        updates['incident_id'] = incident[0]
+
+    queryset = model.objects.filter(id__in=ids)
+    with deferred_summary_refresh(), rollups.deferred_rollup_refresh(), transaction.atomic():
+        found = set(queryset.values_list('id', flat=True))
+        touched_areas = set()
+        if model is Need:
+            touched_areas = set(queryset.order_by().values_list('area_id', flat=True).distinct())
+
+        if action == 'delete':
+            queryset.delete()
+            outcome = 'deleted'
+        else:
+            tracked = model in changefeed.TRACKED and changefeed.enabled()
+            before = changefeed.snapshot(model, found) if tracked else None
+            moves = []
+            if model is Need and 'area_id' in updates:
+                moves = list(queryset.exclude(area_id=updates['area_id']).values_list('id', 'area_id'))
+                # The buckets they leave; update() skips the rollup signals
+                rollups.mark_ids(model, found)
+            # update() does not touch auto_now fields by itself
+            if any(f.name == 'updated_at' for f in model._meta.concrete_fields):
+                updates['updated_at'] = timezone.now()
+            queryset.update(**updates)
+            outcome = 'updated'
+            if tracked:
+                # update() skips the change feed signals too
+                changefeed.record_updated(model, before)
+            if moves:
+                sync.record_moves(moves)
+                rollups.mark_ids(model, found)
+            if model is Need:
+                # update() skips the Need signals
+                touched_areas.add(updates.get('area_id'))
+                refresh_area_summaries(touched_areas)
+
+    results = {i: (outcome if i in found else 'not_found') for i in ids}
+    return {'processed': len(found), 'results': results}
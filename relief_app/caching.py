@@ -0,0 +1,192 @@
+"""
+View caching helpers for Hurricane Heroes
+
+stale_while_revalidate() keeps hot public pages cached and, when an entry
+goes stale, lets one worker rebuild it while everyone else keeps getting
+the stale copy. The rebuild lock is a cache.add(): atomic with Redis and
+Memcached, and within one process with the local-memory cache. The file
+based cache checks for the key and then writes it, so there two workers
+can occasionally both take the lock and render the page twice; single
+flight across workers is best effort with it.
+Async views (ASGI mode) get the same behaviour through the cache's async API.
+"""
+import asyncio
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.http import HttpResponse
+
+
+# Default timings (seconds); override with VIEW_CACHE_* settings
+DEFAULT_FRESH_TIMEOUT = 60
+DEFAULT_STALE_TIMEOUT = 600
+DEFAULT_LOCK_TIMEOUT = 30
+DEFAULT_WAIT_TIMEOUT = 5.0
+POLL_INTERVAL = 0.05
+
+
+def get_view_cache():
+    """Return the cache used for page caching"""
+    return caches[getattr(settings, 'VIEW_CACHE_ALIAS', 'default')]
+
+
+def _is_cacheable(request, user=None):
+    """Only anonymous GET/HEAD requests without pending flash messages are cached"""
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if user is None:
+        user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return False
+    # Pages rendered with a flash message must not be shared between visitors
+    if len(get_messages(request)) > 0:
+        return False
+    return True
+
+
+def _cache_key(prefix, request):
+    return f'swr:{prefix}:{request.get_full_path()}'
+
+
+def _pack(response, fresh_timeout):
+    """Turn a response into a picklable cache entry"""
+    return {
+        'content': response.content,
+        'status': response.status_code,
+        'content_type': response.get('Content-Type'),
+        'fresh_until': time.time() + fresh_timeout,
+    }
+
+
+def _unpack(entry, state):
+    response = HttpResponse(
+        entry['content'],
+        status=entry['status'],
+        content_type=entry['content_type'],
+    )
+    response['X-Cache'] = state
+    return response
+
+
+def stale_while_revalidate(fresh_timeout=None, stale_timeout=None, key_prefix=None):
+    """
+    Cache a view's response with stale-while-revalidate semantics.
+
+    - fresh hit: served straight from the cache
+    - stale hit: one request grabs the refresh lock and rebuilds the page,
+      concurrent requests are served the stale copy meanwhile
+    - miss: one request builds the page, concurrent requests wait for it
+      (single flight) and fall back to rendering themselves after
+      VIEW_CACHE_WAIT_TIMEOUT seconds
+    """
+    def decorator(view_func):
+        prefix = key_prefix or view_func.__name__
+
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            if not _is_cacheable(request):
+                return view_func(request, *args, **kwargs)
+
+            cache = get_view_cache()
+            fresh = fresh_timeout or getattr(settings, 'VIEW_CACHE_FRESH_TIMEOUT', DEFAULT_FRESH_TIMEOUT)
+            stale = stale_timeout or getattr(settings, 'VIEW_CACHE_STALE_TIMEOUT', DEFAULT_STALE_TIMEOUT)
+            lock_timeout = getattr(settings, 'VIEW_CACHE_LOCK_TIMEOUT', DEFAULT_LOCK_TIMEOUT)
+            wait_timeout = getattr(settings, 'VIEW_CACHE_WAIT_TIMEOUT', DEFAULT_WAIT_TIMEOUT)
+
+            key = _cache_key(prefix, request)
+            lock_key = f'{key}:lock'
+
+            def refresh():
+                try:
+                    response = view_func(request, *args, **kwargs)
+                    if response.status_code == 200 and not response.streaming:
+                        cache.set(key, _pack(response, fresh), fresh + stale)
+                    return response
+                finally:
+                    cache.delete(lock_key)
+
+            entry = cache.get(key)
+            if entry is not None:
+                if entry['fresh_until'] > time.time():
+                    return _unpack(entry, 'HIT')
+                # Stale: only the lock holder recomputes, everyone else gets the old page
+                if cache.add(lock_key, 1, lock_timeout):
+                    response = refresh()
+                    response['X-Cache'] = 'REFRESH'
+                    return response
+                return _unpack(entry, 'STALE')
+
+            # Cold miss: coalesce concurrent requests behind a single render
+            if cache.add(lock_key, 1, lock_timeout):
+                response = refresh()
+                response['X-Cache'] = 'MISS'
+                return response
+
+            deadline = time.monotonic() + wait_timeout
+            while time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL)
+                entry = cache.get(key)
+                if entry is not None:
+                    return _unpack(entry, 'COALESCED')
+
+            # The lock holder is taking too long; render without caching
+            return view_func(request, *args, **kwargs)
+
+        @wraps(view_func)
+        async def _async_wrapped(request, *args, **kwargs):
+            # Same flow as _wrapped, with the cache's async API and asyncio.sleep
+            # so a coalesced request doesn't hold up the event loop
+            user = await request.auser() if hasattr(request, 'auser') else None
+            if user is not None:
+                request.user = user  # templates read request.user; don't let them hit the DB lazily
+            if not _is_cacheable(request, user):
+                return await view_func(request, *args, **kwargs)
+
+            cache = get_view_cache()
+            fresh = fresh_timeout or getattr(settings, 'VIEW_CACHE_FRESH_TIMEOUT', DEFAULT_FRESH_TIMEOUT)
+            stale = stale_timeout or getattr(settings, 'VIEW_CACHE_STALE_TIMEOUT', DEFAULT_STALE_TIMEOUT)
+            lock_timeout = getattr(settings, 'VIEW_CACHE_LOCK_TIMEOUT', DEFAULT_LOCK_TIMEOUT)
+            wait_timeout = getattr(settings, 'VIEW_CACHE_WAIT_TIMEOUT', DEFAULT_WAIT_TIMEOUT)
+
+            key = _cache_key(prefix, request)
+            lock_key = f'{key}:lock'
+
+            async def refresh():
+                try:
+                    response = await view_func(request, *args, **kwargs)
+                    if response.status_code == 200 and not response.streaming:
+                        await cache.aset(key, _pack(response, fresh), fresh + stale)
+                    return response
+                finally:
+                    await cache.adelete(lock_key)
+
+            entry = await cache.aget(key)
+            if entry is not None:
+                if entry['fresh_until'] > time.time():
+                    return _unpack(entry, 'HIT')
+                if await cache.aadd(lock_key, 1, lock_timeout):
+                    response = await refresh()
+                    response['X-Cache'] = 'REFRESH'
+                    return response
+                return _unpack(entry, 'STALE')
+
+            if await cache.aadd(lock_key, 1, lock_timeout):
+                response = await refresh()
+                response['X-Cache'] = 'MISS'
+                return response
+
+            deadline = time.monotonic() + wait_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(POLL_INTERVAL)
+                entry = await cache.aget(key)
+                if entry is not None:
+                    return _unpack(entry, 'COALESCED')
+
+            return await view_func(request, *args, **kwargs)
+
+        return _async_wrapped if iscoroutinefunction(view_func) else _wrapped
+    return decorator
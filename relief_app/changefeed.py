@@ -0,0 +1,418 @@
+"""
+Change feed: an append-only log of need, need request, donation and
+volunteer changes, pushed to dashboards as Server-Sent Events
+
+Writers add one ChangeEvent row per created, updated or deleted object:
+the signal handlers in signals.py for ordinary saves and deletes, and
+record_created()/record_updated() on the bulk paths that skip signals
+(matching, bulk actions, imports, the intake drainer). An event carries
+only the fields dashboards count by (area, status, priority, quantity,
+category, ...) and, for updates, the previous values of the ones that
+changed, so a client moves one unit between chart buckets instead of
+re-querying. Names, emails and phone numbers are never written, and a
+save that changes none of the tracked fields adds no event.
+
+Streams don't query the table each. One poller thread per process reads
+new rows every CHANGE_FEED_POLL_SECONDS into a short in-memory buffer of
+pre-encoded frames and wakes every stream in that process, sync
+generators through a Condition and async ones through futures on their
+event loop. A client reconnecting with Last-Event-ID replays what it
+missed from the table; past CHANGE_FEED_REPLAY_LIMIT events, or when a
+stream falls behind the buffer, it gets a 'reset' event and reloads its
+data in full.
+
+Ids from concurrent transactions can commit out of order (PostgreSQL),
+so ids the poller skipped are re-checked for GAP_SECONDS before being
+given up as rolled back.
+
+Under WSGI every open stream holds a worker thread, so streams end after
+CHANGE_FEED_MAX_STREAM_SECONDS and the browser reconnects. Pages open a
+stream only when live() says the server can hold one (CHANGE_FEED_LIVE:
+ASGI or gunicorn gthread workers, never gunicorn's sync workers).
+Old events are removed with 'manage.py prune_change_feed'.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from .models import ChangeEvent, Donation, Need, NeedRequest, Product, Volunteer
+
+logger = logging.getLogger(__name__)
+
+# model: (kind, tracked fields)
+TRACKED = {
+    Need: ('need', ('area_id', 'incident_id', 'product_id', 'quantity', 'priority', 'status')),
+    NeedRequest: ('need_request', ('area_id', 'incident_id', 'item_needed', 'quantity', 'urgency', 'status')),
+    Donation: ('donation', ('area_id', 'incident_id', 'item_name', 'quantity', 'product_id', 'allocated_quantity')),
+    Volunteer: ('volunteer', ('area_id', 'incident_id', 'duplicate_of_id')),
+}
+
+BUFFER_SIZE = 2000
+FETCH_LIMIT = 500
+GAP_SECONDS = 10
+IDLE_SECONDS = 30
+RETRY_MS = 3000
+CHUNK_SIZE = 500
+
+
+def enabled():
+    return getattr(settings, 'CHANGE_FEED_ENABLED', True)
+
+
+def live():
+    """Whether pages should stream changes, see CHANGE_FEED_LIVE"""
+    return enabled() and getattr(settings, 'CHANGE_FEED_LIVE', False)
+
+
+# Writing
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def snapshot(model, ids):
+    """{id: tracked values} for the given rows, needs with their category_id"""
+    _, fields = TRACKED[model]
+    extra = {'category_id': F('product__category_id')} if model is Need else {}
+    values = {}
+    for chunk in _chunks(ids):
+        for row in model.objects.filter(id__in=chunk).values('id', *fields, **extra):
+            values[row.pop('id')] = row
+    return values
+
+
+def instance_values(instance):
+    model = type(instance)
+    _, fields = TRACKED[model]
+    values = {field: getattr(instance, field) for field in fields}
+    if model is Need:
+        values['category_id'] = instance.product.category_id if Need.product.is_cached(instance) else None
+    return values
+
+
+def _fill_categories(values_list):
+    """Look up category_id for need values that don't have it, in one query"""
+    missing = {v['product_id'] for v in values_list if v.get('category_id') is None and v.get('product_id')}
+    if not missing:
+        return
+    categories = dict(Product.objects.filter(id__in=missing).values_list('id', 'category_id'))
+    for values in values_list:
+        if values.get('category_id') is None and 'product_id' in values:
+            values['category_id'] = categories.get(values['product_id'])
+
+
+def _event(kind, action, object_id, values, before=None):
+    data = dict(values)
+    area_id = data.pop('area_id', None)
+    incident_id = data.pop('incident_id', None)
+    if before is not None:
+        changed = {field: old for field, old in before.items() if values.get(field) != old}
+        if not changed:
+            return None
+        data['before'] = changed
+    return ChangeEvent(kind=kind, action=action, object_id=object_id, area_id=area_id,
+                       incident_id=incident_id, data=data)
+
+
+def record(action, instance, before=None):
+    """Log one created/updated/deleted object; before is its snapshot() from pre_save"""
+    if not enabled():
+        return
+    kind, _ = TRACKED[type(instance)]
+    values = instance_values(instance)
+    if kind == 'need':
+        _fill_categories([values])
+    event = _event(kind, action, instance.pk, values, before)
+    if event is not None:
+        event.save()
+
+
+def record_created(objs):
+    """Log objects inserted with bulk_create (which skips signals)"""
+    objs = [obj for obj in objs if obj.pk is not None]
+    if not enabled() or not objs:
+        return
+    kind, _ = TRACKED[type(objs[0])]
+    values = [instance_values(obj) for obj in objs]
+    if kind == 'need':
+        _fill_categories(values)
+    events = [_event(kind, 'created', obj.pk, v) for obj, v in zip(objs, values)]
+    ChangeEvent.objects.bulk_create(events, batch_size=CHUNK_SIZE)
+
+
+def record_updated(model, before):
+    """
+    Log rows changed with queryset.update() (which skips signals).
+
+    before is snapshot(model, ids) taken ahead of the update.
+    """
+    if not enabled() or not before:
+        return
+    kind, _ = TRACKED[model]
+    after = snapshot(model, before)
+    events = [
+        _event(kind, 'updated', object_id, values, before[object_id])
+        for object_id, values in after.items()
+    ]
+    ChangeEvent.objects.bulk_create([e for e in events if e is not None], batch_size=CHUNK_SIZE)
+
+
+# Reading
+
+def encode(event):
+    """One SSE frame for an event row (as returned by values())"""
+    payload = {
+        'id': event['id'],
+        'action': event['action'],
+        'object_id': event['object_id'],
+        'area_id': event['area_id'],
+        'incident_id': event['incident_id'],
+        'ts': event['created_at'].isoformat(),
+        **event['data'],
+    }
+    data = json.dumps(payload, separators=(',', ':'), default=str)
+    return f'id: {event["id"]}\nevent: {event["kind"]}\ndata: {data}\n\n'
+
+
+def reset_frame(last_id):
+    # The id moves the browser's Last-Event-ID past what it missed
+    return f'id: {last_id or 0}\nevent: reset\ndata: {{}}\n\n'
+
+
+EVENT_FIELDS = ('id', 'kind', 'action', 'object_id', 'area_id', 'incident_id', 'data', 'created_at')
+
+
+class Feed:
+    """Per-process buffer of recent events, filled by one poller thread"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        # (seq, event id, area id, incident id, frame); seq is the order this process saw them in
+        self.buffer = deque(maxlen=BUFFER_SIZE)
+        self.seq = 0
+        self.last_id = None
+        self.gaps = {}
+        self.subscribers = 0
+        self.waiters = set()
+        self.thread = None
+
+    def subscribe(self):
+        """Register a stream; returns (seq, last_id) to start reading from"""
+        latest = latest_id() if self.last_id is None else None
+        with self.lock:
+            if self.last_id is None:
+                # The poller stopped in between; rare enough to query under the lock
+                self.last_id = latest if latest is not None else latest_id()
+            self.subscribers += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='change-feed-poller', daemon=True)
+                self.thread.start()
+            return self.seq, self.last_id
+
+    def unsubscribe(self):
+        with self.lock:
+            self.subscribers -= 1
+
+    def _run(self):
+        idle_since = None
+        try:
+            while True:
+                with self.lock:
+                    if self.subscribers > 0:
+                        idle_since = None
+                    elif idle_since is None:
+                        idle_since = time.monotonic()
+                    elif time.monotonic() - idle_since > IDLE_SECONDS:
+                        # Nobody listening: stop, and start from the latest event next time
+                        self.thread = None
+                        self.last_id = None
+                        self.gaps.clear()
+                        return
+                try:
+                    while self.poll() == FETCH_LIMIT:
+                        pass
+                except Exception:
+                    logger.exception('Change feed poll failed')
+                    connection.close()
+                time.sleep(getattr(settings, 'CHANGE_FEED_POLL_SECONDS', 1))
+        finally:
+            connection.close()
+
+    def poll(self):
+        """Read new events into the buffer; returns how many rows were read"""
+        now = time.monotonic()
+        self.gaps = {i: seen for i, seen in self.gaps.items() if now - seen < GAP_SECONDS}
+        query = Q(id__gt=self.last_id)
+        if self.gaps:
+            query |= Q(id__in=list(self.gaps))
+        rows = list(ChangeEvent.objects.filter(query).order_by('id').values(*EVENT_FIELDS)[:FETCH_LIMIT])
+        if not rows:
+            return 0
+
+        entries = []
+        last_id = self.last_id
+        for row in rows:
+            self.gaps.pop(row['id'], None)
+            if row['id'] > last_id:
+                if row['id'] - last_id <= FETCH_LIMIT:
+                    self.gaps.update((i, now) for i in range(last_id + 1, row['id']))
+                last_id = row['id']
+            entries.append((row['id'], row['area_id'], row['incident_id'], encode(row)))
+
+        with self.changed:
+            for event_id, area_id, incident_id, frame in entries:
+                self.seq += 1
+                self.buffer.append((self.seq, event_id, area_id, incident_id, frame))
+            self.last_id = last_id
+            self.changed.notify_all()
+            waiters, self.waiters = self.waiters, set()
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # That stream's event loop has closed
+                pass
+        return len(rows)
+
+    def _since(self, after_seq):
+        """Buffered entries after after_seq; None if some already fell out of the buffer"""
+        if self.buffer and self.buffer[0][0] > after_seq + 1:
+            return None, self.seq
+        return [entry for entry in self.buffer if entry[0] > after_seq], self.seq
+
+    def wait(self, after_seq, timeout):
+        with self.changed:
+            self.changed.wait_for(lambda: self.seq > after_seq, timeout)
+            return self._since(after_seq)
+
+    async def await_since(self, after_seq, timeout):
+        loop = asyncio.get_running_loop()
+        future = None
+        with self.lock:
+            if self.seq <= after_seq:
+                future = loop.create_future()
+                self.waiters.add((loop, future))
+        if future is not None:
+            try:
+                await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self.lock:
+                    self.waiters.discard((loop, future))
+        with self.lock:
+            return self._since(after_seq)
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+feed = Feed()
+
+
+def replay(after_id, up_to_id, area_id=None, incident_ids=None):
+    """
+    Frames for events after_id < id <= up_to_id, and their ids; area_id and
+    incident_ids (a list, see incidents.scope()) narrow them down.
+
+    Returns (None, None) when there are more than CHANGE_FEED_REPLAY_LIMIT.
+    """
+    limit = getattr(settings, 'CHANGE_FEED_REPLAY_LIMIT', 1000)
+    events = ChangeEvent.objects.filter(id__gt=after_id, id__lte=up_to_id)
+    if area_id is not None:
+        events = events.filter(area_id=area_id)
+    if incident_ids is not None:
+        events = events.filter(incident_id__in=incident_ids)
+    rows = list(events.order_by('id').values(*EVENT_FIELDS)[:limit + 1])
+    if len(rows) > limit:
+        return None, None
+    return [encode(row) for row in rows], {row['id'] for row in rows}
+
+
+def _frames(entries, area_id, incident_ids, replayed):
+    return ''.join(
+        frame for _, event_id, event_area_id, event_incident_id, frame in entries
+        if (area_id is None or event_area_id == area_id)
+        and (incident_ids is None or event_incident_id in incident_ids)
+        and event_id not in replayed
+    )
+
+
+def stream(after_id=None, area_id=None, incident_ids=None):
+    """SSE body for sync workers"""
+    seq, last_id = feed.subscribe()
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        replayed = set()
+        if after_id is not None and after_id < last_id:
+            frames, replayed = replay(after_id, last_id, area_id, incident_ids)
+            if frames is None:
+                yield reset_frame(last_id)
+                return
+            yield ''.join(frames)
+        heartbeat = getattr(settings, 'CHANGE_FEED_HEARTBEAT_SECONDS', 15)
+        deadline = time.monotonic() + getattr(settings, 'CHANGE_FEED_MAX_STREAM_SECONDS', 300)
+        while time.monotonic() < deadline:
+            entries, seq = feed.wait(seq, heartbeat)
+            if entries is None:
+                yield reset_frame(feed.last_id)
+                return
+            yield _frames(entries, area_id, incident_ids, replayed) or ': ping\n\n'
+    finally:
+        feed.unsubscribe()
+
+
+async def astream(after_id=None, area_id=None, incident_ids=None):
+    """SSE body for ASGI workers; the same as stream() without holding a thread"""
+    seq, last_id = await sync_to_async(feed.subscribe)()
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        replayed = set()
+        if after_id is not None and after_id < last_id:
+            frames, replayed = await sync_to_async(replay)(after_id, last_id, area_id, incident_ids)
+            if frames is None:
+                yield reset_frame(last_id)
+                return
+            yield ''.join(frames)
+        heartbeat = getattr(settings, 'CHANGE_FEED_HEARTBEAT_SECONDS', 15)
+        deadline = time.monotonic() + getattr(settings, 'CHANGE_FEED_MAX_STREAM_SECONDS', 300)
+        while time.monotonic() < deadline:
+            entries, seq = await feed.await_since(seq, heartbeat)
+            if entries is None:
+                yield reset_frame(feed.last_id)
+                return
+            yield _frames(entries, area_id, incident_ids, replayed) or ': ping\n\n'
+    finally:
+        feed.unsubscribe()
+
+
+def latest_id():
+    """Id of the newest event, for pages to resume their stream from"""
+    return ChangeEvent.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+def prune(days=None, batch_size=5000):
+    """Delete events older than CHANGE_FEED_RETENTION_DAYS; returns how many"""
+    days = getattr(settings, 'CHANGE_FEED_RETENTION_DAYS', 7) if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted = 0
+    while True:
+        ids = list(ChangeEvent.objects.filter(created_at__lt=cutoff).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += ChangeEvent.objects.filter(id__in=ids).delete()[0]
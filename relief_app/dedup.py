@@ -0,0 +1,176 @@
+"""
+Duplicate submission detection for need requests and volunteer signups
+
+Each submission gets a fingerprint: a SHA-1 of its normalized identity
+(email, shelter and, for need requests, the normalized item name). The
+fingerprint is indexed together with created_at, so checking a
+submission against the DEDUP_WINDOW_HOURS window is one index seek.
+
+Within the window:
+    an identical resubmission is not stored again; the original's
+    duplicate_count goes up instead
+    a resubmission with different details (say, a new quantity) is stored
+    with duplicate_of pointing at the original
+
+Triage views hide linked duplicates and group near-duplicates (same
+phone or email at the same shelter) next to each other.
+"""
+import hashlib
+import re
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from . import changefeed, rollups
+from .matching import normalize_item_name
+from .models import NeedRequest, Volunteer
+
+DEFAULT_WINDOW_HOURS = 24
+LOOKUP_CHUNK = 500
+
+_NON_DIGIT = re.compile(r'\D')
+
+# Fields that must also match for a resubmission to count as identical
+REPEAT_FIELDS = {
+    NeedRequest: ('quantity',),
+    Volunteer: (),
+}
+
+
+def window():
+    return timedelta(hours=getattr(settings, 'DEDUP_WINDOW_HOURS', DEFAULT_WINDOW_HOURS))
+
+
+def normalize_email(email):
+    """Lowercase and drop +tags (and dots for Gmail, which ignores them)"""
+    email = (email or '').strip().lower()
+    local, _, domain = email.partition('@')
+    if not domain:
+        return email
+    local = local.split('+', 1)[0]
+    if domain in ('gmail.com', 'googlemail.com'):
+        local, domain = local.replace('.', ''), 'gmail.com'
+    return f'{local}@{domain}'
+
+
+def normalize_phone(phone):
+    """Digits only, keeping the last 10 so +1 and (239) formats agree"""
+    return _NON_DIGIT.sub('', phone or '')[-10:]
+
+
+def _digest(*parts):
+    return hashlib.sha1('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+
+def fingerprint(obj):
+    if isinstance(obj, NeedRequest):
+        return _digest('need_request', normalize_email(obj.email), obj.area_id,
+                       normalize_item_name(obj.item_needed))
+    return _digest('volunteer', normalize_email(obj.email), obj.area_id)
+
+
+def contact_key(obj):
+    """Looser key for near-duplicates: the same person at the same shelter"""
+    return normalize_phone(obj.phone) or normalize_email(obj.email), obj.area_id
+
+
+def _repeat_values(model, obj):
+    return tuple(getattr(obj, name) for name in REPEAT_FIELDS[model])
+
+
+def _find_originals(model, fingerprints, since):
+    """{fingerprint: (id, repeat values)} for the oldest original in the window"""
+    fields = REPEAT_FIELDS[model]
+    fingerprints = list(fingerprints)
+    found = {}
+    for start in range(0, len(fingerprints), LOOKUP_CHUNK):
+        rows = (
+            model.objects.filter(
+                fingerprint__in=fingerprints[start:start + LOOKUP_CHUNK],
+                created_at__gte=since,
+                duplicate_of__isnull=True,
+            )
+            .order_by('created_at')
+            .values_list('id', 'fingerprint', *fields)
+        )
+        for row in rows:
+            found.setdefault(row[1], (row[0], tuple(row[2:])))
+    return found
+
+
+def insert_deduplicated(model, objs, batch_size=500):
+    """
+    bulk_create need requests or volunteers, folding duplicates.
+
+    Returns {'created', 'linked', 'folded'}.
+    """
+    for obj in objs:
+        # Clean slate in case a failed attempt already touched these
+        obj.pk = None
+        obj.duplicate_of = None
+        obj.duplicate_count = 0
+        obj.fingerprint = fingerprint(obj)
+    existing = _find_originals(model, {obj.fingerprint for obj in objs}, timezone.now() - window())
+
+    originals, linked = [], []
+    folded = Counter()
+    first_in_batch = {}
+    for obj in objs:
+        values = _repeat_values(model, obj)
+        match = existing.get(obj.fingerprint)
+        if match is not None:
+            original_id, original_values = match
+            if values == original_values:
+                folded[original_id] += 1
+            else:
+                obj.duplicate_of_id = original_id
+                linked.append(obj)
+            continue
+        first = first_in_batch.get(obj.fingerprint)
+        if first is None:
+            first_in_batch[obj.fingerprint] = obj
+            originals.append(obj)
+        elif values == _repeat_values(model, first):
+            first.duplicate_count += 1
+        else:
+            obj.duplicate_of = first
+            linked.append(obj)
+
+    model.objects.bulk_create(originals, batch_size=batch_size)
+    # Links to originals from this batch pick up their new ids here
+    model.objects.bulk_create(linked, batch_size=batch_size)
+    changefeed.record_created(originals + linked)
+    rollups.mark_objects(originals)
+
+    by_count = defaultdict(list)
+    for original_id, n in folded.items():
+        by_count[n].append(original_id)
+    for n, ids in by_count.items():
+        model.objects.filter(id__in=ids).update(duplicate_count=F('duplicate_count') + n)
+
+    return {
+        'created': len(originals),
+        'linked': len(linked),
+        'folded': sum(folded.values()) + sum(obj.duplicate_count for obj in originals),
+    }
+
+
+def group_near_duplicates(records):
+    """
+    Reorder records so near-duplicates sit together, keeping the order of
+    each group's first record. Sets group_size and is_group_lead on every
+    record for the template.
+    """
+    groups = {}
+    for record in records:
+        groups.setdefault(contact_key(record), []).append(record)
+    ordered = []
+    for members in groups.values():
+        for position, record in enumerate(members):
+            record.group_size = len(members)
+            record.is_group_lead = position == 0
+            ordered.append(record)
+    return ordered
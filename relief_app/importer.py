@@ -0,0 +1,307 @@
+"""
+Bulk import of needs, areas and products from CSV or JSON
+
+Rows are streamed from the uploaded file, validated against lookup
+dicts loaded once up front (no query per row) and written with
+bulk_create in batches. Invalid rows are skipped and reported with
+their row number, so one bad line does not sink a 100k row import.
+
+CSV files need a header row. JSON files may be a single array of
+objects or JSON Lines (one object per line).
+"""
+import csv
+import io
+import json
+from itertools import chain
+
+from django.db import transaction
+
+from . import changefeed, incidents, rollups
+from .models import Area, Category, Need, Product
+from .summaries import refresh_area_summaries
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 500
+
+IMPORT_KINDS = ('needs', 'areas', 'products')
+
+NEED_PRIORITIES = {value for value, _ in Need.PRIORITY_CHOICES}
+NEED_STATUSES = {value for value, _ in Need.STATUS_CHOICES}
+
+
+class ImportFormatError(Exception):
+    """Raised when the file itself cannot be read"""
+
+
+def _text_stream(fileobj):
+    if isinstance(fileobj, io.TextIOBase):
+        return fileobj
+    return io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+
+
+def iter_rows(fileobj, fmt):
+    """Yield (row_number, dict) pairs from a CSV or JSON file"""
+    stream = _text_stream(fileobj)
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        if not reader.fieldnames:
+            raise ImportFormatError('CSV file has no header row')
+        for number, row in enumerate(reader, start=2):
+            yield number, {(k or '').strip().lower(): (v or '').strip() for k, v in row.items()}
+        return
+
+    if fmt != 'json':
+        raise ImportFormatError(f'Unsupported format: {fmt}')
+
+    first = stream.read(1)
+    while first and first.isspace():
+        first = stream.read(1)
+    if first == '[':
+        try:
+            records = json.loads(first + stream.read())
+        except ValueError as e:
+            raise ImportFormatError(f'Invalid JSON: {e}')
+        lines = enumerate(records, start=1)
+    else:
+        lines = (
+            (number, line) for number, line in enumerate(chain([first + stream.readline()], stream), start=1)
+            if line.strip()
+        )
+    for number, record in lines:
+        if isinstance(record, str):
+            try:
+                record = json.loads(record)
+            except ValueError:
+                yield number, None
+                continue
+        if not isinstance(record, dict):
+            yield number, None
+            continue
+        yield number, {str(k).strip().lower(): ('' if v is None else str(v).strip()) for k, v in record.items()}
+
+
+class Lookups:
+    """Id and case-insensitive name indexes for areas, products and categories"""
+
+    def __init__(self):
+        self.areas = {}
+        self.products = {}
+        self.categories = {}
+        self.area_ids = set()
+        self.product_ids = set()
+        self.category_ids = set()
+        for pk, name in Area.objects.values_list('id', 'name'):
+            self.add_area(pk, name)
+        for pk, name in Product.objects.values_list('id', 'name'):
+            self.add_product(pk, name)
+        for pk, name in Category.objects.values_list('id', 'name'):
+            self.category_ids.add(pk)
+            self.categories.setdefault(name.lower(), pk)
+
+    def add_area(self, pk, name):
+        self.area_ids.add(pk)
+        if self.areas.get(name.lower(), -1) == -1:
+            self.areas[name.lower()] = pk
+
+    def add_product(self, pk, name):
+        self.product_ids.add(pk)
+        self.products.setdefault(name.lower(), pk)
+
+    @staticmethod
+    def _resolve(value, ids, names):
+        if not value:
+            return None
+        if value.isdigit() and int(value) in ids:
+            return int(value)
+        return names.get(value.lower())
+
+    def area(self, value):
+        return self._resolve(value, self.area_ids, self.areas)
+
+    def product(self, value):
+        return self._resolve(value, self.product_ids, self.products)
+
+    def category(self, value):
+        return self._resolve(value, self.category_ids, self.categories)
+
+
+def _field(row, *names):
+    for name in names:
+        if row.get(name):
+            return row[name]
+    return ''
+
+
+def _positive_int(value):
+    try:
+        number = int(float(value))
+    except (TypeError, ValueError):
+        return None
+    return number if number >= 1 else None
+
+
+def _optional_float(value, low, high):
+    if value == '':
+        return None, True
+    try:
+        number = float(value)
+    except ValueError:
+        return None, False
+    return number, low <= number <= high
+
+
+def build_need(row, lookups, user):
+    errors = []
+    area_id = lookups.area(_field(row, 'area', 'area_id', 'shelter'))
+    if area_id is None:
+        errors.append('unknown area')
+    product_id = lookups.product(_field(row, 'product', 'product_id', 'item'))
+    if product_id is None:
+        errors.append('unknown product')
+    quantity = _positive_int(row.get('quantity'))
+    if quantity is None:
+        errors.append('quantity must be a whole number of at least 1')
+    priority = (row.get('priority') or 'medium').lower()
+    if priority not in NEED_PRIORITIES:
+        errors.append(f'invalid priority "{priority}"')
+    status = (row.get('status') or 'pending').lower().replace(' ', '_')
+    if status not in NEED_STATUSES:
+        errors.append(f'invalid status "{status}"')
+    if errors:
+        return None, errors
+    return Need(
+        area_id=area_id,
+        product_id=product_id,
+        quantity=quantity,
+        priority=priority,
+        status=status,
+        notes=row.get('notes', ''),
+        created_by=user,
+    ), []
+
+
+def build_area(row, lookups, user):
+    errors = []
+    name = row.get('name', '')
+    if not name:
+        errors.append('name is required')
+    elif lookups.area(name) is not None:
+        errors.append(f'area "{name}" already exists')
+    address = row.get('address', '')
+    if not address:
+        errors.append('address is required')
+    pincode = _field(row, 'pincode', 'zip', 'zip_code')
+    if not pincode or len(pincode) > 10:
+        errors.append('pincode is required (max 10 characters)')
+    latitude, lat_ok = _optional_float(_field(row, 'latitude', 'lat'), -90, 90)
+    longitude, lng_ok = _optional_float(_field(row, 'longitude', 'lng', 'lon'), -180, 180)
+    if not (lat_ok and lng_ok):
+        errors.append('invalid coordinates')
+    if errors:
+        return None, errors
+    # Reserve the name so duplicates later in the same file are caught
+    lookups.areas[name.lower()] = -1
+    return Area(
+        name=name,
+        description=row.get('description', ''),
+        address=address,
+        pincode=pincode,
+        latitude=latitude,
+        longitude=longitude,
+    ), []
+
+
+def build_product(row, lookups, user):
+    errors = []
+    name = row.get('name', '')
+    if not name:
+        errors.append('name is required')
+    category_id = lookups.category(_field(row, 'category', 'category_id'))
+    if category_id is None:
+        errors.append('unknown category')
+    unit = row.get('unit', '')
+    if not unit:
+        errors.append('unit is required')
+    if errors:
+        return None, errors
+    return Product(
+        name=name,
+        description=row.get('description', ''),
+        category_id=category_id,
+        unit=unit,
+    ), []
+
+
+BUILDERS = {
+    'needs': (Need, build_need),
+    'areas': (Area, build_area),
+    'products': (Product, build_product),
+}
+
+
+def run_import(kind, fileobj, fmt, user=None, dry_run=False, batch_size=BATCH_SIZE):
+    """
+    Import one file of the given kind.
+
+    Returns a report dict: rows, created, failed, errors (first
+    MAX_REPORTED_ERRORS as {'row': n, 'errors': [...]}) and dry_run.
+    """
+    if kind not in BUILDERS:
+        raise ImportFormatError(f'Unknown import type: {kind}')
+    model, build = BUILDERS[kind]
+    lookups = Lookups()
+    report = {'kind': kind, 'rows': 0, 'created': 0, 'failed': 0, 'errors': [], 'dry_run': dry_run}
+    touched_areas = set()
+    batch = []
+
+    def flush():
+        if not batch:
+            return
+        if not dry_run:
+            with transaction.atomic():
+                incidents.assign(batch)
+                created = model.objects.bulk_create(batch)
+                if model is Need:
+                    # bulk_create skips the change feed and rollup signals
+                    changefeed.record_created(created)
+                    rollups.mark_objects(created)
+            # Later rows (and later files) can refer to what we just created
+            for obj in created:
+                if kind == 'areas':
+                    lookups.add_area(obj.pk, obj.name)
+                elif kind == 'products':
+                    lookups.add_product(obj.pk, obj.name)
+        report['created'] += len(batch)
+        batch.clear()
+
+    for number, row in iter_rows(fileobj, fmt):
+        report['rows'] += 1
+        if row is None:
+            obj, errors = None, ['not a valid record']
+        else:
+            obj, errors = build(row, lookups, user)
+        if errors:
+            report['failed'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({'row': number, 'errors': errors})
+            continue
+        if kind == 'needs':
+            touched_areas.add(obj.area_id)
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    if kind == 'needs' and not dry_run:
+        # bulk_create skips the Need signals
+        refresh_area_summaries(touched_areas)
+    return report
+
+
+def detect_format(filename):
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.json', '.jsonl', '.ndjson')):
+        return 'json'
+    raise ImportFormatError('File must be .csv, .json or .jsonl')
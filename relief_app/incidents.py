@@ -0,0 +1,181 @@
+"""
+Incident scoping
+
+One deployment serves several hurricane events. Every Area belongs to an
+Incident, and so does everything recorded at it: Need, ArchivedNeed,
+Donation, Volunteer and NeedRequest carry a copy of their area's
+incident, and each has an index led by it. A page for the active incident
+then reads that incident's rows straight off its own table's index
+instead of joining through areas past every earlier event's rows.
+
+The copies are kept in step with the area:
+
+- signals.py sets them from the area on every save, and moves an area's
+  rows along when the area is moved to another incident (move_area());
+- bulk inserts call assign() before bulk_create;
+- a queryset.update() of area_id must set incident_id too (bulk.py).
+
+Pages show scope(request): the incident named by ?incident=<slug>, else
+the one a super admin picked on the incidents page, else every active
+incident. With no incidents (or none active) it is None and pages show
+everything. Change feed events carry the incident too, so a dashboard's
+live updates follow the same scope. The ids and slugs involved are cached for
+INCIDENT_CACHE_TIMEOUT seconds and dropped whenever an incident changes.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import (
+    ArchivedNeed, Area, AreaNeedSummary, Donation, Incident, Need, NeedRequest, Volunteer,
+)
+
+CACHE_KEY = 'incidents:catalog'
+# The super admin's pick, an incident id or ALL
+SESSION_KEY = 'incident_id'
+ALL = 'all'
+# Models holding a copy of their area's incident
+SCOPED_MODELS = (Need, ArchivedNeed, Donation, Volunteer, NeedRequest)
+
+
+def catalog():
+    """{'active': [ids, newest first], 'slugs': {slug: id}, 'names': {id: name}}, cached"""
+    data = cache.get(CACHE_KEY)
+    if data is None:
+        rows = list(Incident.objects.order_by('-started_at').values_list('id', 'slug', 'name', 'is_active'))
+        data = {
+            'active': [pk for pk, _, _, active in rows if active],
+            'slugs': {slug: pk for pk, slug, _, _ in rows},
+            'names': {pk: name for pk, _, name, _ in rows},
+        }
+        cache.set(CACHE_KEY, data, getattr(settings, 'INCIDENT_CACHE_TIMEOUT', 300))
+    return data
+
+
+def invalidate():
+    cache.delete(CACHE_KEY)
+
+
+def default_incident_id():
+    """The incident new areas join: the newest active one"""
+    active = catalog()['active']
+    return active[0] if active else None
+
+
+def selected(request):
+    """The incident id a super admin picked, ALL, or None when they haven't"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated or user.user_type != 'super_admin':
+        return None
+    return request.session.get(SESSION_KEY)
+
+
+def scope(request):
+    """Ids of the incidents request's pages show, or None for all rows (see module docstring)"""
+    if not hasattr(request, '_incident_scope'):
+        request._incident_scope = _scope(request)
+    return request._incident_scope
+
+
+async def ascope(request):
+    """scope() for async views"""
+    return await sync_to_async(scope)(request)
+
+
+def _scope(request):
+    data = catalog()
+    if not data['slugs']:
+        return None
+    slug = request.GET.get('incident')
+    if slug == ALL:
+        return None
+    if slug in data['slugs']:
+        return [data['slugs'][slug]]
+    picked = selected(request)
+    if picked == ALL:
+        return None
+    if picked in data['names']:
+        return [picked]
+    return data['active'] or None
+
+
+def label(incident_ids):
+    """What a scope shows, for page headings"""
+    if incident_ids is None:
+        return 'All incidents'
+    names = catalog()['names']
+    return ', '.join(names.get(pk, f'#{pk}') for pk in incident_ids)
+
+
+# Keeping the copies in step with areas
+
+def incident_of(area_id):
+    return Area.objects.filter(pk=area_id).values_list('incident_id', flat=True).first()
+
+
+def assign(objs):
+    """Set incident_id on objects about to be bulk created: areas get the default, the rest their area's"""
+    objs = [obj for obj in objs if isinstance(obj, (Area,) + SCOPED_MODELS)]
+    if not objs:
+        return
+    if isinstance(objs[0], Area):
+        default = default_incident_id()
+        for obj in objs:
+            if obj.incident_id is None:
+                obj.incident_id = default
+        return
+    incidents = dict(Area.objects.filter(id__in={obj.area_id for obj in objs}).values_list('id', 'incident_id'))
+    for obj in objs:
+        obj.incident_id = incidents.get(obj.area_id)
+
+
+def move_area(area):
+    """Give an area's rows its (new) incident; returns how many rows changed"""
+    moved = 0
+    for model in SCOPED_MODELS:
+        updates = {'incident_id': area.incident_id}
+        if model is Need:
+            # The API's ETags and sync pages go by updated_at
+            updates['updated_at'] = timezone.now()
+        moved += model.objects.filter(area_id=area.pk).exclude(incident_id=area.incident_id).update(**updates)
+    return moved
+
+
+# Statistics
+
+def statistics(incident_ids=None):
+    """
+    Per incident counts for the incidents page: {incident_id: {...}}.
+    Need counts come from the area summaries, the rest from one grouped
+    count per table over its incident index.
+    """
+    empty = {
+        'areas': 0, 'needs': 0, 'open_needs': 0, 'urgent_needs': 0, 'fulfilled_needs': 0,
+        'archived_needs': 0, 'donations': 0, 'volunteers': 0, 'need_requests': 0,
+    }
+    stats = {}
+
+    def add(rows, *names):
+        for incident_id, *values in rows:
+            entry = stats.setdefault(incident_id, dict(empty))
+            for name, value in zip(names, values):
+                entry[name] += value or 0
+
+    areas = Area.objects.for_incident(incident_ids)
+    add(areas.values_list('incident_id').annotate(n=Count('id')).order_by(), 'areas')
+    summaries = AreaNeedSummary.objects.all()
+    if incident_ids is not None:
+        summaries = summaries.filter(area__incident_id__in=incident_ids)
+    add(summaries.values_list('area__incident_id').annotate(
+        Sum('total_count'), Sum('open_count'), Sum('urgent_count'), Sum('fulfilled_count'),
+    ).order_by(), 'needs', 'open_needs', 'urgent_needs', 'fulfilled_needs')
+    for model, name in ((ArchivedNeed, 'archived_needs'), (Donation, 'donations'),
+                        (Volunteer, 'volunteers'), (NeedRequest, 'need_requests')):
+        rows = model.objects.for_incident(incident_ids)
+        if model is Volunteer or model is NeedRequest:
+            # Resubmissions are folded into the original (relief_app/dedup.py)
+            rows = rows.filter(duplicate_of__isnull=True)
+        add(rows.values_list('incident_id').annotate(n=Count('id')).order_by(), name)
+    return stats
@@ -0,0 +1,244 @@
+"""
+Public intake buffer for Hurricane Heroes
+
+During a surge every public form POST (need requests, volunteer signups,
+donations, contact messages) competing for SQLite's write lock makes the
+site crawl. With INTAKE_SPOOL_ENABLED the views append the submission to
+a local spool file and answer immediately; the drain_intake command
+moves spooled submissions into the database with bulk_create in batches.
+
+Spool layout (INTAKE_SPOOL_DIR):
+    incoming/<pid>.jsonl    one file per web worker, appended to under flock
+    processing/*.jsonl      segments claimed by the drainer
+    rejected/*.jsonl        records that failed validation
+    failed/*.jsonl          segments that could not be written after retries
+
+Delivery is at-least-once: if the drainer dies between writing a batch
+and removing its segment, that segment is written again on the next run.
+Records get their created_at when they are drained, not when submitted.
+"""
+import fcntl
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, transaction
+from django.utils import timezone
+
+from . import changefeed, incidents, rollups
+from .dedup import insert_deduplicated
+from .metrics import count_cache
+from .models import Area, Contact, Donation, NeedRequest, Volunteer
+
+logger = logging.getLogger(__name__)
+
+SUBMISSION_MODELS = {
+    'need_request': NeedRequest,
+    'volunteer': Volunteer,
+    'donation': Donation,
+    'contact': Contact,
+}
+
+# Models whose resubmissions are folded by relief_app.dedup
+DEDUP_MODELS = (NeedRequest, Volunteer)
+
+AREA_IDS_CACHE_KEY = 'intake:area_ids'
+AREA_IDS_CACHE_TIMEOUT = 60
+
+
+def spool_enabled():
+    return getattr(settings, 'INTAKE_SPOOL_ENABLED', False)
+
+
+def spool_dir():
+    return Path(getattr(settings, 'INTAKE_SPOOL_DIR', settings.BASE_DIR / 'spool'))
+
+
+def _subdir(name):
+    path = spool_dir() / name
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def known_area(area_id):
+    """Check an area id against a cached id set, hitting the DB only for unknown ids"""
+    try:
+        area_id = int(area_id)
+    except (TypeError, ValueError):
+        return False
+    area_ids = cache.get(AREA_IDS_CACHE_KEY)
+    count_cache('area_ids', area_ids is not None and area_id in area_ids)
+    if area_ids is None or area_id not in area_ids:
+        # Refresh once so shelters created in the last minute are accepted
+        area_ids = set(Area.objects.values_list('id', flat=True))
+        cache.set(AREA_IDS_CACHE_KEY, area_ids, AREA_IDS_CACHE_TIMEOUT)
+    return area_id in area_ids
+
+
+def enqueue(kind, data):
+    """Append one submission to this worker's spool file"""
+    if kind not in SUBMISSION_MODELS:
+        raise ValueError(f'Unknown submission kind: {kind}')
+    line = json.dumps({
+        'id': uuid.uuid4().hex,
+        'kind': kind,
+        'data': data,
+        'received_at': timezone.now().isoformat(),
+    }, separators=(',', ':')) + '\n'
+    path = _subdir('incoming') / f'{os.getpid()}.jsonl'
+    fsync = getattr(settings, 'INTAKE_SPOOL_FSYNC', False)
+
+    while True:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o640)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            # The drainer may have claimed (renamed) the file while we waited
+            try:
+                same_file = os.fstat(fd).st_ino == os.stat(path).st_ino
+            except FileNotFoundError:
+                same_file = False
+            if same_file:
+                os.write(fd, line.encode('utf-8'))
+                if fsync:
+                    os.fsync(fd)
+                return
+        finally:
+            os.close(fd)
+
+
+def submit(kind, data):
+    """
+    Accept a public form submission.
+
+    Spooled when INTAKE_SPOOL_ENABLED, otherwise written straight to the
+    database. Raises Area.DoesNotExist for an unknown shelter either way.
+    """
+    area_id = data.get('area_id')
+    if not spool_enabled():
+        if area_id is not None:
+            Area.objects.only('id').get(id=area_id)
+        model = SUBMISSION_MODELS[kind]
+        if model not in DEDUP_MODELS:
+            return model.objects.create(**data)
+        obj = model(**data)
+        # No surrounding transaction: under SQLite a read followed by a write
+        # in one transaction fails outright ("database is locked") when
+        # another request holds the write lock, instead of waiting for it
+        insert_deduplicated(model, [obj])
+        return obj
+    if area_id is not None and not known_area(area_id):
+        raise Area.DoesNotExist('Selected shelter not found.')
+    enqueue(kind, data)
+    return None
+
+
+def claim_segments():
+    """Move every incoming spool file to processing/ and return the claimed paths"""
+    incoming = _subdir('incoming')
+    processing = _subdir('processing')
+    for path in sorted(incoming.glob('*.jsonl')):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            # Wait for any in-flight append, then rename while still holding the lock
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size:
+                os.rename(path, processing / f'{path.stem}-{time.time_ns()}.jsonl')
+        finally:
+            os.close(fd)
+    return sorted(processing.glob('*.jsonl'))
+
+
+def _build(record):
+    model = SUBMISSION_MODELS[record['kind']]
+    obj = model(**record['data'])
+    obj.full_clean(exclude=['area'])
+    return model, obj
+
+
+def _write_lines(path, lines):
+    if lines:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.writelines(lines)
+
+
+def _bulk_insert(by_model, batch_size, max_retries):
+    """bulk_create every model's objects in one transaction, retrying on lock errors"""
+    delay = 0.2
+    for attempt in range(max_retries + 1):
+        try:
+            with transaction.atomic():
+                for model, objs in by_model.items():
+                    incidents.assign(objs)
+                    if model in DEDUP_MODELS:
+                        insert_deduplicated(model, objs, batch_size=batch_size)
+                    else:
+                        model.objects.bulk_create(objs, batch_size=batch_size)
+                        if model in changefeed.TRACKED:
+                            changefeed.record_created(objs)
+                        rollups.mark_objects(objs)
+            return
+        except OperationalError as e:
+            if attempt == max_retries:
+                raise
+            logger.warning('Intake drain retry %s after database error: %s', attempt + 1, e)
+            time.sleep(delay)
+            delay = min(delay * 2, 5)
+
+
+def drain_segment(path, area_ids, batch_size=500, max_retries=5):
+    """Write one claimed segment to the database; returns (written, rejected)"""
+    written = rejected = 0
+    rejects = []
+    by_model = {}
+
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                area_id = record['data'].get('area_id')
+                if area_id is not None and int(area_id) not in area_ids:
+                    raise ValueError('unknown area')
+                model, obj = _build(record)
+            except Exception as e:
+                logger.warning('Rejected intake record in %s: %s', path.name, e)
+                rejects.append(line if line.endswith('\n') else line + '\n')
+                rejected += 1
+                continue
+            by_model.setdefault(model, []).append(obj)
+            written += 1
+
+    try:
+        _bulk_insert(by_model, batch_size, max_retries)
+    except OperationalError:
+        os.rename(path, _subdir('failed') / path.name)
+        raise
+    _write_lines(_subdir('rejected') / path.name, rejects)
+    path.unlink()
+    return written, rejected
+
+
+def drain_spool(batch_size=500, max_retries=5):
+    """Drain everything currently in the spool; returns counters"""
+    stats = {'segments': 0, 'written': 0, 'rejected': 0, 'failed_segments': 0}
+    segments = claim_segments()
+    if not segments:
+        return stats
+    area_ids = set(Area.objects.values_list('id', flat=True))
+    for path in segments:
+        stats['segments'] += 1
+        try:
+            written, rejected = drain_segment(path, area_ids, batch_size, max_retries)
+        except OperationalError as e:
+            logger.error('Intake segment %s moved to failed/: %s', path.name, e)
+            stats['failed_segments'] += 1
+            continue
+        stats['written'] += written
+        stats['rejected'] += rejected
+    return stats
@@ -0,0 +1,184 @@
+"""
+Inventory ledger for Hurricane Heroes
+
+Every stock movement is appended to InventoryEntry and, in the same
+transaction, applied to the (area, product) row of InventoryBalance with
+an F() increment. Reading a balance is a single lookup on the unique
+(area, product) index, however long the ledger gets.
+
+Old entries can be compacted into one 'compacted' entry per
+(area, product), and balances can be verified or rebuilt from the
+ledger at any time.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import InventoryBalance, InventoryEntry
+
+
+class LedgerError(Exception):
+    """Raised for invalid stock movements"""
+
+
+def _apply(area_id, product_id, delta, entries=1):
+    """Add delta to the running balance, creating the row on first use"""
+    updated = InventoryBalance.objects.filter(area_id=area_id, product_id=product_id).update(
+        balance=F('balance') + delta, entry_count=F('entry_count') + entries, updated_at=timezone.now()
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            InventoryBalance.objects.create(
+                area_id=area_id, product_id=product_id, balance=delta, entry_count=entries
+            )
+    except IntegrityError:
+        # Another request created the row first
+        InventoryBalance.objects.filter(area_id=area_id, product_id=product_id).update(
+            balance=F('balance') + delta, entry_count=F('entry_count') + entries, updated_at=timezone.now()
+        )
+
+
+def record_entry(area_id, product_id, entry_type, quantity, reference='', notes='', user=None,
+                 allow_negative=False):
+    """Append one signed movement to the ledger and update the balance"""
+    if quantity == 0:
+        raise LedgerError('Quantity must not be zero')
+    with transaction.atomic():
+        if quantity < 0 and not allow_negative:
+            current = (
+                InventoryBalance.objects.select_for_update()
+                .filter(area_id=area_id, product_id=product_id)
+                .values_list('balance', flat=True).first()
+            ) or 0
+            if current + quantity < 0:
+                raise LedgerError(f'Insufficient stock: {current} available, {-quantity} requested')
+        entry = InventoryEntry.objects.create(
+            area_id=area_id,
+            product_id=product_id,
+            entry_type=entry_type,
+            quantity=quantity,
+            reference=reference,
+            notes=notes,
+            created_by=user,
+        )
+        _apply(area_id, product_id, quantity)
+    return entry
+
+
+def record_receipt(area_id, product_id, quantity, **kwargs):
+    """Stock arrived at a shelter"""
+    return record_entry(area_id, product_id, 'receipt', abs(quantity), **kwargs)
+
+
+def record_distribution(area_id, product_id, quantity, **kwargs):
+    """Stock handed out at a shelter"""
+    return record_entry(area_id, product_id, 'distribution', -abs(quantity), **kwargs)
+
+
+def record_transfer(from_area_id, to_area_id, product_id, quantity, reference='', **kwargs):
+    """Move stock between shelters as a matched pair of entries"""
+    if from_area_id == to_area_id:
+        raise LedgerError('Cannot transfer to the same shelter')
+    quantity = abs(quantity)
+    with transaction.atomic():
+        out_entry = record_entry(from_area_id, product_id, 'transfer_out', -quantity,
+                                 reference=reference or f'transfer to area {to_area_id}', **kwargs)
+        in_entry = record_entry(to_area_id, product_id, 'transfer_in', quantity,
+                                reference=reference or f'transfer from area {from_area_id}', **kwargs)
+    return out_entry, in_entry
+
+
+def get_balance(area_id, product_id):
+    """Current stock of a product at a shelter (one indexed lookup)"""
+    return (
+        InventoryBalance.objects.filter(area_id=area_id, product_id=product_id)
+        .values_list('balance', flat=True).first()
+    ) or 0
+
+
+def get_area_balances(area_id):
+    """{product_id: balance} for every product a shelter has stock records for"""
+    return dict(InventoryBalance.objects.filter(area_id=area_id).values_list('product_id', 'balance'))
+
+
+def _ledger_totals():
+    rows = (
+        InventoryEntry.objects.values('area_id', 'product_id')
+        .annotate(total=Sum('quantity'), n=Count('id'))
+        .order_by()
+    )
+    return {(r['area_id'], r['product_id']): (r['total'], r['n']) for r in rows}
+
+
+def verify_balances():
+    """
+    Compare every snapshot balance with the sum of its ledger entries.
+
+    Returns a list of (area_id, product_id, snapshot_balance, ledger_balance)
+    for the pairs that disagree.
+    """
+    totals = _ledger_totals()
+    snapshots = {
+        (a, p): b for a, p, b in InventoryBalance.objects.values_list('area_id', 'product_id', 'balance')
+    }
+    mismatches = []
+    for key in set(totals) | set(snapshots):
+        ledger_balance = totals.get(key, (0, 0))[0]
+        snapshot_balance = snapshots.get(key, 0)
+        if ledger_balance != snapshot_balance:
+            mismatches.append((key[0], key[1], snapshot_balance, ledger_balance))
+    return sorted(mismatches)
+
+
+def rebuild_balances(batch_size=1000):
+    """Recreate the whole snapshot table from the ledger"""
+    balances = [
+        InventoryBalance(area_id=a, product_id=p, balance=total, entry_count=n)
+        for (a, p), (total, n) in _ledger_totals().items()
+    ]
+    with transaction.atomic():
+        InventoryBalance.objects.all().delete()
+        InventoryBalance.objects.bulk_create(balances, batch_size=batch_size)
+    return len(balances)
+
+
+def compact_entries(older_than_days=90, batch_size=1000):
+    """
+    Fold ledger entries older than the cutoff into one 'compacted' entry
+    per (area, product). Balances do not change; entry counts shrink.
+
+    Returns the number of entries removed.
+    """
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    with transaction.atomic():
+        old = InventoryEntry.objects.filter(created_at__lt=cutoff)
+        # A single old entry is already as small as it gets
+        groups = [
+            g for g in old.values('area_id', 'product_id').annotate(total=Sum('quantity'), n=Count('id')).order_by()
+            if g['n'] > 1
+        ]
+        if not groups:
+            return 0
+        removed = 0
+        carried = []
+        for group in groups:
+            old.filter(area_id=group['area_id'], product_id=group['product_id']).delete()
+            carried.append(InventoryEntry(
+                area_id=group['area_id'],
+                product_id=group['product_id'],
+                entry_type='compacted',
+                quantity=group['total'],
+                reference=f'{group["n"]} entries before {cutoff:%Y-%m-%d}',
+            ))
+            InventoryBalance.objects.filter(area_id=group['area_id'], product_id=group['product_id']).update(
+                entry_count=F('entry_count') - group['n'] + 1
+            )
+            removed += group['n'] - 1
+        created = InventoryEntry.objects.bulk_create(carried, batch_size=batch_size)
+        # auto_now_add stamps "now"; date the carried balance at the cutoff instead
+        InventoryEntry.objects.filter(id__in=[e.id for e in created]).update(created_at=cutoff)
+    return removed
@@ -0,0 +1,35 @@
+"""
+Move old closed needs to the archive table
+Run with: python manage.py archive_needs [--days 90] [--batch-size 1000] [--dry-run]
+
+Run nightly from cron. Fulfilled and cancelled needs unchanged for
+--days are moved to ArchivedNeed a batch at a time, so each transaction
+stays short. Archived needs can be browsed and restored in the admin.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from relief_app.archive import archivable, archive_needs
+
+
+class Command(BaseCommand):
+    help = 'Move fulfilled and cancelled needs older than N days to the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float,
+                            default=getattr(settings, 'NEED_ARCHIVE_AFTER_DAYS', 90),
+                            help='Archive needs closed and unchanged for N days')
+        parser.add_argument('--batch-size', type=int,
+                            default=getattr(settings, 'NEED_ARCHIVE_BATCH_SIZE', 1000),
+                            help='Needs moved per transaction')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the needs that would be archived')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = archivable(options['days']).count()
+            self.stdout.write(f'{count} needs would be archived')
+            return
+        moved = archive_needs(days=options['days'], batch_size=options['batch_size'],
+                              log=lambda message: self.stdout.write(message))
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} needs'))
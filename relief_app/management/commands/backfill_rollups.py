@@ -0,0 +1,32 @@
+"""
+Rebuild the trend rollups from the need, donation and volunteer tables
+Run with: python manage.py backfill_rollups [--kind need] [--days 30]
+
+Rollups are kept current as rows are saved, so this is for the first
+deploy, after restoring a database, or after writes that bypassed the
+ORM. With --days only the last N days (whole days) are rebuilt.
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from relief_app.rollups import SOURCES, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild hourly and daily trend rollups from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', choices=sorted(SOURCES),
+                            help='Rebuild only this kind (repeatable)')
+        parser.add_argument('--days', type=float, help='Rebuild only the last N days')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days']) if options['days'] else None
+        started = time.perf_counter()
+        written = rebuild_rollups(kinds=options['kind'], since=since)
+        for kind, count in written.items():
+            self.stdout.write(f'{kind}: {count:,} rollup rows')
+        self.stdout.write(self.style.SUCCESS(f'Rollups rebuilt in {time.perf_counter() - started:.1f}s'))
@@ -0,0 +1,104 @@
+"""
+Compare the JSON API's throughput with the HTML pages partners scrape
+Run with: python manage.py bench_api [--scale 1] [--iterations 50]
+
+Seeds the synthetic dataset into a throwaway test database (like
+check_budgets) and fetches the same data both ways: the area list, one
+shelter's needs and the home page's open needs. Page caching is off, so
+every request does its full work. Where the HTML page shows everything,
+the API listing is timed as the whole walk through its pages. Also times
+a conditional request that gets a 304.
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from relief_app.budgets import seed_dataset
+
+from .bench_slow_clients import percentile
+
+
+def fetch(client, url, headers=None, walk=False):
+    """Fetch url and, with walk, every API page after it; returns (bytes, queries, status)"""
+    size = queries = 0
+    while url:
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(url, headers=headers)
+        size += len(response.content)
+        queries += len(captured)
+        url = json.loads(response.content)['next'] if walk and response.status_code == 200 else None
+    return size, queries, response.status_code
+
+
+class Command(BaseCommand):
+    help = 'Measure requests per second of the JSON API against the equivalent HTML pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1, help='Dataset size (1 = 200 shelters, 20k needs)')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def measure(self, client, url, iterations, headers=None, walk=False):
+        fetch(client, url, headers, walk)
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            size, queries, status = fetch(client, url, headers, walk)
+            timings.append(time.perf_counter() - started)
+        return {
+            'per_s': len(timings) / sum(timings),
+            'p95_ms': percentile(timings, 95) * 1000,
+            'bytes': size,
+            'queries': queries,
+            'status': status,
+        }
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            fixtures = seed_dataset(scale=options['scale'], seed=options['seed'])
+            area_id = fixtures['area_id']
+            needs = reverse('api_list', kwargs={'resource': 'needs'})
+            # (label, HTML page, API request, walk the API pages)
+            cases = [
+                ('areas', reverse('public_areas'), reverse('api_list', kwargs={'resource': 'areas'}) + '?limit=1000', True),
+                ("one shelter's needs", reverse('public_area_detail', kwargs={'area_id': area_id}),
+                 f'{needs}?area={area_id}&limit=1000', True),
+                ('  sparse fields', None,
+                 f'{needs}?area={area_id}&limit=1000&fields=id,product_name,quantity,priority,status', True),
+                # The home page shows the first 50
+                ('open needs (home)', reverse('public_home'), f'{needs}?status=pending,in_progress&limit=50', False),
+            ]
+            client = Client()
+            with override_settings(
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+                RATE_LIMIT_ENABLED=False,
+                SLOW_QUERY_THRESHOLD_MS=float('inf'),
+            ):
+                self.stdout.write(f'{"":<22} {"req/s":>8} {"p95":>9} {"bytes":>11} {"queries":>8}')
+                for label, html_url, api_url, walk in cases:
+                    if html_url:
+                        self.report(label, 'html', self.measure(client, html_url, options['iterations']))
+                    self.report('' if html_url else label, 'api',
+                                self.measure(client, api_url, options['iterations'], walk=walk))
+
+                url = cases[1][2]
+                etag = client.get(url)['ETag']
+                self.report('  unchanged (304)', 'api', self.measure(
+                    client, url, options['iterations'], headers={'If-None-Match': etag}
+                ))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def report(self, label, kind, result):
+        self.stdout.write(
+            f'{label:<22} {kind:<5} {result["per_s"]:>7.1f} {result["p95_ms"]:>7.1f}ms {result["bytes"]:>11,} '
+            f'{result["queries"]:>8}' + ('' if result['status'] in (200, 304) else f'  HTTP {result["status"]}')
+        )
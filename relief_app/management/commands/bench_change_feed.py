@@ -0,0 +1,154 @@
+"""
+Load test the change feed stream with many concurrent dashboards
+Run with: python manage.py bench_change_feed [--clients 200] [--events 50] [--server asgi]
+
+Starts gunicorn with the shipped gunicorn_config.py on a local port,
+connects N logged-in super admin clients to the change feed stream, then
+creates needs in a throwaway area at a steady rate. Reports how many of
+the expected events every client received and how long they took to
+arrive after the write. --server gthread runs the config's threaded WSGI
+mode with one thread per client (GUNICORN_THREADS), since each open
+stream holds one; the config's plain sync workers don't serve streams.
+The area, its needs and their events are deleted afterwards.
+"""
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from relief_app.models import Area, ChangeEvent, Need, Product
+
+from .bench_slow_clients import free_port, percentile, start_server
+
+User = get_user_model()
+AREA_NAME = 'Change feed load test'
+
+
+async def listen(port, session, since, received, connected, timeout):
+    """Read the stream, noting when each need event arrives; connected gets whether it got in"""
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+        connected.set_result(False)
+        return
+    try:
+        # HTTP/1.0 so the stream is not chunked
+        writer.write(
+            f'GET /changes/stream/?since={since} HTTP/1.0\r\nHost: localhost\r\n'
+            f'Cookie: sessionid={session}\r\n\r\n'.encode()
+        )
+        await writer.drain()
+        try:
+            status = await asyncio.wait_for(reader.readline(), timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            # Every server thread is taken by another stream
+            connected.set_result(False)
+            return
+        if b' 200 ' not in status:
+            connected.set_exception(CommandError(f'Stream refused: {status.decode().strip()}'))
+            return
+        connected.set_result(True)
+        event = None
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            line = line.decode().rstrip('\r\n')
+            if line.startswith('event: '):
+                event = line[7:]
+            elif line.startswith('data: ') and event == 'need':
+                received.append((json.loads(line[6:])['object_id'], time.time()))
+    finally:
+        writer.close()
+
+
+class Command(BaseCommand):
+    help = 'Measure change feed delivery to many concurrent stream clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200)
+        parser.add_argument('--events', type=int, default=50, help='Needs to create')
+        parser.add_argument('--rate', type=float, default=10, help='Needs created per second')
+        parser.add_argument('--workers', type=int, default=2, help='Gunicorn worker processes')
+        parser.add_argument('--server', choices=['asgi', 'gthread'], default='asgi')
+
+    def _write(self, area, product, options, written):
+        for i in range(options['events']):
+            need = Need.objects.create(area=area, product=product, quantity=1 + i, priority='medium')
+            written[need.pk] = time.time()
+            time.sleep(1 / options['rate'])
+        connection.close()
+
+    async def _run(self, port, session, since, area, product, options):
+        streams = [[] for _ in range(options['clients'])]
+        loop = asyncio.get_running_loop()
+        connected = [loop.create_future() for _ in streams]
+        started = time.perf_counter()
+        tasks = [
+            asyncio.create_task(listen(port, session, since, received, ready, 20))
+            for received, ready in zip(streams, connected)
+        ]
+        accepted = sum(await asyncio.gather(*connected))
+        connect_time = time.perf_counter() - started
+
+        written = {}
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            await loop.run_in_executor(pool, self._write, area, product, options, written)
+        # Give the poller a couple of rounds to deliver the last ones
+        await asyncio.sleep(3)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return streams, written, accepted, connect_time
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(user_type='super_admin', is_active=True).first()
+        product = Product.objects.first()
+        if user is None or product is None:
+            raise CommandError('Needs a super admin and a product, run populate_data first')
+        client = Client()
+        client.force_login(user)
+        session = client.cookies['sessionid'].value
+
+        area = Area.objects.create(name=AREA_NAME, description='', address='', pincode='00000')
+        since = ChangeEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        port = free_port()
+        if options['server'] == 'gthread':
+            threads = options['clients'] // options['workers'] + 4
+            server = start_server('sync', port, options['workers'], {'GUNICORN_THREADS': str(threads)})
+        else:
+            server = start_server('asgi', port, options['workers'])
+        try:
+            streams, written, accepted, connect_time = asyncio.run(
+                self._run(port, session, since, area, product, options)
+            )
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+            need_ids = list(Need.objects.filter(area=area).values_list('id', flat=True))
+            area.delete()
+            ChangeEvent.objects.filter(kind='need', object_id__in=need_ids).delete()
+            client.logout()
+
+        expected = len(written) * len(streams)
+        latencies = [
+            arrived - written[object_id]
+            for received in streams for object_id, arrived in received if object_id in written
+        ]
+        complete = sum(1 for received in streams if {o for o, _ in received} >= set(written))
+        self.stdout.write(
+            f'{options["server"]}: {accepted}/{len(streams)} clients connected in {connect_time:.1f}s, '
+            f'{len(written)} needs written at {options["rate"]:g}/s'
+        )
+        self.stdout.write(
+            f'  {len(latencies)}/{expected} events delivered, {complete}/{len(streams)} clients got all of them'
+        )
+        self.stdout.write(
+            f'  write to delivery p50 {percentile(latencies, 50) * 1000:.0f}ms  '
+            f'p95 {percentile(latencies, 95) * 1000:.0f}ms  max {max(latencies, default=0) * 1000:.0f}ms'
+        )
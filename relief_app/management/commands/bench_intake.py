@@ -0,0 +1,89 @@
+"""
+Load test the public intake path, direct writes vs the spool
+Run with: python manage.py bench_intake [--requests 2000] [--concurrency 16]
+
+Posts need requests through the real view with N concurrent clients,
+once writing straight to the database and once through the spool, then
+times the drainer. Rate limiting is off for the run, and rows created
+by it are deleted afterwards.
+"""
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from relief_app.intake import drain_spool
+from relief_app.models import Area, NeedRequest
+
+EMAIL_DOMAIN = 'loadtest.invalid'
+
+
+class Command(BaseCommand):
+    help = 'Measure public need request submissions per second with and without the intake spool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=16)
+
+    def _run(self, label, total, concurrency, area_ids):
+        url = reverse('public_need_request')
+
+        def worker(start):
+            client = Client()
+            ok = 0
+            for i in range(start, total, concurrency):
+                response = client.post(url, {
+                    'name': f'Load Test {i}',
+                    # Unique per run so the duplicate check does not fold them
+                    'email': f'{label}{i}@{EMAIL_DOMAIN}',
+                    'area': area_ids[i % len(area_ids)],
+                    'item_needed': 'Bottled water',
+                    'quantity': 1 + i % 20,
+                    'urgency': 'medium',
+                })
+                # A successful submission redirects back to the form
+                ok += response.status_code == 302
+            connection.close()
+            return ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            accepted = sum(pool.map(worker, range(concurrency)))
+        return accepted, time.perf_counter() - started
+
+    def _report(self, label, accepted, total, elapsed):
+        self.stdout.write(
+            f'{label:<8} {accepted}/{total} accepted in {elapsed:.2f}s '
+            f'({accepted / elapsed:.0f} submissions/s, {(total - accepted)} failed)'
+        )
+
+    def handle(self, *args, **options):
+        total, concurrency = options['requests'], options['concurrency']
+        area_ids = list(Area.objects.values_list('id', flat=True)[:50])
+        if not area_ids:
+            raise CommandError('No areas found, run populate_data first')
+
+        try:
+            with override_settings(INTAKE_SPOOL_ENABLED=False, RATE_LIMIT_ENABLED=False):
+                accepted, elapsed = self._run('direct', total, concurrency, area_ids)
+            self._report('direct', accepted, total, elapsed)
+
+            with tempfile.TemporaryDirectory() as spool, \
+                    override_settings(INTAKE_SPOOL_ENABLED=True, INTAKE_SPOOL_DIR=spool,
+                                      RATE_LIMIT_ENABLED=False):
+                accepted, elapsed = self._run('spooled', total, concurrency, area_ids)
+                self._report('spooled', accepted, total, elapsed)
+                started = time.perf_counter()
+                stats = drain_spool()
+                drained = time.perf_counter() - started
+            self.stdout.write(
+                f'drain    {stats["written"]} rows written in {drained:.2f}s '
+                f'({stats["written"] / max(drained, 1e-9):.0f} rows/s, {stats["rejected"]} rejected)'
+            )
+        finally:
+            deleted, _ = NeedRequest.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').delete()
+            self.stdout.write(self.style.SUCCESS(f'Removed {deleted} load test rows'))
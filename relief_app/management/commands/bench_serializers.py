@@ -0,0 +1,96 @@
+"""
+Micro-benchmark the JSON encoding of API and chart payloads
+Run with: python manage.py bench_serializers [--rows 1000] [--repeat 5]
+
+Encodes generated rows shaped like the real payloads (an API needs page,
+the map's shelters, the chart's needs by area, a sync page) three ways:
+dicts through json.dumps with DjangoJSONEncoder, as the views used to,
+and relief_app/serializers.py with each of its backends. Only encoding is
+timed, no database access. The orjson column is skipped when orjson is
+not installed.
+"""
+import json
+import random
+import timeit
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import override_settings
+from django.utils import timezone
+
+from relief_app import serializers
+from relief_app.api import RESOURCES
+from relief_app.views import CHART_AREA_SCHEMA, SHELTER_SCHEMA
+
+WORDS = ['water', 'rice', 'blankets', 'insulin', 'tarpaulin', 'Mumbai', 'Pune', 'shelter', 'urgent', 'école']
+
+
+def text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def need_row(rng, i, now):
+    created = now - timedelta(seconds=rng.randrange(10_000_000), microseconds=rng.randrange(1_000_000))
+    return (i, rng.randrange(200), text(rng, 2), rng.randrange(50), text(rng, 2), 'kg', rng.randrange(8), text(rng, 1),
+            rng.randrange(1, 500), rng.choice(['low', 'medium', 'high', 'urgent']), 'pending',
+            text(rng, rng.randrange(0, 8)), created, created + timedelta(hours=1))
+
+
+def shelter_row(rng, i):
+    return (i, text(rng, 2), text(rng, 5), str(rng.randrange(100000, 999999)),
+            rng.uniform(24, 31), rng.uniform(-88, -80), rng.randrange(5000))
+
+
+class Command(BaseCommand):
+    help = 'Compare json.dumps with the schema encoders on API and chart shaped payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows per payload')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        n = options['rows']
+        needs_schema = RESOURCES['needs'].schema(list(RESOURCES['needs'].fields))
+        needs = [need_row(rng, i, now) for i in range(n)]
+        shelters = [shelter_row(rng, i) for i in range(n)]
+        areas = [(i, text(rng, 2), rng.randrange(10000)) for i in range(n)]
+        sync_rows = [[row[0], row[1], row[3], row[8], row[9], row[10], row[11], row[12]] for row in needs]
+
+        def as_dicts(schema, rows):
+            return [dict(zip(schema.names, row)) for row in rows]
+
+        # (label, old way, new way)
+        cases = [
+            ('api needs page',
+             lambda: json.dumps({'data': as_dicts(needs_schema, needs), 'next': None}, cls=DjangoJSONEncoder),
+             lambda: serializers.dumps_object({'data': needs_schema.encode_rows(needs), 'next': None})),
+            ('map shelters',
+             lambda: json.dumps(as_dicts(SHELTER_SCHEMA, shelters)),
+             lambda: SHELTER_SCHEMA.encode_rows(shelters, html_safe=True)),
+            ('chart needs by area',
+             lambda: json.dumps({'needs_by_area': as_dicts(CHART_AREA_SCHEMA, areas)}, cls=DjangoJSONEncoder),
+             lambda: serializers.dumps_object({'needs_by_area': CHART_AREA_SCHEMA.encode_rows(areas)})),
+            ('sync page (columnar)',
+             lambda: json.dumps({'upserts': {'need': {'rows': sync_rows}}}, cls=DjangoJSONEncoder, separators=(',', ':')),
+             lambda: serializers.dumps({'upserts': {'need': {'rows': sync_rows}}})),
+        ]
+        backends = ['json'] + (['orjson'] if serializers.orjson is not None else [])
+
+        self.stdout.write(f'{n} rows per payload, best of {options["repeat"]}')
+        self.stdout.write(f'{"":<22} {"json.dumps":>11}' + ''.join(f' {"schema/" + b:>20}' for b in backends))
+        for label, old, new in cases:
+            baseline = self.time(old, options['repeat'])
+            line = f'{label:<22} {baseline:>9.2f}ms'
+            for name in backends:
+                with override_settings(JSON_BACKEND=name):
+                    elapsed = self.time(new, options['repeat'])
+                line += f' {elapsed:>9.2f}ms ({baseline / elapsed:>4.1f}x)'
+            self.stdout.write(line)
+
+    def time(self, func, repeat):
+        number = max(1, int(0.2 / max(timeit.timeit(func, number=1), 1e-6)))
+        return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1000
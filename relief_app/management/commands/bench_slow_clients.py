@@ -0,0 +1,164 @@
+"""
+Load test the public pages under slow clients, sync WSGI vs ASGI workers
+Run with: python manage.py bench_slow_clients [--workers 2] [--slow-clients 50] [--duration 15]
+
+Starts gunicorn twice on a local port with the shipped gunicorn_config.py,
+once with sync workers serving relief_system.wsgi and once with uvicorn
+workers serving relief_system.asgi (the async public views). For each, opens N slow clients that trickle
+their request headers in a few bytes at a time, the way phones on a bad
+connection do, and meanwhile has a handful of normal clients fetch the
+public pages in a loop. Reports how many of the normal requests got
+through and their latency.
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PAGES = ['/', '/areas/', '/map/', '/blog/']
+
+# Environment gunicorn_config.py picks each server's workers from
+SERVERS = {
+    'sync': {},
+    'asgi': {'RELIEF_ASGI': 'True'},
+}
+
+
+def start_server(kind, port, workers, extra_env=None):
+    """
+    Start gunicorn with the shipped gunicorn_config.py serving kind ('sync'
+    or 'asgi') on port; returns the process once it answers. Only the
+    socket, worker count, user and logging are overridden.
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'relief_system.settings'),
+               ASYNC_PUBLIC_VIEWS=str(kind == 'asgi'), PROFILING_ENABLED='False',
+               GUNICORN_USER=str(os.getuid()), GUNICORN_GROUP=str(os.getgid()), **SERVERS[kind], **(extra_env or {}))
+    # Left to the config and relief_system/asgi.py, as in production
+    env.pop('CHANGE_FEED_LIVE', None)
+    command = [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn_config.py', '--bind', f'127.0.0.1:{port}',
+               '--workers', str(workers), '--access-logfile', os.devnull, '--log-level', 'warning']
+    server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if asyncio.run(fetch(port, '/about/', 5)) == 200:
+                return server
+        except (ConnectionError, OSError, asyncio.TimeoutError):
+            pass
+        if server.poll() is not None:
+            break
+        time.sleep(0.5)
+    server.kill()
+    raise CommandError(f'{kind} server did not start, are gunicorn and uvicorn installed?')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def fetch(port, path, timeout):
+    """GET path over a fresh connection, returns the status code"""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+        return int(response.split(b' ', 2)[1]) if response else 0
+    finally:
+        writer.close()
+
+
+async def slow_client(port, stop, drip):
+    """Hold a connection open by sending a header a byte every `drip` seconds"""
+    while not stop.is_set():
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'GET /areas/ HTTP/1.1\r\nHost: localhost\r\n')
+            for byte in b'X-Slow: ' + b'a' * 10000:
+                if stop.is_set():
+                    break
+                writer.write(bytes([byte]))
+                await writer.drain()
+                await asyncio.sleep(drip)
+            writer.close()
+        except (ConnectionError, OSError):
+            # The server timed us out; reconnect and keep a worker busy again
+            await asyncio.sleep(drip)
+
+
+async def fast_client(port, stop, timeout, results):
+    i = 0
+    while not stop.is_set():
+        path = PAGES[i % len(PAGES)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            status = await fetch(port, path, timeout)
+        except (asyncio.TimeoutError, ConnectionError, OSError):
+            status = 0
+        results.append((status, time.perf_counter() - started))
+
+
+async def load(port, options):
+    stop = asyncio.Event()
+    results = []
+    slow = [asyncio.create_task(slow_client(port, stop, options['drip'])) for _ in range(options['slow_clients'])]
+    # Let the slow clients take their connections first
+    await asyncio.sleep(1)
+    fast = [asyncio.create_task(fast_client(port, stop, options['timeout'], results))
+            for _ in range(options['fast_clients'])]
+    await asyncio.sleep(options['duration'])
+    stop.set()
+    await asyncio.gather(*fast, return_exceptions=True)
+    for task in slow:
+        task.cancel()
+    await asyncio.gather(*slow, return_exceptions=True)
+    return results
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else 0.0
+
+
+class Command(BaseCommand):
+    help = 'Compare sync and ASGI workers serving the public pages while slow clients hold connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Gunicorn worker processes')
+        parser.add_argument('--slow-clients', type=int, default=50)
+        parser.add_argument('--fast-clients', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=15, help='Seconds of load per server')
+        parser.add_argument('--drip', type=float, default=0.5, help='Seconds between slow client bytes')
+        parser.add_argument('--timeout', type=float, default=10, help='Normal client timeout in seconds')
+        parser.add_argument('--only', choices=sorted(SERVERS), help='Run one server only')
+
+    def handle(self, *args, **options):
+        kinds = [options['only']] if options['only'] else list(SERVERS)
+        self.stdout.write(
+            f'{options["workers"]} workers, {options["slow_clients"]} slow clients, '
+            f'{options["fast_clients"]} normal clients, {options["duration"]:.0f}s each'
+        )
+        for kind in kinds:
+            port = free_port()
+            server = start_server(kind, port, options['workers'])
+            try:
+                results = asyncio.run(load(port, options))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+            ok = [elapsed for status, elapsed in results if status == 200]
+            failed = len(results) - len(ok)
+            self.stdout.write(
+                f'{kind:<5} {len(ok)}/{len(results)} ok ({len(ok) / options["duration"]:.1f} req/s, {failed} failed or '
+                f'timed out)  p50 {percentile(ok, 50) * 1000:.0f}ms  p95 {percentile(ok, 95) * 1000:.0f}ms  '
+                f'max {max(ok, default=0) * 1000:.0f}ms'
+            )
@@ -0,0 +1,222 @@
+"""
+Check every named URL against its query-count and latency budget
+Run with: python manage.py check_budgets [--scale 1] [--iterations 10] [--compare previous.json]
+
+Seeds a synthetic dataset into a throwaway test database (the real
+database is not touched), requests every URL declared in
+relief_app/budgets.py as the right user type and records query count,
+p50/p95 latency and response size. Results are written as JSON to
+perf_results/ for comparing runs between commits. Exits with an error
+when any view is over budget or a named URL has no budget.
+"""
+import gc
+import json
+import logging
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from relief_app.budgets import BUDGETS, seed_dataset
+
+
+def named_urls():
+    """URL names defined in relief_app/urls.py"""
+    from relief_app import urls
+    return [p.name for p in urls.urlpatterns if getattr(p, 'name', None)]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Measure queries and latency of every named URL and fail on budget overruns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1, help='Dataset size (1 = 200 shelters, 20k needs)')
+        parser.add_argument('--iterations', type=int, default=10, help='Timed requests per URL')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--only', action='append', help='Check only this URL name (repeatable)')
+        parser.add_argument('--output', help='Result file (default perf_results/<timestamp>-<commit>.json)')
+        parser.add_argument('--compare', help='Earlier result file to print deltas against')
+
+    def measure(self, client, url, iterations):
+        timings, counts = [], []
+        response = None
+        for _ in range(iterations + 1):
+            # Like timeit: collect between requests, not in the middle of one
+            gc.collect()
+            gc.disable()
+            try:
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    body = b''.join(response.streaming_content) if response.streaming else response.content
+                    elapsed = (time.perf_counter() - started) * 1000
+            finally:
+                gc.enable()
+            counts.append(len(captured))
+            timings.append(elapsed)
+        # The first request warms template and URL caches and the session's
+        # profile (relief_app/roles.py); it is neither timed nor counted
+        timings = timings[1:]
+        return {
+            'status_code': response.status_code,
+            'queries': max(counts[1:]),
+            'first_request_queries': counts[0],
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'bytes': len(body),
+        }
+
+    def check_url(self, name, budget, fixtures, iterations):
+        kwargs = {key: fixtures.get(value, value) for key, value in budget.get('kwargs', {}).items()}
+        url = reverse(name, kwargs=kwargs)
+        if budget.get('query'):
+            url += '?' + '&'.join(f'{k}={v}' for k, v in budget['query'].items())
+        client = Client()
+        if budget.get('user'):
+            client.force_login(fixtures['users'][budget['user']])
+
+        result = self.measure(client, url, budget.get('iterations', iterations))
+        result['url'] = url
+        result['budget'] = {'queries': budget['queries'], 'p95_ms': budget['p95_ms']}
+        violations = []
+        if result['status_code'] >= 400 or result['status_code'] in (301, 302):
+            violations.append(f'HTTP {result["status_code"]}')
+        if result['queries'] > budget['queries']:
+            violations.append(f'{result["queries"]} queries > {budget["queries"]}')
+        if result['p95_ms'] > budget['p95_ms']:
+            violations.append(f'p95 {result["p95_ms"]:.0f}ms > {budget["p95_ms"]}ms')
+        result['violations'] = violations
+        result['status'] = 'over_budget' if violations else 'ok'
+        return result
+
+    def handle(self, *args, **options):
+        names = named_urls()
+        if options['only']:
+            unknown = set(options['only']) - set(names)
+            if unknown:
+                raise CommandError(f'Unknown URL names: {", ".join(sorted(unknown))}')
+            names = [n for n in names if n in options['only']]
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        results = {}
+        try:
+            self.stdout.write(f'Seeding dataset (scale {options["scale"]})...')
+            started = time.perf_counter()
+            fixtures = seed_dataset(scale=options['scale'], seed=options['seed'])
+            self.stdout.write(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+            # No page/result caching, no throttling and no outbound calls:
+            # every request does its full work against the seeded data
+            with override_settings(
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+                RATE_LIMIT_ENABLED=False,
+                # Pages as served by ASGI/gthread workers, with their live update cursor
+                CHANGE_FEED_LIVE=True,
+                WEATHER_ALERTS_URL='http://127.0.0.1:9/{zone}',
+                WEATHER_ALERTS_FETCH_TIMEOUT=0.2,
+                # Slow queries are expected at scale; don't log or EXPLAIN them mid-measurement
+                SLOW_QUERY_THRESHOLD_MS=float('inf'),
+            ):
+                # The weather feed is unreachable on purpose; keep its warnings out of the report
+                logging.getLogger('relief_app.weather').setLevel(logging.ERROR)
+                for name in names:
+                    budget = BUDGETS.get(name)
+                    if budget is None:
+                        results[name] = {'status': 'no_budget', 'violations': ['no budget declared']}
+                    elif 'skip' in budget:
+                        results[name] = {'status': 'skipped', 'reason': budget['skip']}
+                    else:
+                        try:
+                            results[name] = self.check_url(name, budget, fixtures, options['iterations'])
+                        except Exception as e:
+                            results[name] = {'status': 'error', 'violations': [f'{type(e).__name__}: {e}']}
+                    self.report_line(name, results[name])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        stale = sorted(set(BUDGETS) - set(named_urls()))
+        if stale:
+            self.stdout.write(self.style.WARNING(f'Budgets for unknown URL names: {", ".join(stale)}'))
+
+        output = self.write_results(results, options)
+        self.stdout.write(f'Results written to {output}')
+        if options['compare']:
+            self.compare(results, options['compare'])
+
+        failed = [n for n, r in results.items() if r['status'] not in ('ok', 'skipped')]
+        if failed:
+            raise CommandError(f'{len(failed)} URL(s) failed their budget: {", ".join(failed)}')
+        self.stdout.write(self.style.SUCCESS(f'All {len(results)} URLs within budget'))
+
+    def report_line(self, name, result):
+        if result['status'] == 'skipped':
+            self.stdout.write(f'  {name:<28} skipped ({result["reason"]})')
+            return
+        if 'queries' in result:
+            line = (f'  {name:<28} {result["queries"]:>3} queries  p50 {result["p50_ms"]:>7.1f}ms  '
+                    f'p95 {result["p95_ms"]:>7.1f}ms  {result["bytes"]:>9,} bytes')
+        else:
+            line = f'  {name:<28}'
+        if result['status'] == 'ok':
+            self.stdout.write(line)
+        else:
+            self.stdout.write(self.style.ERROR(f'{line}  {"; ".join(result["violations"])}'))
+
+    def write_results(self, results, options):
+        commit = git_commit()
+        if options['output']:
+            path = Path(options['output'])
+        else:
+            stamp = time.strftime('%Y%m%d-%H%M%S')
+            path = Path(settings.BASE_DIR) / 'perf_results' / f'{stamp}-{commit or "nogit"}.json'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({
+            'commit': commit,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'scale': options['scale'],
+            'iterations': options['iterations'],
+            'seed': options['seed'],
+            'results': results,
+        }, indent=2, sort_keys=True))
+        return path
+
+    def compare(self, results, previous_path):
+        try:
+            previous = json.loads(Path(previous_path).read_text())['results']
+        except (OSError, ValueError, KeyError) as e:
+            self.stdout.write(self.style.WARNING(f'Could not read {previous_path}: {e}'))
+            return
+        self.stdout.write(f'\nChanges since {previous_path}:')
+        for name, result in results.items():
+            before = previous.get(name) or {}
+            if 'queries' not in result or 'queries' not in before:
+                continue
+            query_delta = result['queries'] - before['queries']
+            p95_delta = result['p95_ms'] - before['p95_ms']
+            if query_delta or abs(p95_delta) > max(5, before['p95_ms'] * 0.2):
+                self.stdout.write(f'  {name:<28} queries {query_delta:+d}  p95 {p95_delta:+.1f}ms')
@@ -0,0 +1,29 @@
+"""
+Compact the delta sync tombstones
+Run with: python manage.py compact_tombstones [--days 30]
+
+Run daily from cron. Removes tombstones past the retention period
+(clients that last synced before it get a full snapshot anyway),
+duplicates for the same object, and need tombstones made redundant by
+their area being deleted later.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from relief_app.sync import compact
+
+
+class Command(BaseCommand):
+    help = 'Delete expired and redundant delta sync tombstones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float,
+                            default=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30),
+                            help='Keep tombstones from the last N days')
+
+    def handle(self, *args, **options):
+        counts = compact(days=options['days'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {counts["expired"]} expired, {counts["duplicate"]} duplicate and '
+            f'{counts["cascaded"]} cascaded tombstones'
+        ))
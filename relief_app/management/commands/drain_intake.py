@@ -0,0 +1,36 @@
+"""
+Write spooled public submissions to the database
+Run with: python manage.py drain_intake [--once] [--interval 2]
+
+Needed whenever INTAKE_SPOOL_ENABLED is on. Keep it running under
+systemd/supervisor next to gunicorn.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from relief_app.intake import drain_spool
+
+
+class Command(BaseCommand):
+    help = 'Bulk insert spooled need requests, volunteers, donations and contact messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=2, help='Seconds between drains')
+        parser.add_argument('--once', action='store_true', help='Drain a single time and exit')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--max-retries', type=int, default=5,
+                            help='Retries per segment when the database is locked')
+
+    def handle(self, *args, **options):
+        while True:
+            stats = drain_spool(batch_size=options['batch_size'], max_retries=options['max_retries'])
+            if stats['segments']:
+                line = (f'{stats["written"]} written, {stats["rejected"]} rejected '
+                        f'from {stats["segments"]} segments')
+                if stats['failed_segments']:
+                    self.stdout.write(self.style.WARNING(f'{line}, {stats["failed_segments"]} moved to failed/'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(line))
+            if options['once']:
+                break
+            time.sleep(options['interval'])
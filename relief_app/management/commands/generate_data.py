@@ -0,0 +1,58 @@
+"""
+Management command to generate a large synthetic dataset for benchmarking
+Run with: python manage.py generate_data [--scale 10] [--seed 42] [--clear] [--no-rollups]
+
+scale=1 is 1,000 shelters and 100k needs (about 133k rows); scale=10 is
+about 1.3M rows. The same seed and scale always generate the same data.
+See relief_app/synthetic.py for the distributions used. Users are created
+as synthetic_super_admin and synthetic_area_admin_<n>, password admin123.
+Trend rollups are rebuilt afterwards unless --no-rollups is given; then
+run 'manage.py backfill_rollups' before using the trend charts.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from relief_app.models import Area
+from relief_app.synthetic import BATCH_SIZE, clear_generated_data, generate, row_counts
+
+
+class Command(BaseCommand):
+    help = 'Generate a large synthetic dataset (shelters, needs, requests, volunteers, donations...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1, help='1 = 1,000 shelters and 100k needs')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--days', type=int, default=30, help='Spread timestamps over this many days')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per INSERT batch')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete existing relief data (and synthetic users) first')
+        parser.add_argument('--no-rollups', action='store_true',
+                            help='Skip rebuilding the trend rollups (run backfill_rollups later)')
+
+    def handle(self, *args, **options):
+        if options['scale'] <= 0:
+            raise CommandError('--scale must be positive')
+
+        if options['clear']:
+            self.stdout.write('Clearing existing data...')
+            clear_generated_data()
+        elif Area.objects.exists():
+            self.stdout.write(self.style.WARNING(
+                'The database already has data; generated rows are added to it (use --clear to start fresh)'
+            ))
+
+        counts = row_counts(options['scale'])
+        self.stdout.write(f'Generating {sum(counts.values()):,} rows (scale {options["scale"]:g}, '
+                          f'seed {options["seed"]})...')
+        started = time.perf_counter()
+        generator = generate(
+            scale=options['scale'], seed=options['seed'], days=options['days'],
+            batch_size=options['batch_size'], log=lambda line: self.stdout.write(f'  {line}'),
+            rollups=not options['no_rollups'],
+        )
+        elapsed = time.perf_counter() - started
+        total = sum(generator.created.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)'
+        ))
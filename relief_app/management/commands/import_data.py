@@ -0,0 +1,39 @@
+"""
+Bulk import needs, areas or products from a CSV/JSON file
+Run with: python manage.py import_data needs path/to/needs.csv [--dry-run]
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from relief_app.importer import IMPORT_KINDS, ImportFormatError, detect_format, run_import
+
+
+class Command(BaseCommand):
+    help = 'Import needs, areas or products from a CSV or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=IMPORT_KINDS)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'json'],
+                            help='File format (defaults to the file extension)')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, write nothing')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            fmt = options['format'] or detect_format(options['path'])
+            started = time.perf_counter()
+            with open(options['path'], 'rb') as f:
+                report = run_import(options['kind'], f, fmt, dry_run=options['dry_run'],
+                                    batch_size=options['batch_size'])
+        except (OSError, ImportFormatError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        for error in report['errors']:
+            self.stdout.write(self.style.WARNING(f"  row {error['row']}: {'; '.join(error['errors'])}"))
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['created']} of {report['rows']} {options['kind']} rows "
+            f"({report['failed']} failed) in {elapsed:.1f}s"
+        ))
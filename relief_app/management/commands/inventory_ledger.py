@@ -0,0 +1,42 @@
+"""
+Maintain the inventory ledger
+Run with:
+    python manage.py inventory_ledger verify
+    python manage.py inventory_ledger rebuild
+    python manage.py inventory_ledger compact --days 90
+"""
+from django.core.management.base import BaseCommand, CommandError
+from relief_app.ledger import compact_entries, rebuild_balances, verify_balances
+
+
+class Command(BaseCommand):
+    help = 'Verify, rebuild or compact the inventory ledger and its balance snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['verify', 'rebuild', 'compact'])
+        parser.add_argument('--days', type=int, default=90,
+                            help='Compact entries older than this many days (default 90)')
+
+    def handle(self, *args, **options):
+        action = options['action']
+
+        if action == 'verify':
+            mismatches = verify_balances()
+            if not mismatches:
+                self.stdout.write(self.style.SUCCESS('All inventory balances match the ledger'))
+                return
+            for area_id, product_id, snapshot, ledger in mismatches:
+                self.stdout.write(self.style.WARNING(
+                    f'  area {area_id} / product {product_id}: snapshot {snapshot}, ledger {ledger}'
+                ))
+            raise CommandError(f'{len(mismatches)} balances do not match; run "inventory_ledger rebuild"')
+
+        if action == 'rebuild':
+            count = rebuild_balances()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} inventory balances from the ledger'))
+            return
+
+        removed = compact_entries(older_than_days=options['days'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Compacted ledger: removed {removed} entries older than {options["days"]} days'
+        ))
@@ -0,0 +1,33 @@
+"""
+Match logged donations to open needs
+Run with: python manage.py match_donations [--area ID ...] [--dry-run]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from relief_app.matching import run_matching
+
+
+class Command(BaseCommand):
+    help = 'Allocate donated quantities to open needs by priority and age'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--area', type=int, action='append', dest='areas',
+                            help='Only match donations and needs of this area (repeatable)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would be allocated without saving')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stats = run_matching(
+            area_ids=options['areas'],
+            dry_run=options['dry_run'],
+            batch_size=options['batch_size'],
+        )
+        elapsed = time.perf_counter() - started
+
+        for key, value in stats.items():
+            self.stdout.write(f'  {key.replace("_", " ")}: {value}')
+        label = 'Dry run finished' if options['dry_run'] else 'Matching finished'
+        self.stdout.write(self.style.SUCCESS(f'{label} in {elapsed:.2f}s'))
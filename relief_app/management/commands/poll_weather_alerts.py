@@ -0,0 +1,33 @@
+"""
+Poll the weather alert feed and cache normalized alerts per zone
+Run with: python manage.py poll_weather_alerts [--once] [--interval 120]
+
+Keep it running under systemd/supervisor, or run --once from cron.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from relief_app.weather import allowed_zones, refresh_zone
+
+
+class Command(BaseCommand):
+    help = 'Fetch weather alerts for the configured zones into the cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--zone', action='append', dest='zones',
+                            help='Zone to poll (repeatable, defaults to WEATHER_ALERT_ZONES)')
+        parser.add_argument('--interval', type=int, default=120, help='Seconds between polls')
+        parser.add_argument('--once', action='store_true', help='Poll a single time and exit')
+
+    def handle(self, *args, **options):
+        zones = options['zones'] or allowed_zones()
+        while True:
+            for zone in zones:
+                entry = refresh_zone(zone)
+                if entry is None:
+                    self.stdout.write(self.style.WARNING(f'{zone}: fetch failed, keeping cached alerts'))
+                else:
+                    self.stdout.write(f'{zone}: {len(entry["alerts"])} active alerts')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
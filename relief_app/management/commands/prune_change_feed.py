@@ -0,0 +1,24 @@
+"""
+Delete old change feed events
+Run with: python manage.py prune_change_feed [--days 7]
+
+Run daily from cron. Dashboards only replay recent events when they
+reconnect, so nothing reads events older than the retention period.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from relief_app.changefeed import prune
+
+
+class Command(BaseCommand):
+    help = 'Delete change feed events older than CHANGE_FEED_RETENTION_DAYS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float,
+                            default=getattr(settings, 'CHANGE_FEED_RETENTION_DAYS', 7),
+                            help='Keep events from the last N days')
+
+    def handle(self, *args, **options):
+        deleted = prune(days=options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} change events older than {options["days"]:g} days'))
@@ -0,0 +1,15 @@
+"""
+Rebuild the per-area need summary table from scratch
+Run with: python manage.py rebuild_need_summaries
+"""
+from django.core.management.base import BaseCommand
+from relief_app.summaries import rebuild_all_summaries
+
+
+class Command(BaseCommand):
+    help = 'Rebuild AreaNeedSummary rows from the Need table'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding area need summaries...')
+        count = rebuild_all_summaries()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt summaries for {count} areas'))
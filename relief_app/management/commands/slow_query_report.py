@@ -0,0 +1,92 @@
+"""
+Management command to summarize the slow-query log
+Run with: python manage.py slow_query_report [--top 20] [--hours 24] [--sort total]
+
+Groups the statements recorded by relief_app/slowqueries.py by SQL
+fingerprint and prints the top N with count, total/avg/max time, the call
+sites that ran them and their captured query plan. Plans that scan a
+whole table are flagged.
+"""
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from relief_app.slowqueries import clear_records, load_records, log_dir
+
+SORT_KEYS = {
+    'total': lambda g: g['total_ms'],
+    'count': lambda g: g['count'],
+    'max': lambda g: g['max_ms'],
+    'avg': lambda g: g['total_ms'] / g['count'],
+}
+
+
+def is_full_scan(line):
+    # SQLite prints "SCAN <table>" for a full scan and "SEARCH ... USING INDEX" otherwise
+    detail = line.strip()
+    return detail.startswith('SCAN ') and 'USING' not in detail and 'CONSTANT ROW' not in detail
+
+
+def aggregate(records):
+    groups = {}
+    for record in records:
+        group = groups.get(record['fp'])
+        if group is None:
+            group = groups[record['fp']] = {
+                'fp': record['fp'], 'sql': record['sql'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'sites': Counter(), 'plan': None, 'last_seen': 0,
+            }
+        group['count'] += 1
+        group['total_ms'] += record['ms']
+        group['max_ms'] = max(group['max_ms'], record['ms'])
+        group['sites'][record.get('site') or 'outside relief_app'] += 1
+        group['last_seen'] = max(group['last_seen'], record['ts'])
+        if record.get('plan'):
+            group['plan'] = record['plan']
+    return list(groups.values())
+
+
+class Command(BaseCommand):
+    help = 'Show the slowest SQL statements recorded by the slow-query log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help='Number of statements to show')
+        parser.add_argument('--hours', type=float, help='Only statements logged in the last N hours')
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='total',
+                            help='Order by total time (default), count, max or avg')
+        parser.add_argument('--no-plans', action='store_true', help='Leave out the query plans')
+        parser.add_argument('--clear', action='store_true', help='Delete the log after reporting')
+
+    def handle(self, *args, **options):
+        since = time.time() - options['hours'] * 3600 if options['hours'] else None
+        records = load_records(since=since)
+        if not records:
+            self.stdout.write(self.style.WARNING(f'No slow queries logged in {log_dir()}'))
+            return
+
+        groups = aggregate(records)
+        groups.sort(key=SORT_KEYS[options['sort']], reverse=True)
+        total_ms = sum(g['total_ms'] for g in groups)
+        self.stdout.write(
+            f'{len(records):,} slow statements, {len(groups):,} distinct, {total_ms / 1000:,.1f}s in total\n'
+        )
+        for rank, group in enumerate(groups[:options['top']], 1):
+            self.stdout.write(self.style.SUCCESS(
+                f'#{rank} [{group["fp"]}] {group["count"]:,}x  total {group["total_ms"] / 1000:,.2f}s  '
+                f'avg {group["total_ms"] / group["count"]:,.1f}ms  max {group["max_ms"]:,.1f}ms  '
+                f'last {time.strftime("%Y-%m-%d %H:%M", time.localtime(group["last_seen"]))}'
+            ))
+            self.stdout.write(f'  {group["sql"][:500]}')
+            for site, count in group['sites'].most_common(3):
+                self.stdout.write(f'  from {site} ({count}x)')
+            if group['plan'] and not options['no_plans']:
+                self.stdout.write('  plan:')
+                for line in group['plan']:
+                    text = f'    {line}'
+                    self.stdout.write(self.style.WARNING(f'{text}   <- full table scan') if is_full_scan(line) else text)
+            self.stdout.write('')
+
+        if options['clear']:
+            clear_records()
+            self.stdout.write('Slow-query log cleared')
@@ -0,0 +1,389 @@
+"""
+Prometheus metrics for Hurricane Heroes
+
+MetricsMiddleware records, per URL name:
+
+    relief_http_requests_total            requests by view, method and status
+    relief_http_request_duration_seconds  latency histogram
+    relief_http_request_queue_seconds     time spent waiting for a free worker
+    relief_db_queries_total               SQL statements
+    relief_db_query_seconds_total         time spent in SQL
+    relief_db_lock_errors_total           statements that failed with "database is locked"
+
+plus relief_db_query_duration_seconds (every SQL statement; SQLite lock
+waits show up in its tail), relief_cache_requests_total (page cache
+results from the X-Cache header, and the caches that call count_cache())
+and relief_job_* for export/backup jobs wrapped in job_timer().
+
+Queue time needs nginx to stamp the request:
+    proxy_set_header X-Request-Start "t=${msec}";
+
+Gunicorn runs several worker processes, so each process keeps its values
+in memory and writes them every METRICS_FLUSH_INTERVAL seconds to
+METRICS_DIR/<pid>-<token>.json (one writer per file, atomic rename, no
+locking on the request path). The /metrics view adds up every file.
+Files of processes that have exited are folded into archive.json so
+counters never go backwards when a worker is recycled.
+"""
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import OperationalError
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SQL_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+JOB_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+
+# name: (type, help, buckets)
+FAMILIES = {
+    'relief_http_requests_total': ('counter', 'HTTP requests by URL name, method and status', None),
+    'relief_http_request_duration_seconds': ('histogram', 'HTTP request latency by URL name', LATENCY_BUCKETS),
+    'relief_http_request_queue_seconds': (
+        'histogram', 'Time between nginx accepting a request and a worker starting it', LATENCY_BUCKETS),
+    'relief_db_queries_total': ('counter', 'SQL statements by URL name', None),
+    'relief_db_query_seconds_total': ('counter', 'Seconds spent in SQL by URL name', None),
+    'relief_db_query_duration_seconds': ('histogram', 'SQL statement latency', SQL_BUCKETS),
+    'relief_db_lock_errors_total': ('counter', 'SQL statements that failed with "database is locked"', None),
+    'relief_cache_requests_total': ('counter', 'Cache lookups by cache and result', None),
+    'relief_job_duration_seconds': ('histogram', 'Export and backup job durations', JOB_BUCKETS),
+    'relief_job_failures_total': ('counter', 'Export and backup jobs that raised', None),
+    'relief_job_last_success_timestamp_seconds': ('gauge', 'Unix time of the last successful job run', None),
+}
+
+ARCHIVE = 'archive.json'
+UNMATCHED = 'unmatched'  # 404s and friends, so stray paths cannot blow up the label set
+
+
+def metrics_dir():
+    return Path(getattr(settings, 'METRICS_DIR', Path(settings.BASE_DIR) / 'metrics'))
+
+
+def _labels(**labels):
+    """Canonical exposition-format label string, also used as the storage key"""
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+    return ','.join(f'{k}="{escape(v)}"' for k, v in sorted(labels.items()))
+
+
+class Registry:
+    """This process's metric values"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.path = None
+        self.last_flush = 0.0
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels(**labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        buckets = FAMILIES[name][2]
+        key = (name, _labels(**labels))
+        with self.lock:
+            # Per-bucket counts (cumulated when rendered), then sum and count
+            series = self.histograms.get(key)
+            if series is None:
+                series = self.histograms[key] = [0] * (len(buckets) + 3)
+            series[bisect_left(buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def set_max(self, name, value, **labels):
+        key = (name, _labels(**labels))
+        with self.lock:
+            self.gauges[key] = max(self.gauges.get(key, value), value)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[n, l, v] for (n, l), v in self.counters.items()],
+                'histograms': [[n, l, list(v)] for (n, l), v in self.histograms.items()],
+                'gauges': [[n, l, v] for (n, l), v in self.gauges.items()],
+            }
+
+    def flush(self):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return
+        directory = metrics_dir()
+        if self.path is None:
+            directory.mkdir(parents=True, exist_ok=True)
+            self.path = directory / f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json'
+        tmp = directory / f'.{self.path.name}.tmp'
+        tmp.write_text(json.dumps(self.snapshot(), separators=(',', ':')))
+        os.replace(tmp, self.path)
+        self.last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        if time.monotonic() - self.last_flush >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+            self.flush()
+
+
+registry = Registry()
+
+
+def _flush_at_exit():
+    try:
+        registry.flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def count_cache(cache_name, hit):
+    registry.inc('relief_cache_requests_total', cache=cache_name, result='hit' if hit else 'miss')
+
+
+@contextmanager
+def job_timer(job):
+    """Time an export/backup job; the values are flushed right away"""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        registry.inc('relief_job_failures_total', job=job)
+        raise
+    else:
+        registry.set_max('relief_job_last_success_timestamp_seconds', time.time(), job=job)
+    finally:
+        registry.observe('relief_job_duration_seconds', time.perf_counter() - started, job=job)
+        registry.flush()
+
+
+# Aggregation -----------------------------------------------------------
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # alive, owned by another user
+    return True
+
+
+def _read(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(total, data):
+    for name, labels, value in data.get('counters', []):
+        total['counters'][(name, labels)] = total['counters'].get((name, labels), 0) + value
+    for name, labels, values in data.get('histograms', []):
+        current = total['histograms'].get((name, labels))
+        if current is None or len(current) != len(values):
+            total['histograms'][(name, labels)] = list(values)
+        else:
+            total['histograms'][(name, labels)] = [a + b for a, b in zip(current, values)]
+    for name, labels, value in data.get('gauges', []):
+        total['gauges'][(name, labels)] = max(total['gauges'].get((name, labels), value), value)
+
+
+def _empty():
+    return {'counters': {}, 'histograms': {}, 'gauges': {}}
+
+
+def _as_data(total):
+    return {kind: [[n, l, v] for (n, l), v in series.items()] for kind, series in total.items()}
+
+
+def compact():
+    """Fold the files of exited processes into archive.json"""
+    directory = metrics_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / '.lock', 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return  # another scrape is compacting
+        dead = [p for p in directory.glob('*-*.json') if not _pid_alive(int(p.name.split('-', 1)[0]))]
+        if not dead:
+            return
+        total = _empty()
+        _merge(total, _read(directory / ARCHIVE) or {})
+        for path in dead:
+            _merge(total, _read(path) or {})
+        tmp = directory / f'.{ARCHIVE}.tmp'
+        tmp.write_text(json.dumps(_as_data(total), separators=(',', ':')))
+        os.replace(tmp, directory / ARCHIVE)
+        for path in dead:
+            path.unlink(missing_ok=True)
+
+
+def collect():
+    """Values summed over every process, past and present"""
+    registry.flush()
+    compact()
+    total = _empty()
+    for path in metrics_dir().glob('*.json'):
+        data = _read(path)
+        if data:
+            _merge(total, data)
+    return total
+
+
+def _format(value):
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def render(total):
+    """Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for name, (kind, help_text, buckets) in FAMILIES.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'histogram':
+            for (family, labels), values in sorted(total['histograms'].items()):
+                if family != name:
+                    continue
+                prefix = f'{labels},' if labels else ''
+                cumulative = 0
+                for bound, count in zip(list(buckets) + ['+Inf'], values[:len(buckets) + 1]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                suffix = f'{{{labels}}}' if labels else ''
+                lines.append(f'{name}_sum{suffix} {_format(values[-2])}')
+                lines.append(f'{name}_count{suffix} {values[-1]}')
+        else:
+            series = total['counters'] if kind == 'counter' else total['gauges']
+            for (family, labels), value in sorted(series.items()):
+                if family == name:
+                    lines.append(f'{name}{{{labels}}} {_format(value)}' if labels else f'{name} {_format(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+# Request instrumentation ----------------------------------------------
+
+class QueryCounter:
+    """SQL statements, time and lock errors of one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.lock_errors = 0
+
+
+# The counter of the request being handled. A ContextVar rather than a
+# request-scoped execute_wrapper(), because async views run their queries
+# in a worker thread, on that thread's connection; the context goes along.
+_request_queries = ContextVar('relief_metrics_queries', default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    """execute_wrapper installed on every connection (see install())"""
+    started = time.perf_counter()
+    queries = _request_queries.get()
+    try:
+        return execute(sql, params, many, context)
+    except OperationalError as e:
+        if queries is not None and 'locked' in str(e):
+            queries.lock_errors += 1
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        registry.observe('relief_db_query_duration_seconds', elapsed)
+        if queries is not None:
+            queries.count += 1
+            queries.seconds += elapsed
+
+
+def install(connection):
+    """Add the query counter to a new connection (once); called on connection_created"""
+    if getattr(settings, 'METRICS_ENABLED', True) and count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_queries)
+
+
+def queue_seconds(request):
+    """Seconds since nginx stamped X-Request-Start ("t=<unix seconds>"), if it did"""
+    value = request.META.get('HTTP_X_REQUEST_START', '')
+    try:
+        started = float(value[2:] if value.startswith('t=') else value)
+    except ValueError:
+        return None
+    if started > 1e12:
+        started /= 1000  # milliseconds
+    return max(0.0, time.time() - started)
+
+
+class MetricsMiddleware:
+    """Record request, SQL and page cache metrics for every request (WSGI and ASGI)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queued, token, started = self.start(request)
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            self.finish(request, response, queued, token, started)
+
+    async def __acall__(self, request):
+        queued, token, started = self.start(request)
+        response = None
+        try:
+            response = await self.get_response(request)
+            return response
+        finally:
+            self.finish(request, response, queued, token, started)
+
+    def start(self, request):
+        token = _request_queries.set(QueryCounter())
+        return queue_seconds(request), token, time.perf_counter()
+
+    def finish(self, request, response, queued, token, started):
+        elapsed = time.perf_counter() - started
+        queries = _request_queries.get()
+        _request_queries.reset(token)
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else UNMATCHED
+        status = response.status_code if response is not None else 500
+        registry.inc('relief_http_requests_total', view=view, method=request.method, status=status)
+        registry.observe('relief_http_request_duration_seconds', elapsed, view=view)
+        if queued is not None:
+            registry.observe('relief_http_request_queue_seconds', queued, view=view)
+        if queries.count:
+            registry.inc('relief_db_queries_total', queries.count, view=view)
+            registry.inc('relief_db_query_seconds_total', queries.seconds, view=view)
+        if queries.lock_errors:
+            registry.inc('relief_db_lock_errors_total', queries.lock_errors, view=view)
+        cache_state = response.get('X-Cache') if response is not None else None
+        if cache_state:
+            registry.inc('relief_cache_requests_total', cache='page', result=cache_state.lower())
+        try:
+            registry.maybe_flush()
+        except OSError:
+            pass  # a full disk must not take the site down with it
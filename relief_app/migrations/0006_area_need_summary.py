@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-19 11:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relief_app', '0005_article'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AreaNeedSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_count', models.PositiveIntegerField(default=0)),
+                ('open_count', models.PositiveIntegerField(default=0)),
+                ('urgent_count', models.PositiveIntegerField(default=0)),
+                ('fulfilled_count', models.PositiveIntegerField(default=0)),
+                ('open_quantity', models.PositiveIntegerField(default=0)),
+                ('quantity_by_category', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('area', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='need_summary', to='relief_app.area')),
+            ],
+            options={
+                'verbose_name': 'Area Need Summary',
+                'verbose_name_plural': 'Area Need Summaries',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-19 11:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relief_app', '0006_area_need_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donation',
+            name='allocated_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='donation',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='donations', to='relief_app.product'),
+        ),
+        migrations.CreateModel(
+            name='DonationAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('donation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='relief_app.donation')),
+                ('need', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='relief_app.need')),
+            ],
+            options={
+                'verbose_name': 'Donation Allocation',
+                'verbose_name_plural': 'Donation Allocations',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.1 on 2026-10-19 11:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relief_app', '0007_donation_matching'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.IntegerField(default=0)),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_balances', to='relief_app.area')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_balances', to='relief_app.product')),
+            ],
+            options={
+                'verbose_name': 'Inventory Balance',
+                'verbose_name_plural': 'Inventory Balances',
+            },
+        ),
+        migrations.CreateModel(
+            name='InventoryEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('receipt', 'Receipt'), ('distribution', 'Distribution'), ('transfer_in', 'Transfer In'), ('transfer_out', 'Transfer Out'), ('adjustment', 'Adjustment'), ('compacted', 'Compacted History')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_entries', to='relief_app.area')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inventory_entries', to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_entries', to='relief_app.product')),
+            ],
+            options={
+                'verbose_name': 'Inventory Entry',
+                'verbose_name_plural': 'Inventory Entries',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='inventorybalance',
+            constraint=models.UniqueConstraint(fields=('area', 'product'), name='unique_inventory_balance'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryentry',
+            index=models.Index(fields=['area', 'product', 'created_at'], name='relief_app__area_id_9ba89f_idx'),
+        ),
+    ]
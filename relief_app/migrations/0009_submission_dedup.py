@@ -0,0 +1,52 @@
+# Generated by Django 5.0.1 on 2026-10-19 11:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relief_app', '0008_inventory_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='needrequest',
+            name='duplicate_count',
+            field=models.PositiveIntegerField(default=0, help_text='Identical resubmissions folded into this one'),
+        ),
+        migrations.AddField(
+            model_name='needrequest',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='relief_app.needrequest'),
+        ),
+        migrations.AddField(
+            model_name='needrequest',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='volunteer',
+            name='duplicate_count',
+            field=models.PositiveIntegerField(default=0, help_text='Identical resubmissions folded into this one'),
+        ),
+        migrations.AddField(
+            model_name='volunteer',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='relief_app.volunteer'),
+        ),
+        migrations.AddField(
+            model_name='volunteer',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+        migrations.AddIndex(
+            model_name='needrequest',
+            index=models.Index(fields=['fingerprint', 'created_at'], name='needrequest_fingerprint_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='volunteer',
+            index=models.Index(fields=['fingerprint', 'created_at'], name='volunteer_fingerprint_idx'),
+        ),
+    ]
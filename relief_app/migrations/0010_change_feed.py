@@ -0,0 +1,30 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relief_app', '0009_submission_dedup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('need', 'Need'), ('need_request', 'Need Request'), ('donation', 'Donation'), ('volunteer', 'Volunteer')], max_length=20)),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('area_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('data', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Change Event',
+                'verbose_name_plural': 'Change Events',
+                'ordering': ['id'],
+            },
+        ),
+    ]
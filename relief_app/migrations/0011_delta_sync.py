@@ -0,0 +1,53 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relief_app', '0010_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('category', 'Category'), ('product', 'Product'), ('area', 'Area'), ('need', 'Need')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('area_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('reason', models.CharField(choices=[('deleted', 'Deleted'), ('moved', 'Moved to another area')], default='deleted', max_length=10)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Tombstone',
+                'verbose_name_plural': 'Tombstones',
+                'ordering': ['deleted_at', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='area',
+            index=models.Index(fields=['updated_at', 'id'], name='relief_app__updated_a5001b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['updated_at', 'id'], name='relief_app__updated_3e92e4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='need',
+            index=models.Index(fields=['updated_at', 'id'], name='relief_app__updated_ab9279_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='need',
+            index=models.Index(fields=['area', 'updated_at', 'id'], name='relief_app__area_id_52305c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at', 'id'], name='relief_app__updated_f84049_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='relief_app__deleted_23640e_idx'),
+        ),
+    ]
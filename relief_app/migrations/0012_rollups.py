@@ -0,0 +1,61 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relief_app', '0011_delta_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Rollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('need', 'Needs'), ('donation', 'Donations'), ('volunteer', 'Volunteers')], max_length=20)),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('start', models.DateTimeField()),
+                ('priority', models.CharField(blank=True, max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Rollup',
+                'verbose_name_plural': 'Rollups',
+                'ordering': ['kind', 'period', 'start'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['area', 'created_at'], name='relief_app__area_id_c56f8d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='need',
+            index=models.Index(fields=['area', 'created_at'], name='relief_app__area_id_2f1340_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='volunteer',
+            index=models.Index(fields=['area', 'created_at'], name='relief_app__area_id_aabda0_idx'),
+        ),
+        migrations.AddField(
+            model_name='rollup',
+            name='area',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='relief_app.area'),
+        ),
+        migrations.AddField(
+            model_name='rollup',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='relief_app.category'),
+        ),
+        migrations.AddIndex(
+            model_name='rollup',
+            index=models.Index(fields=['kind', 'period', 'start'], name='relief_app__kind_cc9485_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rollup',
+            index=models.Index(fields=['kind', 'period', 'area', 'start'], name='relief_app__kind_3da8f5_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relief_app', '0012_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tombstone',
+            name='reason',
+            field=models.CharField(choices=[('deleted', 'Deleted'), ('moved', 'Moved to another area'), ('archived', 'Archived')], default='deleted', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='ArchivedNeed',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.IntegerField()),
+                ('notes', models.TextField(blank=True)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('urgent', 'Urgent')], max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('in_progress', 'In Progress'), ('fulfilled', 'Fulfilled'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('allocations', models.JSONField(blank=True, default=list)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_needs', to='relief_app.area')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_needs_created', to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_needs', to='relief_app.product')),
+            ],
+            options={
+                'verbose_name': 'Archived Need',
+                'verbose_name_plural': 'Archived Needs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['created_at'], name='relief_app__created_c86a57_idx'), models.Index(fields=['area', 'created_at'], name='relief_app__area_id_443f0d_idx')],
+            },
+        ),
+    ]
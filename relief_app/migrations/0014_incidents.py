@@ -0,0 +1,105 @@
+# Generated by Django 5.0.1 on 2026-10-19 13:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def assign_existing_data(apps, schema_editor):
+    """Everything recorded before incidents existed belongs to one incident"""
+    Area = apps.get_model('relief_app', 'Area')
+    first = Area.objects.order_by('created_at').values_list('created_at', flat=True).first()
+    if first is None:
+        return
+    Incident = apps.get_model('relief_app', 'Incident')
+    incident = Incident.objects.create(name='Initial incident', slug='initial-incident', started_at=first)
+    for name in ('Area', 'Need', 'ArchivedNeed', 'Donation', 'Volunteer', 'NeedRequest'):
+        apps.get_model('relief_app', name).objects.update(incident=incident)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relief_app', '0013_need_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Incident',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('slug', models.SlugField(max_length=200, unique=True)),
+                ('description', models.TextField(blank=True)),
+                ('is_active', models.BooleanField(default=True, help_text='Active incidents are shown on the site and dashboards')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Incident',
+                'verbose_name_plural': 'Incidents',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='archivedneed',
+            name='incident',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_needs', to='relief_app.incident'),
+        ),
+        migrations.AddField(
+            model_name='area',
+            name='incident',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='areas', to='relief_app.incident'),
+        ),
+        migrations.AddField(
+            model_name='donation',
+            name='incident',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='donations', to='relief_app.incident'),
+        ),
+        migrations.AddField(
+            model_name='need',
+            name='incident',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='needs', to='relief_app.incident'),
+        ),
+        migrations.AddField(
+            model_name='needrequest',
+            name='incident',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='need_requests', to='relief_app.incident'),
+        ),
+        migrations.AddField(
+            model_name='volunteer',
+            name='incident',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='volunteers', to='relief_app.incident'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedneed',
+            index=models.Index(fields=['incident', 'created_at'], name='relief_app__inciden_03b17e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='area',
+            index=models.Index(fields=['incident', 'name'], name='relief_app__inciden_558d4a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['incident', 'created_at'], name='relief_app__inciden_eed342_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='need',
+            index=models.Index(fields=['incident', 'status', 'created_at'], name='relief_app__inciden_bea11c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='need',
+            index=models.Index(fields=['incident', 'created_at'], name='relief_app__inciden_1d23f9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='needrequest',
+            index=models.Index(fields=['incident', 'created_at'], name='relief_app__inciden_b3acc4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='volunteer',
+            index=models.Index(fields=['incident', 'created_at'], name='relief_app__inciden_d63e56_idx'),
+        ),
+        migrations.RunPython(assign_existing_data, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-19 14:01
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_area_incidents(apps, schema_editor):
+    """Events already in the feed belong to their area's incident"""
+    Area = apps.get_model('relief_app', 'Area')
+    ChangeEvent = apps.get_model('relief_app', 'ChangeEvent')
+    ChangeEvent.objects.filter(area_id__isnull=False).update(
+        incident_id=Subquery(Area.objects.filter(pk=OuterRef('area_id')).values('incident_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relief_app', '0014_incidents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changeevent',
+            name='incident_id',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(copy_area_incidents, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,7 @@ Models for Hurricane Heroes Relief Management System
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 
 
 # Custom User model to support different user types
@@ -37,6 +38,44 @@ class Category(models.Model):
         verbose_name = 'Category'
         verbose_name_plural = 'Categories'
         ordering = ['name']
+        indexes = [
+            # Delta sync reads changes in (updated_at, id) order
+            models.Index(fields=['updated_at', 'id']),
+        ]
+    
+    def __str__(self):
+        return self.name
+
+
+# Incident-scoped models' default manager
+class IncidentQuerySet(models.QuerySet):
+    def for_incident(self, incident):
+        """
+        Only the rows of incident: an Incident, its id, or a list of ids like
+        relief_app.incidents.scope() returns. None leaves the queryset as is.
+        """
+        if incident is None:
+            return self
+        if isinstance(incident, (list, tuple, set, frozenset)):
+            return self.filter(incident_id__in=incident)
+        return self.filter(incident_id=getattr(incident, 'pk', incident))
+
+
+# Incident Model (one hurricane or other event, see relief_app/incidents.py)
+class Incident(models.Model):
+    name = models.CharField(max_length=200)
+    slug = models.SlugField(max_length=200, unique=True)
+    description = models.TextField(blank=True)
+    is_active = models.BooleanField(default=True, help_text='Active incidents are shown on the site and dashboards')
+    started_at = models.DateTimeField(default=timezone.now)
+    ended_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Incident'
+        verbose_name_plural = 'Incidents'
+        ordering = ['-started_at']
     
     def __str__(self):
         return self.name
@@ -44,6 +83,9 @@ class Category(models.Model):
 
 # Area Model
 class Area(models.Model):
+    # Set from the newest active incident when left empty (relief_app/incidents.py)
+    incident = models.ForeignKey(Incident, on_delete=models.PROTECT, null=True, blank=True,
+                                 related_name='areas', db_index=False)
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     address = models.CharField(max_length=500)
@@ -53,10 +95,17 @@ class Area(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = IncidentQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Area'
         verbose_name_plural = 'Areas'
         ordering = ['name']
+        indexes = [
+            # Delta sync reads changes in (updated_at, id) order
+            models.Index(fields=['updated_at', 'id']),
+            models.Index(fields=['incident', 'name']),
+        ]
     
     def __str__(self):
         return self.name
@@ -75,6 +124,10 @@ class Product(models.Model):
         verbose_name = 'Product'
         verbose_name_plural = 'Products'
         ordering = ['name']
+        indexes = [
+            # Delta sync reads changes in (updated_at, id) order
+            models.Index(fields=['updated_at', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.category.name})"
@@ -116,6 +169,9 @@ class Need(models.Model):
     ]
     
     area = models.ForeignKey(Area, on_delete=models.CASCADE, related_name='needs')
+    # The area's incident, copied so incident pages filter on an index of this table
+    incident = models.ForeignKey(Incident, on_delete=models.PROTECT, null=True, blank=True, editable=False,
+                                 related_name='needs', db_index=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='needs')
     quantity = models.IntegerField(validators=[MinValueValidator(1)])
     notes = models.TextField(blank=True)
@@ -125,10 +181,22 @@ class Need(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = IncidentQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Need'
         verbose_name_plural = 'Needs'
         ordering = ['-created_at']
+        indexes = [
+            # Delta sync reads changes in (updated_at, id) order, for all areas or one
+            models.Index(fields=['updated_at', 'id']),
+            models.Index(fields=['area', 'updated_at', 'id']),
+            # Rollups recount one area's hour (relief_app/rollups.py)
+            models.Index(fields=['area', 'created_at']),
+            # Incident pages: open needs newest first, and everything newest first
+            models.Index(fields=['incident', 'status', 'created_at']),
+            models.Index(fields=['incident', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.product.name} - {self.area.name} ({self.quantity} {self.product.unit})"
@@ -138,6 +206,50 @@ class Need(models.Model):
         return self.product.category
 
 
+# Archived Need Model (closed needs moved out of the Need table, see relief_app/archive.py)
+class ArchivedNeed(models.Model):
+    """
+    A fulfilled or cancelled need moved out of the live Need table once it
+    has been closed for NEED_ARCHIVE_AFTER_DAYS. Keeps the need's id and
+    columns, plus the donation allocations it had.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    area = models.ForeignKey(Area, on_delete=models.CASCADE, related_name='archived_needs')
+    incident = models.ForeignKey(Incident, on_delete=models.PROTECT, null=True, blank=True, editable=False,
+                                 related_name='archived_needs', db_index=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='archived_needs')
+    quantity = models.IntegerField()
+    notes = models.TextField(blank=True)
+    priority = models.CharField(max_length=20, choices=Need.PRIORITY_CHOICES)
+    status = models.CharField(max_length=20, choices=Need.STATUS_CHOICES)
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='archived_needs_created')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    # [[donation_id, quantity, allocated at], ...] from DonationAllocation
+    allocations = models.JSONField(default=list, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = IncidentQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = 'Archived Need'
+        verbose_name_plural = 'Archived Needs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            # Rollups recount one area's hour (relief_app/rollups.py)
+            models.Index(fields=['area', 'created_at']),
+            models.Index(fields=['incident', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.name} - {self.area.name} ({self.quantity} {self.product.unit}, archived)"
+    
+    def get_category(self):
+        return self.product.category
+
+
 # Contact Model
 class Contact(models.Model):
     STATUS_CHOICES = [
@@ -170,14 +282,28 @@ class Volunteer(models.Model):
     email = models.EmailField()
     phone = models.CharField(max_length=20)
     area = models.ForeignKey(Area, on_delete=models.CASCADE, related_name='volunteers')
+    incident = models.ForeignKey(Incident, on_delete=models.PROTECT, null=True, blank=True, editable=False,
+                                 related_name='volunteers', db_index=False)
     skills = models.TextField(blank=True, help_text='Any relevant skills or experience')
     availability = models.CharField(max_length=100, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Duplicate detection (see relief_app/dedup.py)
+    fingerprint = models.CharField(max_length=40, blank=True, editable=False)
+    duplicate_of = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='duplicates')
+    duplicate_count = models.PositiveIntegerField(default=0, help_text='Identical resubmissions folded into this one')
+    
+    objects = IncidentQuerySet.as_manager()
     
     class Meta:
         verbose_name = 'Volunteer'
         verbose_name_plural = 'Volunteers'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['fingerprint', 'created_at'], name='volunteer_fingerprint_idx'),
+            models.Index(fields=['area', 'created_at']),
+            models.Index(fields=['incident', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.area.name}"
@@ -196,6 +322,8 @@ class NeedRequest(models.Model):
     email = models.EmailField()
     phone = models.CharField(max_length=20, blank=True)
     area = models.ForeignKey(Area, on_delete=models.CASCADE, related_name='need_requests')
+    incident = models.ForeignKey(Incident, on_delete=models.PROTECT, null=True, blank=True, editable=False,
+                                 related_name='need_requests', db_index=False)
     item_needed = models.CharField(max_length=200)
     quantity = models.IntegerField(validators=[MinValueValidator(1)])
     urgency = models.CharField(max_length=20, choices=[
@@ -207,11 +335,22 @@ class NeedRequest(models.Model):
     description = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='new')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Duplicate detection (see relief_app/dedup.py)
+    fingerprint = models.CharField(max_length=40, blank=True, editable=False)
+    duplicate_of = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='duplicates')
+    duplicate_count = models.PositiveIntegerField(default=0, help_text='Identical resubmissions folded into this one')
+    
+    objects = IncidentQuerySet.as_manager()
     
     class Meta:
         verbose_name = 'Need Request'
         verbose_name_plural = 'Need Requests'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['fingerprint', 'created_at'], name='needrequest_fingerprint_idx'),
+            models.Index(fields=['incident', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.item_needed}"
@@ -223,15 +362,27 @@ class Donation(models.Model):
     donor_name = models.CharField(max_length=200)
     email = models.EmailField(blank=True)
     area = models.ForeignKey(Area, on_delete=models.CASCADE, related_name='donations')
+    incident = models.ForeignKey(Incident, on_delete=models.PROTECT, null=True, blank=True, editable=False,
+                                 related_name='donations', db_index=False)
     item_name = models.CharField(max_length=200)
     quantity = models.IntegerField(validators=[MinValueValidator(1)])
     notes = models.TextField(blank=True)
+    # Filled in by the matching engine (relief_app/matching.py)
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='donations')
+    allocated_quantity = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = IncidentQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Donation'
         verbose_name_plural = 'Donations'
         ordering = ['-created_at']
+        indexes = [
+            # Rollups recount one area's hour (relief_app/rollups.py)
+            models.Index(fields=['area', 'created_at']),
+            models.Index(fields=['incident', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.donor_name} - {self.item_name} ({self.quantity})"
@@ -255,3 +406,214 @@ class Article(models.Model):
     
     def __str__(self):
         return self.title
+
+
+# Per-area Need Summary (denormalized read model)
+class AreaNeedSummary(models.Model):
+    """
+    Pre-aggregated need counts for one area, kept in sync by the Need
+    signal handlers in relief_app/signals.py. Listing views read this
+    row instead of counting the Need table on every request.
+    """
+    area = models.OneToOneField(Area, on_delete=models.CASCADE, related_name='need_summary')
+    total_count = models.PositiveIntegerField(default=0)
+    open_count = models.PositiveIntegerField(default=0)
+    urgent_count = models.PositiveIntegerField(default=0)
+    fulfilled_count = models.PositiveIntegerField(default=0)
+    open_quantity = models.PositiveIntegerField(default=0)
+    # {category_id: total open quantity}
+    quantity_by_category = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Area Need Summary'
+        verbose_name_plural = 'Area Need Summaries'
+    
+    def __str__(self):
+        return f"{self.area.name}: {self.open_count} open / {self.total_count} total"
+
+
+# Donation Allocation Model (donated quantity assigned to a need)
+class DonationAllocation(models.Model):
+    donation = models.ForeignKey(Donation, on_delete=models.CASCADE, related_name='allocations')
+    need = models.ForeignKey(Need, on_delete=models.CASCADE, related_name='allocations')
+    quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Donation Allocation'
+        verbose_name_plural = 'Donation Allocations'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.donation.item_name} -> Need #{self.need_id} ({self.quantity})"
+
+
+# Inventory Ledger Entry Model (append-only stock movements)
+class InventoryEntry(models.Model):
+    ENTRY_TYPE_CHOICES = [
+        ('receipt', 'Receipt'),
+        ('distribution', 'Distribution'),
+        ('transfer_in', 'Transfer In'),
+        ('transfer_out', 'Transfer Out'),
+        ('adjustment', 'Adjustment'),
+        ('compacted', 'Compacted History'),
+    ]
+    
+    area = models.ForeignKey(Area, on_delete=models.CASCADE, related_name='inventory_entries')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='inventory_entries')
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPE_CHOICES)
+    # Signed change in stock: positive for receipts/transfers in, negative for distributions/transfers out
+    quantity = models.IntegerField()
+    reference = models.CharField(max_length=100, blank=True)
+    notes = models.TextField(blank=True)
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='inventory_entries')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = 'Inventory Entry'
+        verbose_name_plural = 'Inventory Entries'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['area', 'product', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_entry_type_display()}: {self.quantity:+d} {self.product.name} @ {self.area.name}"
+
+
+# Inventory Balance Model (running balance snapshot per area and product)
+class InventoryBalance(models.Model):
+    area = models.ForeignKey(Area, on_delete=models.CASCADE, related_name='inventory_balances')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='inventory_balances')
+    balance = models.IntegerField(default=0)
+    entry_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Inventory Balance'
+        verbose_name_plural = 'Inventory Balances'
+        constraints = [
+            models.UniqueConstraint(fields=['area', 'product'], name='unique_inventory_balance'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.name} @ {self.area.name}: {self.balance}"
+
+
+# Change Event Model (append-only change feed for live dashboards)
+class ChangeEvent(models.Model):
+    """
+    One created/updated/deleted need, need request, donation or volunteer,
+    written by relief_app/changefeed.py and streamed to dashboards. Plain
+    integer ids rather than foreign keys, so events outlive their objects.
+    """
+    KIND_CHOICES = [
+        ('need', 'Need'),
+        ('need_request', 'Need Request'),
+        ('donation', 'Donation'),
+        ('volunteer', 'Volunteer'),
+    ]
+    ACTION_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    object_id = models.PositiveIntegerField()
+    area_id = models.PositiveIntegerField(null=True, blank=True)
+    # The area's incident, so streams can follow one incident (relief_app/incidents.py)
+    incident_id = models.PositiveIntegerField(null=True, blank=True)
+    # Current values of the tracked fields, plus 'before' for the ones an update changed
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = 'Change Event'
+        verbose_name_plural = 'Change Events'
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"#{self.id} {self.kind} {self.object_id} {self.action}"
+
+
+# Tombstone Model (deletes for the delta sync API)
+class Tombstone(models.Model):
+    """
+    A deleted area, product, category or need, kept so offline clients
+    syncing with relief_app/sync.py learn to drop it. A need that moved to
+    another area gets a 'moved' tombstone under its old area, for clients
+    that only sync one area.
+    """
+    KIND_CHOICES = [
+        ('category', 'Category'),
+        ('product', 'Product'),
+        ('area', 'Area'),
+        ('need', 'Need'),
+    ]
+    REASON_CHOICES = [
+        ('deleted', 'Deleted'),
+        ('moved', 'Moved to another area'),
+        ('archived', 'Archived'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    # The need's area, so one-area clients only get their own
+    area_id = models.PositiveIntegerField(null=True, blank=True)
+    reason = models.CharField(max_length=10, choices=REASON_CHOICES, default='deleted')
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Tombstone'
+        verbose_name_plural = 'Tombstones'
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['deleted_at', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} {self.object_id} {self.reason}"
+
+
+# Rollup Model (hourly and daily trend counters, see relief_app/rollups.py)
+class Rollup(models.Model):
+    """
+    How many needs, donations or volunteers were created in one area in
+    one hour or day, per category and priority. Trend charts read only
+    these, never the source tables.
+    """
+    KIND_CHOICES = [
+        ('need', 'Needs'),
+        ('donation', 'Donations'),
+        ('volunteer', 'Volunteers'),
+    ]
+    PERIOD_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    start = models.DateTimeField()
+    area = models.ForeignKey(Area, on_delete=models.CASCADE, related_name='rollups')
+    # Null for volunteers and for donations not matched to a product yet
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='rollups')
+    # Blank except for needs
+    priority = models.CharField(max_length=20, blank=True)
+    count = models.PositiveIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Rollup'
+        verbose_name_plural = 'Rollups'
+        ordering = ['kind', 'period', 'start']
+        indexes = [
+            models.Index(fields=['kind', 'period', 'start']),
+            models.Index(fields=['kind', 'period', 'area', 'start']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} {self.period} {self.start:%Y-%m-%d %H:00} area {self.area_id}: {self.count}"
@@ -0,0 +1,284 @@
+"""
+Opt-in request profiling
+
+ProfilingMiddleware profiles a request when it carries the X-Profile
+header (from a logged-in super admin, or with PROFILING_SECRET as its
+value for curl and load tools) or when it is picked by
+PROFILING_SAMPLE_RATE. For a profiled request it records:
+
+    wall time, status and URL name
+    SQL query count and time, and the slowest statements
+    template render time
+    Python hot spots from cProfile (top functions by own time)
+
+Unprofiled requests pay for one random() call. Each profile is written as
+one JSON line to PROFILING_DIR/<pid>.jsonl, so gunicorn workers never
+share a file; a file is rotated to <pid>.jsonl.old when it grows past
+PROFILING_MAX_FILE_BYTES, which bounds the store at two files per worker.
+The request_profiles page aggregates the files into the slowest endpoints.
+Streaming responses are timed until the response object is returned, not
+until the last chunk is sent.
+"""
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template.backends.django import Template as DjangoTemplate
+
+HEADER = 'HTTP_X_PROFILE'
+HOT_SPOTS = 25
+SLOW_QUERIES = 5
+SQL_PREVIEW = 300
+_ADDRESS = re.compile(r' at 0x[0-9a-f]+')
+
+# Stats of the request being profiled in this thread/task, if any
+_current = ContextVar('relief_profile', default=None)
+
+
+def profiling_dir():
+    return Path(getattr(settings, 'PROFILING_DIR', Path(settings.BASE_DIR) / 'profiles'))
+
+
+def _timed_render(self, context=None, request=None):
+    original = _timed_render.__wrapped__
+    stats = _current.get()
+    if stats is None:
+        return original(self, context, request)
+    started = time.perf_counter()
+    try:
+        return original(self, context, request)
+    finally:
+        stats['template_ms'] += (time.perf_counter() - started) * 1000
+
+
+def install_template_timer():
+    """
+    Time template rendering (once); called by ProfilingMiddleware only when
+    profiling is enabled. Views render through django.shortcuts.render,
+    which ends up in DjangoTemplate.render once per page ({% include %}
+    and {% extends %} render inside it).
+    """
+    if DjangoTemplate.render is not _timed_render:
+        _timed_render.__wrapped__ = DjangoTemplate.render
+        DjangoTemplate.render = _timed_render
+
+
+def time_queries(execute, sql, params, many, context):
+    """
+    execute_wrapper installed on every connection (see install()); counts
+    and times the queries of the request being profiled, if any. Async
+    views run their queries in a worker thread, which gets the context.
+    """
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        stats['sql_count'] += 1
+        stats['sql_ms'] += elapsed
+        slow = stats['slow_queries']
+        if len(slow) < SLOW_QUERIES or elapsed > slow[-1][0]:
+            slow.append([round(elapsed, 2), sql[:SQL_PREVIEW]])
+            slow.sort(key=lambda q: -q[0])
+            del slow[SLOW_QUERIES:]
+
+
+def install(connection):
+    """Add the query timer to a new connection (once); called on connection_created"""
+    if getattr(settings, 'PROFILING_ENABLED', False) and time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, time_queries)
+
+
+def hot_spots(profiler, limit=HOT_SPOTS):
+    """[[function, calls, own ms, cumulative ms], ...] sorted by own time"""
+    rows = []
+    for (filename, line, func), (_, calls, tottime, cumtime, _) in pstats.Stats(profiler).stats.items():
+        if filename == '~':
+            # Builtins such as <method 'execute' of 'sqlite3.Cursor' objects>
+            where = _ADDRESS.sub('', func)
+        else:
+            where = f'{_short_path(filename)}:{line}({func})'
+        rows.append([where, calls, round(tottime * 1000, 2), round(cumtime * 1000, 2)])
+    rows.sort(key=lambda r: -r[2])
+    return rows[:limit]
+
+
+def _short_path(filename):
+    base = str(settings.BASE_DIR)
+    if filename.startswith(base):
+        return os.path.relpath(filename, base)
+    marker = f'{os.sep}site-packages{os.sep}'
+    return filename.split(marker, 1)[1] if marker in filename else filename
+
+
+def write_profile(record):
+    directory = profiling_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{os.getpid()}.jsonl'
+    try:
+        if path.stat().st_size > getattr(settings, 'PROFILING_MAX_FILE_BYTES', 2 * 1024 * 1024):
+            os.replace(path, path.with_suffix('.jsonl.old'))
+    except FileNotFoundError:
+        pass
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+
+def load_profiles():
+    """Every stored profile, newest first"""
+    records = []
+    for path in profiling_dir().glob('*.jsonl*'):
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue  # a line cut short by a crash
+        except FileNotFoundError:
+            continue  # rotated away while listing
+    records.sort(key=lambda r: r['ts'], reverse=True)
+    return records
+
+
+def clear_profiles():
+    for path in profiling_dir().glob('*.jsonl*'):
+        path.unlink(missing_ok=True)
+
+
+def _percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def endpoint_summary(records):
+    """Per-URL-name aggregates, slowest p95 first"""
+    grouped = {}
+    for record in records:
+        grouped.setdefault(record['url_name'] or record['path'], []).append(record)
+    summary = []
+    for name, items in grouped.items():
+        walls = sorted(r['wall_ms'] for r in items)
+        count = len(items)
+        summary.append({
+            'endpoint': name,
+            'count': count,
+            'p50_ms': round(_percentile(walls, 50), 1),
+            'p95_ms': round(_percentile(walls, 95), 1),
+            'max_ms': round(walls[-1], 1),
+            'avg_sql_count': round(sum(r['sql_count'] for r in items) / count, 1),
+            'avg_sql_ms': round(sum(r['sql_ms'] for r in items) / count, 1),
+            'avg_template_ms': round(sum(r['template_ms'] for r in items) / count, 1),
+        })
+    summary.sort(key=lambda s: -s['p95_ms'])
+    return summary
+
+
+class ProfilingMiddleware:
+    """Profile requests asked for with X-Profile, plus a random sample (WSGI and ASGI)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        install_template_timer()
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.secret = getattr(settings, 'PROFILING_SECRET', None)
+        self.use_cprofile = getattr(settings, 'PROFILING_CPROFILE', True)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def trigger(self, request, user):
+        value = request.META.get(HEADER)
+        if value:
+            if self.secret and hmac.compare_digest(value, self.secret):
+                return 'header'
+            if user is not None and user.is_authenticated and getattr(user, 'user_type', '') == 'super_admin':
+                return 'header'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sample'
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        trigger = self.trigger(request, getattr(request, 'user', None))
+        if trigger is None or _current.get() is not None:
+            return self.get_response(request)
+
+        stats, token, started = self.start()
+        profiler = cProfile.Profile() if self.use_cprofile else None
+        try:
+            if profiler is not None:
+                try:
+                    profiler.enable()
+                except ValueError:
+                    profiler = None  # another profiler is already active
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        finally:
+            wall_ms = (time.perf_counter() - started) * 1000
+            _current.reset(token)
+        return self.finish(request, response, trigger, stats, wall_ms, profiler)
+
+    async def __acall__(self, request):
+        user = await request.auser() if request.META.get(HEADER) and hasattr(request, 'auser') else None
+        trigger = self.trigger(request, user)
+        if trigger is None or _current.get() is not None:
+            return await self.get_response(request)
+
+        # No cProfile here: the event loop interleaves other requests, so
+        # its numbers would not belong to this one
+        stats, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            wall_ms = (time.perf_counter() - started) * 1000
+            _current.reset(token)
+        return self.finish(request, response, trigger, stats, wall_ms, None)
+
+    def start(self):
+        stats = {'sql_count': 0, 'sql_ms': 0.0, 'template_ms': 0.0, 'slow_queries': []}
+        return stats, _current.set(stats), time.perf_counter()
+
+    def finish(self, request, response, trigger, stats, wall_ms, profiler):
+        match = request.resolver_match
+        record = {
+            'id': uuid.uuid4().hex[:12],
+            'ts': time.time(),
+            'method': request.method,
+            'path': request.path,
+            'url_name': match.url_name if match else None,
+            'status': response.status_code,
+            'trigger': trigger,
+            'wall_ms': round(wall_ms, 2),
+            'sql_count': stats['sql_count'],
+            'sql_ms': round(stats['sql_ms'], 2),
+            'template_ms': round(stats['template_ms'], 2),
+            'slow_queries': stats['slow_queries'],
+            'hot_spots': hot_spots(profiler) if profiler is not None else [],
+        }
+        try:
+            write_profile(record)
+        except OSError:
+            return response  # never fail the request over its profile
+        response['X-Profile-Id'] = record['id']
+        return response
@@ -0,0 +1,176 @@
+"""
+Per-client rate limiting for public forms and search
+
+RateLimitMiddleware throttles the URL names listed in RATE_LIMITS, per
+client IP and per endpoint. Each (endpoint, client) pair gets a sliding
+window counter kept in the cache: the current fixed window's count plus
+the previous window's count weighted by how much of it still overlaps.
+That behaves like a token bucket refilling at rate/window, but needs only
+two cache keys and one incr per request.
+
+Rejected requests get a 429 with Retry-After. Allowed/rejected counters
+per endpoint are kept in the cache too and shown by the rate_limit_stats
+view. With the file based cache used in production the counters are
+shared by all gunicorn workers; incr there is not atomic, so a burst can
+slip a request or two past the limit, which is fine for this purpose.
+"""
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from django.utils.deprecation import MiddlewareMixin
+
+# Default limits; override with the RATE_LIMITS setting
+DEFAULT_RATE_LIMITS = {
+    'public_contact': {'methods': ['POST'], 'rate': '5/m'},
+    'volunteer_signup': {'methods': ['POST'], 'rate': '5/m'},
+    'public_need_request': {'methods': ['POST'], 'rate': '10/m'},
+    'donate': {'methods': ['POST'], 'rate': '10/m'},
+    'global_search': {'methods': ['GET'], 'rate': '30/m'},
+}
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+METRICS_TIMEOUT = None  # keep counters until the cache is cleared
+
+
+def get_rate_limit_cache():
+    return caches[getattr(settings, 'RATE_LIMIT_CACHE_ALIAS', 'default')]
+
+
+def get_rules():
+    return getattr(settings, 'RATE_LIMITS', DEFAULT_RATE_LIMITS)
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60); '100/5m' -> (100, 300)"""
+    count, _, period = rate.partition('/')
+    multiplier = int(period[:-1] or 1)
+    return int(count), multiplier * PERIODS[period[-1]]
+
+
+def client_ip(request):
+    """
+    The client address, or '' when it is unknown. Behind nginx, set
+    RATE_LIMIT_CLIENT_IP_HEADER to the header nginx fills in (e.g.
+    'HTTP_X_REAL_IP'); never trust it otherwise.
+    """
+    header = getattr(settings, 'RATE_LIMIT_CLIENT_IP_HEADER', None)
+    if header and request.META.get(header):
+        return request.META[header].split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def hit(endpoint, ident, limit, period, now=None):
+    """
+    Count one request against a sliding window.
+
+    Returns (allowed, retry_after_seconds).
+    """
+    cache = get_rate_limit_cache()
+    now = time.time() if now is None else now
+    window = int(now // period)
+    elapsed = (now % period) / period
+    current_key = f'rl:{endpoint}:{ident}:{window}'
+    previous_key = f'rl:{endpoint}:{ident}:{window - 1}'
+
+    values = cache.get_many([current_key, previous_key])
+    previous = values.get(previous_key, 0)
+    current = values.get(current_key, 0)
+    weighted_previous = previous * (1 - elapsed)
+    if weighted_previous + current >= limit:
+        if current >= limit or not previous:
+            retry_after = (1 - elapsed) * period
+        else:
+            # Wait until enough of the previous window has slid out
+            excess = weighted_previous + current - limit + 1
+            retry_after = min(excess / previous * period, (1 - elapsed) * period)
+        return False, max(1, math.ceil(retry_after))
+
+    # Two windows' lifetime so the next window can still weigh this one
+    if cache.add(current_key, 1, period * 2):
+        return True, 0
+    try:
+        cache.incr(current_key)
+    except ValueError:
+        cache.set(current_key, 1, period * 2)
+    return True, 0
+
+
+def _count(endpoint, outcome):
+    cache = get_rate_limit_cache()
+    key = f'rl:metrics:{endpoint}:{outcome}'
+    if not cache.add(key, 1, METRICS_TIMEOUT):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, METRICS_TIMEOUT)
+
+
+def get_metrics():
+    """{endpoint: {'rate', 'methods', 'allowed', 'rejected'}} for every limited endpoint"""
+    cache = get_rate_limit_cache()
+    rules = get_rules()
+    keys = [f'rl:metrics:{name}:{outcome}' for name in rules for outcome in ('allowed', 'rejected')]
+    values = cache.get_many(keys)
+    return {
+        name: {
+            'rate': rule['rate'],
+            'methods': rule.get('methods', []),
+            'allowed': values.get(f'rl:metrics:{name}:allowed', 0),
+            'rejected': values.get(f'rl:metrics:{name}:rejected', 0),
+        }
+        for name, rule in rules.items()
+    }
+
+
+def reset_metrics():
+    get_rate_limit_cache().delete_many(
+        [f'rl:metrics:{name}:{outcome}' for name in get_rules() for outcome in ('allowed', 'rejected')]
+    )
+
+
+def too_many_requests(request, retry_after):
+    message = 'Too many requests. Please wait a moment and try again.'
+    if 'application/json' in request.headers.get('Accept', ''):
+        response = JsonResponse({'success': False, 'message': message}, status=429)
+    else:
+        response = HttpResponse(
+            render_to_string('429.html', {'retry_after': retry_after}, request=request), status=429
+        )
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+class RateLimitMiddleware(MiddlewareMixin):
+    """Throttle the endpoints in RATE_LIMITS per client IP"""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+            return None
+        match = request.resolver_match
+        rule = get_rules().get(match.url_name) if match else None
+        if rule is None or request.method not in rule.get('methods', ['GET', 'POST']):
+            return None
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and getattr(user, 'user_type', '') == 'super_admin':
+            return None
+
+        ident = client_ip(request)
+        if not ident:
+            # Behind a proxy without RATE_LIMIT_CLIENT_IP_HEADER every visitor
+            # would share one bucket; let the request through instead
+            logger.warning('Not rate limiting %s: no client address (set RATE_LIMIT_CLIENT_IP_HEADER)',
+                           match.url_name)
+            return None
+        limit, period = parse_rate(rule['rate'])
+        allowed, retry_after = hit(match.url_name, ident, limit, period)
+        _count(match.url_name, 'allowed' if allowed else 'rejected')
+        if allowed:
+            return None
+        return too_many_requests(request, retry_after)
@@ -0,0 +1,109 @@
+"""
+Per-session role and shelter resolution for the admin panels
+
+Every panel view needs to know whether the user is a super admin or a
+shelter admin, and shelter admin views need the shelter: that used to be
+an AreaAdmin lookup plus a lazy load of its area on every request.
+
+ReliefProfileMiddleware sets request.relief_profile, resolved at most once
+per session: the role, the AreaAdmin id and a snapshot of the shelter are
+kept in the session, which is loaded for every signed-in request anyway.
+The snapshot is an unsaved Area instance carrying the fields the panels
+show; use it to filter and to set foreign keys, never save it.
+
+A session's copy is dropped and resolved again when
+
+- the user or their user_type changed (the user itself is loaded fresh
+  on every request);
+- any AreaAdmin or Area was saved or deleted since: signals.py bumps a
+  version kept in the cache, which every session's copy is checked
+  against;
+- it is older than RELIEF_PROFILE_TIMEOUT seconds, which bounds how stale
+  a copy can get when the cache loses the version or isn't shared.
+
+The profile is resolved lazily, so pages that never look at it (the
+public site) pay nothing.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from .models import Area, AreaAdmin
+
+SESSION_KEY = 'relief_profile'
+VERSION_KEY = 'relief_profile:version'
+# The Area fields kept in the session, what the shelter admin pages show
+AREA_FIELDS = ('id', 'incident_id', 'name', 'description', 'address', 'pincode', 'latitude', 'longitude')
+
+
+class ReliefProfile:
+    """Who the current user is to the panels"""
+
+    def __init__(self, role=None, area_admin_id=None, area=None):
+        self.role = role
+        self.area_admin_id = area_admin_id
+        self.area = area
+
+    @property
+    def is_super_admin(self):
+        return self.role == 'super_admin'
+
+    @property
+    def is_area_admin(self):
+        return self.role == 'area_admin'
+
+    @property
+    def area_id(self):
+        return self.area.pk if self.area is not None else None
+
+    def __repr__(self):
+        return f'<ReliefProfile {self.role} area={self.area_id}>'
+
+
+def current_version():
+    return cache.get(VERSION_KEY, 0)
+
+
+def invalidate():
+    """Make every session resolve its profile again"""
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def resolve(user):
+    """The session data for user's profile, from the database"""
+    data = {'user_id': user.pk, 'role': user.user_type, 'area_admin_id': None, 'area': None}
+    if user.user_type == 'area_admin':
+        row = AreaAdmin.objects.filter(user=user).values_list('id', *(f'area__{name}' for name in AREA_FIELDS)).first()
+        if row is not None:
+            data['area_admin_id'] = row[0]
+            data['area'] = dict(zip(AREA_FIELDS, row[1:]))
+    return data
+
+
+def get_profile(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return ReliefProfile()
+
+    data = request.session.get(SESSION_KEY)
+    version = current_version()
+    max_age = getattr(settings, 'RELIEF_PROFILE_TIMEOUT', 300)
+    if (data is None or data['user_id'] != user.pk or data['role'] != user.user_type
+            or data['version'] != version or time.time() - data['resolved_at'] > max_age):
+        data = resolve(user)
+        data['version'] = version
+        data['resolved_at'] = time.time()
+        request.session[SESSION_KEY] = data
+
+    area = Area(**data['area']) if data['area'] else None
+    return ReliefProfile(data['role'], data['area_admin_id'], area)
+
+
+class ReliefProfileMiddleware(MiddlewareMixin):
+    """Set request.relief_profile (see module docstring)"""
+
+    def process_request(self, request):
+        request.relief_profile = SimpleLazyObject(lambda: get_profile(request))
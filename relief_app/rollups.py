@@ -0,0 +1,383 @@
+"""
+Hourly and daily trend rollups of needs, donations and volunteers
+
+A Rollup row counts what was created in one area in one hour (or day),
+per category and priority, with the summed quantity. Trend charts
+("urgent needs in one county over the last 72 hours") read only rollups,
+so a chart costs one grouped query over buckets, not rows.
+
+A single save or delete (signals.py) updates its hour and day rows in
+place with apply(): count and quantity are added to the bucket of the
+row's new values and taken from the bucket of its old ones, so a changed
+priority or product moves the count between them. A missing row is
+created; two saves creating the same row at once leave two, which every
+reader sums.
+
+Bulk paths that skip signals call mark() or mark_objects() themselves:
+a marked (area, hour) bucket is recounted from that area's rows in that
+hour (indexed on area, created_at), then its day from the day's hourly
+rollups. Wrap bulk work in deferred_rollup_refresh() to recount each
+bucket once; saves inside it are marked too.
+
+Needs are counted from Need and ArchivedNeed together, so archiving old
+needs doesn't change their trends.
+
+Buckets start on the hour and at midnight in the current time zone.
+'manage.py backfill_rollups' rebuilds them all from the source tables.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Greatest, TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import Area, ArchivedNeed, Donation, Need, Product, Rollup, Volunteer
+
+HOUR = timedelta(hours=1)
+# Rollup columns of the rows _grouped() and _day_rows() yield
+COLUMNS = ('kind', 'start', 'area_id', 'category_id', 'priority', 'count', 'quantity')
+
+# kind: where its rows come from and what they are grouped by
+SOURCES = {
+    'need': {
+        'model': Need,
+        # Archiving a need moves it, it still counts (relief_app/archive.py)
+        'archive': ArchivedNeed,
+        'category': 'product__category_id',
+        'priority': 'priority',
+        'quantity': 'quantity',
+    },
+    'donation': {
+        'model': Donation,
+        'category': 'product__category_id',
+        'priority': None,
+        'quantity': 'quantity',
+    },
+    'volunteer': {
+        'model': Volunteer,
+        'category': None,
+        'priority': None,
+        'quantity': None,
+        # Resubmissions are folded into the original (relief_app/dedup.py)
+        'filter': Q(duplicate_of__isnull=True),
+        # The same test on one row's values, for apply()
+        'counted': lambda values: values.get('duplicate_of_id') is None,
+    },
+}
+KINDS = {source['model']: kind for kind, source in SOURCES.items()}
+# Changing one of these moves a row to another bucket or changes its counts
+FIELDS = {
+    Need: ('area_id', 'product_id', 'priority', 'quantity'),
+    Donation: ('area_id', 'product_id', 'quantity'),
+    Volunteer: ('area_id', 'duplicate_of_id'),
+}
+
+_deferred = threading.local()
+
+
+def hour_start(value):
+    return timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(value):
+    return timezone.make_aware(datetime.combine(timezone.localtime(value).date(), time()))
+
+
+def buckets(period, since, until):
+    """Start of every period bucket from since's up to until"""
+    if period == 'hour':
+        start, step = hour_start(since), (lambda value: value + HOUR)
+    else:
+        # Days can be 23 or 25 hours long
+        start, step = day_start(since), (lambda value: day_start(value + timedelta(hours=26)))
+    starts = []
+    while start < until:
+        starts.append(start)
+        start = step(start)
+    return starts
+
+
+def _grouped(kind, querysets, trunc):
+    """Rollup rows for the querysets' rows of kind, bucketed by trunc (created_at or start)"""
+    source = SOURCES[kind]
+    dimensions = ['area_id'] + [source[d] for d in ('category', 'priority') if source[d]]
+    merged = {}
+    for queryset in querysets:
+        rows = queryset.annotate(bucket=trunc).values_list('bucket', *dimensions).annotate(
+            n=Count('id'), qty=Sum(source['quantity']) if source['quantity'] else Value(0),
+        ).order_by()
+        for *key, n, qty in rows.iterator():
+            count, quantity = merged.get(tuple(key), (0, 0))
+            merged[tuple(key)] = (count + n, quantity + (qty or 0))
+    for (bucket, area_id, *rest), (count, quantity) in merged.items():
+        values = dict(zip(dimensions[1:], rest))
+        yield {
+            'kind': kind,
+            'start': bucket,
+            'area_id': area_id,
+            'category_id': values[source['category']] if source['category'] else None,
+            'priority': values[source['priority']] if source['priority'] else '',
+            'count': count,
+            'quantity': quantity,
+        }
+
+
+def _source_rows(kind):
+    """kind's rows, live and archived, as a queryset per table"""
+    source = SOURCES[kind]
+    models = [source['model']] + ([source['archive']] if 'archive' in source else [])
+    querysets = [model.objects.all() for model in models]
+    return [queryset.filter(source['filter']) if 'filter' in source else queryset for queryset in querysets]
+
+
+def _day_rows(kind, rollups):
+    """Daily rollup rows summed from hourly rollups"""
+    rows = rollups.annotate(bucket=TruncDay('start')).values('bucket', 'area_id', 'category_id', 'priority').annotate(
+        n=Sum('count'), qty=Sum('quantity'),
+    ).order_by()
+    for row in rows.iterator():
+        yield {
+            'kind': kind,
+            'start': row['bucket'],
+            'area_id': row['area_id'],
+            'category_id': row['category_id'],
+            'priority': row['priority'],
+            'count': row['n'],
+            'quantity': row['qty'],
+        }
+
+
+def _insert(period, rows, batch_size=1000):
+    """
+    executemany INSERT of rollup rows, like synthetic.py's large tables:
+    bulk_create spends most of its time building model instances, and a
+    rebuild writes more rollups than there are needs
+    """
+    qn = connection.ops.quote_name
+    adapt = connection.ops.adapt_datetimefield_value
+    columns = [Rollup._meta.get_field(field).column for field in ('period',) + COLUMNS]
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+        qn(Rollup._meta.db_table), ', '.join(qn(column) for column in columns), ', '.join(['%s'] * len(columns))
+    )
+    rows = iter(rows)
+    created = 0
+    with connection.cursor() as cursor:
+        while True:
+            batch = [
+                [period] + [adapt(row[field]) if field == 'start' else row[field] for field in COLUMNS]
+                for row in islice(rows, batch_size)
+            ]
+            if not batch:
+                return created
+            cursor.executemany(sql, batch)
+            created += len(batch)
+
+
+def _recount(kind, area_id, hours):
+    """Recount an area's hours of kind and the days they fall in"""
+    first, last = min(hours), max(hours) + HOUR
+    days = {day_start(hour) for hour in hours}
+    first_day, last_day = min(days), day_start(max(days) + timedelta(hours=26))
+    # The hours in between are recounted too; it's the same query
+    rows = [qs.filter(area_id=area_id, created_at__gte=first, created_at__lt=last) for qs in _source_rows(kind)]
+    with transaction.atomic():
+        current = Rollup.objects.filter(kind=kind, area_id=area_id)
+        current.filter(period='hour', start__gte=first, start__lt=last).delete()
+        _insert('hour', _grouped(kind, rows, TruncHour('created_at')))
+        current.filter(period='day', start__gte=first_day, start__lt=last_day).delete()
+        hourly = current.filter(period='hour', start__gte=first_day, start__lt=last_day)
+        _insert('day', _day_rows(kind, hourly))
+
+
+@contextmanager
+def deferred_rollup_refresh():
+    """Collect marked buckets and recount them once on exit, like deferred_summary_refresh()"""
+    if getattr(_deferred, 'hours', None) is not None:
+        yield
+        return
+    _deferred.hours = defaultdict(set)
+    try:
+        yield
+    finally:
+        hours, _deferred.hours = _deferred.hours, None
+        _refresh(hours)
+
+
+def mark(model, rows):
+    """Recount the buckets of model's rows, given as (area_id, created_at) pairs"""
+    kind = KINDS.get(model)
+    if kind is None:
+        return
+    hours = defaultdict(set)
+    for area_id, created_at in rows:
+        if area_id and created_at:
+            hours[(kind, area_id)].add(hour_start(created_at))
+    pending = getattr(_deferred, 'hours', None)
+    if pending is not None:
+        for key, values in hours.items():
+            pending[key].update(values)
+        return
+    _refresh(hours)
+
+
+def mark_objects(objs):
+    """mark() for saved instances, e.g. after bulk_create"""
+    objs = list(objs)
+    if objs and type(objs[0]) in KINDS:
+        mark(type(objs[0]), [(obj.area_id, obj.created_at) for obj in objs])
+
+
+def mark_ids(model, ids, batch_size=500):
+    """mark() for rows by id, e.g. before or after a queryset update()"""
+    if model not in KINDS:
+        return
+    ids = list(ids)
+    for start in range(0, len(ids), batch_size):
+        mark(model, model.objects.filter(id__in=ids[start:start + batch_size]).values_list('area_id', 'created_at'))
+
+
+def _refresh(hours):
+    if not hours:
+        return
+    # Rollups of deleted areas went with them
+    live = set(Area.objects.filter(id__in={area_id for _, area_id in hours}).values_list('id', flat=True))
+    for (kind, area_id), values in hours.items():
+        if area_id in live:
+            _recount(kind, area_id, values)
+
+
+def values(instance):
+    """instance's values of the FIELDS its rollups depend on"""
+    return {field: getattr(instance, field) for field in FIELDS[type(instance)]}
+
+
+def _categories(instance, states):
+    """{product_id: category_id} for the products in states, looked up in one query if needed"""
+    model = type(instance)
+    found = {}
+    if model.product.is_cached(instance) and instance.product is not None:
+        found[instance.product_id] = instance.product.category_id
+    for state in states:
+        # Need snapshots carry it (changefeed.snapshot)
+        if state.get('category_id') and state.get('product_id'):
+            found[state['product_id']] = state['category_id']
+    missing = {state.get('product_id') for state in states} - set(found) - {None}
+    if missing:
+        found.update(Product.objects.filter(id__in=missing).values_list('id', 'category_id'))
+    return found
+
+
+def _key(source, state, categories):
+    """The (area_id, category_id, priority) bucket one row with these values counts in, or None"""
+    if not state.get('area_id') or not source.get('counted', lambda values: True)(state):
+        return None
+    category_id = categories.get(state.get('product_id')) if source['category'] else None
+    priority = state.get(source['priority']) or '' if source['priority'] else ''
+    return state['area_id'], category_id, priority
+
+
+def _add(kind, period, start, area_id, category_id, priority, count, quantity):
+    rows = Rollup.objects.filter(kind=kind, period=period, start=start, area_id=area_id,
+                                 category_id=category_id, priority=priority)
+    # One row, should saves racing to create it have left two
+    updated = Rollup.objects.filter(id__in=rows.order_by().values('id')[:1]).update(
+        count=Greatest(F('count') + count, 0), quantity=Greatest(F('quantity') + quantity, 0),
+    )
+    if not updated and count > 0:
+        Rollup.objects.create(kind=kind, period=period, start=start, area_id=area_id, category_id=category_id,
+                              priority=priority, count=count, quantity=max(quantity, 0))
+
+
+def apply(instance, before, after):
+    """
+    Move one row's count in its hour and day rollups from its before values
+    to its after values (see values()); before is None for a created row,
+    after None for a deleted one. Inside deferred_rollup_refresh() the
+    buckets are marked for a recount instead.
+    """
+    kind = KINDS.get(type(instance))
+    if kind is None or instance.created_at is None:
+        return
+    states = [state for state in (before, after) if state is not None]
+    if getattr(_deferred, 'hours', None) is not None:
+        mark(type(instance), [(state.get('area_id'), instance.created_at) for state in states])
+        return
+
+    source = SOURCES[kind]
+    categories = _categories(instance, states) if source['category'] else {}
+    deltas = defaultdict(lambda: [0, 0])
+    for state, sign in ((before, -1), (after, 1)):
+        key = _key(source, state, categories) if state is not None else None
+        if key is not None:
+            deltas[key][0] += sign
+            deltas[key][1] += sign * ((state.get(source['quantity']) or 0) if source['quantity'] else 0)
+
+    starts = (('hour', hour_start(instance.created_at)), ('day', day_start(instance.created_at)))
+    with transaction.atomic():
+        for (area_id, category_id, priority), (count, quantity) in deltas.items():
+            if count or quantity:
+                for period, start in starts:
+                    _add(kind, period, start, area_id, category_id, priority, count, quantity)
+
+
+def changed(instance, previous):
+    """Whether a save can change instance's rollups; previous is its values before, or None"""
+    if previous is None:
+        return True
+    return any(previous.get(field) != getattr(instance, field) for field in FIELDS[type(instance)])
+
+
+def rebuild_rollups(kinds=None, since=None):
+    """Rebuild rollups from the source tables, all of them or from since on; returns rows written per kind"""
+    written = {}
+    for kind in kinds or SOURCES:
+        rollups = Rollup.objects.filter(kind=kind)
+        rows = _source_rows(kind)
+        if since is not None:
+            # Whole days, so the daily rollups stay complete
+            since = day_start(since)
+            rollups = rollups.filter(start__gte=since)
+            rows = [queryset.filter(created_at__gte=since) for queryset in rows]
+        with transaction.atomic():
+            rollups.delete()
+            hourly = _insert('hour', _grouped(kind, rows, TruncHour('created_at')))
+            daily = _insert('day', _day_rows(kind, rollups.filter(period='hour')))
+        written[kind] = hourly + daily
+    return written
+
+
+def trends(kind, period, since, until, area_ids=None, category_id=None, priority=None, group=None):
+    """
+    Counts and quantities per bucket from since to until, read from rollups only.
+    group splits them into series by 'area', 'category' or 'priority'.
+    Returns (bucket starts, {series key: (counts, quantities)}).
+    """
+    starts = buckets(period, since, until)
+    rollups = Rollup.objects.filter(kind=kind, period=period, start__gte=starts[0] if starts else since,
+                                    start__lt=until)
+    if area_ids:
+        rollups = rollups.filter(area_id__in=area_ids)
+    if category_id:
+        rollups = rollups.filter(category_id=category_id)
+    if priority:
+        rollups = rollups.filter(priority=priority)
+    key = {'area': 'area_id', 'category': 'category_id', 'priority': 'priority'}.get(group)
+    columns = ['start', key] if key else ['start']
+    rows = rollups.values_list(*columns).annotate(n=Sum('count'), qty=Sum('quantity')).order_by()
+
+    index = {start: i for i, start in enumerate(starts)}
+    series = {}
+    for row in rows:
+        start, series_key = row[0], (row[1] if key else 'total')
+        if series_key not in series:
+            series[series_key] = ([0] * len(starts), [0] * len(starts))
+        i = index.get(start)
+        if i is not None:
+            series[series_key][0][i] += row[-2]
+            series[series_key][1][i] += row[-1]
+    return starts, series
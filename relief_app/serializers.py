@@ -0,0 +1,186 @@
+"""
+Fast JSON encoding for API and chart responses
+
+Most of our JSON is rows straight from values_list(): API listings, sync
+pages, the map's shelters, chart series. Building a dict per row and
+running it through json.dumps with DjangoJSONEncoder spends its time on
+per-value type dispatch in Python. A Schema is compiled once per set of
+columns into a function that writes a row's JSON directly from the
+tuple, with each column's encoder chosen up front from the model field.
+
+When orjson is installed (optional, see requirements.txt) it does the
+encoding instead. JSON_BACKEND picks the backend: 'auto' (orjson when it
+can be imported), 'orjson' or 'json'. Both backends produce the same
+JSON: compact separators, UTF-8, datetimes in RFC 3339 with Z for UTC
+and microseconds kept, Decimals and UUIDs as strings.
+
+'manage.py bench_serializers' compares them with json.dumps.
+"""
+import datetime
+import decimal
+import json
+import uuid
+from json.encoder import encode_basestring
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from django.http import HttpResponse
+from django.utils.functional import Promise
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _isoformat(value):
+    text = value.isoformat()
+    return text[:-6] + 'Z' if text.endswith('+00:00') else text
+
+
+def _default(value):
+    """Values neither backend encodes natively"""
+    if isinstance(value, datetime.datetime):
+        return _isoformat(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID, Promise)):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default)
+
+
+def backend():
+    name = getattr(settings, 'JSON_BACKEND', 'auto')
+    if name == 'auto':
+        return 'orjson' if orjson is not None else 'json'
+    if name == 'orjson' and orjson is None:
+        raise ImproperlyConfigured("JSON_BACKEND is 'orjson' but orjson is not installed")
+    return name
+
+
+class Encoded(bytes):
+    """JSON that is already encoded; dumps_object() inserts it as is"""
+
+
+def _html_safe(data):
+    # Like json_script: safe inside <script>, and these only occur in strings
+    return data.replace(b'<', b'\\u003C').replace(b'>', b'\\u003E').replace(b'&', b'\\u0026')
+
+
+def dumps(value, html_safe=False):
+    """Encode any JSON-able value to bytes"""
+    if backend() == 'orjson':
+        data = orjson.dumps(value, default=_default, option=orjson.OPT_UTC_Z)
+    else:
+        data = _encoder.encode(value).encode()
+    return _html_safe(data) if html_safe else data
+
+
+def dumps_object(members):
+    """Encode a dict whose values may be Encoded fragments, e.g. {'data': schema.encode_rows(rows), 'next': url}"""
+    return Encoded(b'{' + b','.join(
+        dumps(key) + b':' + (value if isinstance(value, Encoded) else dumps(value))
+        for key, value in members.items()
+    ) + b'}')
+
+
+def json_response(data, status=200):
+    """JsonResponse through the fast encoder; data may be bytes from dumps_object()"""
+    body = data if isinstance(data, bytes) else dumps(data)
+    return HttpResponse(body, content_type='application/json', status=status)
+
+
+# Per-column encoders; None is handled before they are called
+ENCODERS = {
+    'int': repr,
+    'float': repr,
+    'str': encode_basestring,
+    'bool': lambda value: 'true' if value else 'false',
+    'datetime': lambda value: '"' + _isoformat(value) + '"',
+    'any': _encoder.encode,
+}
+
+
+def field_kind(field):
+    """The encoder for a model field's values"""
+    if field.is_relation and not field.auto_created:
+        field = field.target_field
+    if isinstance(field, models.BooleanField):
+        return 'bool'
+    if isinstance(field, (models.IntegerField, models.AutoField)):
+        return 'int'
+    if isinstance(field, models.FloatField):
+        return 'float'
+    if isinstance(field, (models.CharField, models.TextField)):
+        return 'str'
+    if isinstance(field, models.DateTimeField):
+        return 'datetime'
+    return 'any'
+
+
+def _resolve(model, lookup):
+    *path, name = lookup.split('__')
+    for part in path:
+        model = model._meta.get_field(part).related_model
+    return model._meta.get_field(name)
+
+
+def _compile(names, kinds):
+    """Build encode(row) -> str for rows of these columns"""
+    if not names:
+        return lambda row: '{}'
+    env = {}
+    parts = []
+    for i, (name, kind) in enumerate(zip(names, kinds)):
+        env[f'e{i}'] = ENCODERS[kind]
+        key = ('{' if i == 0 else ',') + json.dumps(name, ensure_ascii=False) + ':'
+        parts.append(f"{key!r} + ('null' if row[{i}] is None else e{i}(row[{i}]))")
+    source = 'def encode(row):\n    return ' + ' + '.join(parts) + " + '}'\n"
+    exec(source, env)
+    return env['encode']
+
+
+class Schema:
+    """
+    The columns of values_list() rows, encoded as JSON objects.
+    fields is (name, kind) pairs in column order, kind one of ENCODERS.
+    """
+
+    def __init__(self, fields):
+        self.names = tuple(name for name, _ in fields)
+        self.kinds = tuple(kind for _, kind in fields)
+        self._encode = _compile(self.names, self.kinds)
+
+    @classmethod
+    def for_model(cls, model, lookups, names=None, kinds=None):
+        """
+        Schema for model.objects.values_list(*lookups), named names (the
+        lookups by default). kinds gives the kind of annotations or
+        overrides a lookup's, keyed by lookup.
+        """
+        kinds = kinds or {}
+        names = names or lookups
+        return cls([
+            (name, kinds[lookup] if lookup in kinds else field_kind(_resolve(model, lookup)))
+            for name, lookup in zip(names, lookups)
+        ])
+
+    def encode_rows(self, rows, html_safe=False):
+        """A JSON array with an object per row"""
+        if backend() == 'orjson':
+            names = self.names
+            data = orjson.dumps([dict(zip(names, row)) for row in rows], default=_default, option=orjson.OPT_UTC_Z)
+        else:
+            encode = self._encode
+            data = ('[' + ','.join([encode(row) for row in rows]) + ']').encode()
+        return Encoded(_html_safe(data) if html_safe else data)
+
+    def encode_row(self, row):
+        """A JSON object for one row"""
+        if backend() == 'orjson':
+            return Encoded(orjson.dumps(dict(zip(self.names, row)), default=_default, option=orjson.OPT_UTC_Z))
+        return Encoded(self._encode(row).encode())
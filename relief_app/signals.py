@@ -0,0 +1,157 @@
+"""
+Signal handlers for Hurricane Heroes
+Connected in ReliefAppConfig.ready()
+"""
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Area, AreaAdmin, Category, Donation, Incident, Need, NeedRequest, Product, Volunteer
+from . import changefeed, incidents, metrics, profiling, roles, rollups, slowqueries, sync
+from .summaries import refresh_area_summaries
+
+
+@receiver(pre_save, sender=Need)
+@receiver(pre_save, sender=NeedRequest)
+@receiver(pre_save, sender=Donation)
+@receiver(pre_save, sender=Volunteer)
+def remember_previous_values(sender, instance, **kwargs):
+    """Keep the old values so moving a need updates both summaries and change events show what changed"""
+    instance._previous_values = None
+    if instance.pk and (sender in rollups.KINDS or changefeed.enabled()):
+        instance._previous_values = changefeed.snapshot(sender, [instance.pk]).get(instance.pk)
+
+
+@receiver(pre_save, sender=Need)
+@receiver(pre_save, sender=NeedRequest)
+@receiver(pre_save, sender=Donation)
+@receiver(pre_save, sender=Volunteer)
+def copy_area_incident(sender, instance, raw=False, **kwargs):
+    """Keep the row's copy of its area's incident (relief_app/incidents.py)"""
+    if raw or instance.area_id is None:
+        return
+    if sender.area.field.is_cached(instance):
+        instance.incident_id = instance.area.incident_id
+        return
+    previous = getattr(instance, '_previous_values', None)
+    if instance.incident_id is not None and previous is not None and previous.get('area_id') == instance.area_id:
+        return
+    instance.incident_id = incidents.incident_of(instance.area_id)
+
+
+@receiver(pre_save, sender=Area)
+def remember_area_incident(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.incident_id is None and instance.pk is None:
+        instance.incident_id = incidents.default_incident_id()
+    instance._previous_incident_id = (
+        Area.objects.filter(pk=instance.pk).values_list('incident_id', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Area)
+def move_area_to_incident(sender, instance, created, raw=False, **kwargs):
+    """An area moved to another incident takes its needs, donations and volunteers along"""
+    if raw or created:
+        return
+    if getattr(instance, '_previous_incident_id', None) != instance.incident_id:
+        incidents.move_area(instance)
+
+
+@receiver(post_save, sender=Incident)
+@receiver(post_delete, sender=Incident)
+def forget_incidents(sender, **kwargs):
+    incidents.invalidate()
+
+
+@receiver(post_save, sender=AreaAdmin)
+@receiver(post_delete, sender=AreaAdmin)
+@receiver(post_save, sender=Area)
+@receiver(post_delete, sender=Area)
+def forget_relief_profiles(sender, raw=False, **kwargs):
+    # Sessions keep the shelter admin's profile and shelter (relief_app/roles.py)
+    if not raw:
+        roles.invalidate()
+
+
+@receiver(post_save, sender=Need)
+def update_summary_on_need_save(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_values', None) or {}
+    refresh_area_summaries({instance.area_id, previous.get('area_id')})
+    if previous.get('area_id') and previous['area_id'] != instance.area_id:
+        # Clients syncing only the old area drop it
+        sync.record_moves([(instance.pk, previous['area_id'])])
+
+
+@receiver(post_delete, sender=Need)
+def update_summary_on_need_delete(sender, instance, origin=None, **kwargs):
+    # When the whole area is being deleted its summary goes with it
+    if isinstance(origin, Area) or getattr(origin, 'model', None) is Area:
+        return
+    refresh_area_summaries({instance.area_id})
+
+
+@receiver(post_save, sender=Need)
+@receiver(post_save, sender=Donation)
+@receiver(post_save, sender=Volunteer)
+def update_rollups_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_previous_values', None)
+    if created:
+        rollups.apply(instance, None, rollups.values(instance))
+    elif previous is None:
+        # No values from before the save to take off; recount the bucket
+        rollups.mark(sender, [(instance.area_id, instance.created_at)])
+    elif rollups.changed(instance, previous):
+        rollups.apply(instance, previous, rollups.values(instance))
+
+
+@receiver(post_delete, sender=Need)
+@receiver(post_delete, sender=Donation)
+@receiver(post_delete, sender=Volunteer)
+def update_rollups_on_delete(sender, instance, origin=None, **kwargs):
+    # An area's rollups are deleted with it
+    if isinstance(origin, Area) or getattr(origin, 'model', None) is Area:
+        return
+    rollups.apply(instance, rollups.values(instance), None)
+
+
+@receiver(post_save, sender=Need)
+@receiver(post_save, sender=NeedRequest)
+@receiver(post_save, sender=Donation)
+@receiver(post_save, sender=Volunteer)
+def record_change_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        # loaddata / database import
+        return
+    if created:
+        changefeed.record('created', instance)
+    else:
+        changefeed.record('updated', instance, before=getattr(instance, '_previous_values', None))
+
+
+@receiver(post_delete, sender=Need)
+@receiver(post_delete, sender=NeedRequest)
+@receiver(post_delete, sender=Donation)
+@receiver(post_delete, sender=Volunteer)
+def record_change_on_delete(sender, instance, **kwargs):
+    changefeed.record('deleted', instance)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Area)
+@receiver(post_delete, sender=Need)
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    """Tell delta sync clients (relief_app/sync.py) about the delete"""
+    sync.record_delete(sender._meta.model_name, instance, origin)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """Slow-query log, metrics and profiling query wrappers on every connection"""
+    slowqueries.install(connection)
+    metrics.install(connection)
+    profiling.install(connection)
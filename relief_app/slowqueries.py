@@ -0,0 +1,196 @@
+"""
+Slow-query log with automatic EXPLAIN capture
+
+Every database connection gets a SlowQueryLogger execute_wrapper (see the
+connection_created handler in signals.py). Statements slower than
+SLOW_QUERY_THRESHOLD_MS are logged to the 'relief_app.slow_queries'
+logger and appended as JSON lines to SLOW_QUERY_LOG_DIR/<pid>.jsonl with:
+
+    fp      fingerprint of the normalized SQL (literals and IN lists
+            collapsed, so the same ORM query always has the same one)
+    sql     the normalized SQL
+    site    the relief_app code that ran it, e.g. relief_app/views.py:1112(export_needs)
+    ms      duration
+    plan    EXPLAIN QUERY PLAN output, captured once per fingerprint per
+            process for SELECTs
+
+Parameters are never stored; they hold names, emails and phone numbers.
+'manage.py slow_query_report' aggregates the files into a top-N list.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger('relief_app.slow_queries')
+
+DEFAULT_THRESHOLD_MS = 100
+MAX_SQL_LENGTH = 2000
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w".])-?\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)', re.IGNORECASE)
+_VALUES_LIST = re.compile(r'\bVALUES\s*(\([^()]*\))(?:\s*,\s*\([^()]*\))+', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+# Our own instrumentation wraps every query; the call site is what is underneath
+_INSTRUMENTATION = ('slowqueries.py', 'metrics.py', 'profiling.py')
+
+
+def normalize_sql(sql):
+    """SQL with literals replaced by ? and variable-length lists collapsed"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _VALUES_LIST.sub(r'VALUES \1, ...', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode('utf-8')).hexdigest()[:12]
+
+
+def call_site():
+    """The innermost relief_app frame on the stack, as path:line(function)"""
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(app_dir) and not filename.endswith(_INSTRUMENTATION):
+            relative = os.path.relpath(filename, os.path.dirname(app_dir))
+            return f'{relative}:{frame.f_lineno}({frame.f_code.co_name})'
+        frame = frame.f_back
+    return None
+
+
+def explain(connection, sql, params):
+    """The query plan as a list of lines, on a fresh cursor so results in flight are untouched"""
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail); indent children under their parents
+        depth = {0: -1}
+        lines = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            lines.append('  ' * depth[node_id] + detail)
+        return lines
+    return [' '.join(str(col) for col in row) for row in rows]
+
+
+def log_dir():
+    return Path(getattr(settings, 'SLOW_QUERY_LOG_DIR', Path(settings.BASE_DIR) / 'slow_queries'))
+
+
+def write_record(record):
+    directory = log_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{os.getpid()}.jsonl'
+    try:
+        if path.stat().st_size > getattr(settings, 'SLOW_QUERY_MAX_FILE_BYTES', 5 * 1024 * 1024):
+            os.replace(path, path.with_suffix('.jsonl.old'))
+    except FileNotFoundError:
+        pass
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+
+def load_records(since=None):
+    records = []
+    for path in log_dir().glob('*.jsonl*'):
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if since is None or record['ts'] >= since:
+                        records.append(record)
+        except FileNotFoundError:
+            continue
+    return records
+
+
+def clear_records():
+    for path in log_dir().glob('*.jsonl*'):
+        path.unlink(missing_ok=True)
+
+
+class SlowQueryLogger:
+    """execute_wrapper logging statements slower than the threshold"""
+
+    def __init__(self, threshold_ms=None):
+        self.threshold_ms = threshold_ms
+        # Fingerprints already explained by this process
+        self.explained = set()
+        self.local = threading.local()
+
+    def __call__(self, execute, sql, params, many, context):
+        # executemany batches are bulk loads (generate_data, matching), not queries
+        if many or getattr(self.local, 'active', False):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            threshold = self.threshold_ms
+            if threshold is None:
+                threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', DEFAULT_THRESHOLD_MS)
+            if elapsed_ms >= threshold:
+                self.local.active = True
+                try:
+                    self.record(sql, params, context['connection'], elapsed_ms)
+                except Exception:
+                    logger.exception('Could not record slow query')
+                finally:
+                    self.local.active = False
+
+    def record(self, sql, params, connection, elapsed_ms):
+        normalized = normalize_sql(sql)
+        fp = fingerprint(normalized)
+        site = call_site()
+        plan = None
+        if (fp not in self.explained and normalized.upper().startswith('SELECT')
+                and getattr(settings, 'SLOW_QUERY_EXPLAIN', True)):
+            self.explained.add(fp)
+            try:
+                plan = explain(connection, sql, params)
+            except Exception as e:
+                plan = [f'EXPLAIN failed: {e}']
+        logger.warning('Slow query %.1fms [%s] at %s: %s', elapsed_ms, fp, site or 'outside relief_app',
+                       normalized[:300])
+        write_record({
+            'ts': time.time(),
+            'fp': fp,
+            'ms': round(elapsed_ms, 2),
+            'sql': normalized[:MAX_SQL_LENGTH],
+            'site': site,
+            'plan': plan,
+        })
+
+
+_logger = SlowQueryLogger()
+
+
+def install(connection):
+    """Add the slow-query logger to a new connection (once)"""
+    if not getattr(settings, 'SLOW_QUERY_LOG_ENABLED', True):
+        return
+    if _logger not in connection.execute_wrappers:
+        # First in the list, because connections often open inside a
+        # request-scoped execute_wrapper() block, which pops the last entry
+        connection.execute_wrappers.insert(0, _logger)
@@ -0,0 +1,106 @@
+"""
+Maintenance of the AreaNeedSummary read model
+
+The summary for an area is recomputed from that area's needs only (one
+grouped query on the indexed area_id column), so a save or delete costs
+the same no matter how large the whole Need table grows.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .models import Area, AreaNeedSummary, Need
+
+OPEN_STATUSES = ('pending', 'in_progress')
+
+_deferred = threading.local()
+
+
+def _empty_totals():
+    return {
+        'total_count': 0,
+        'open_count': 0,
+        'urgent_count': 0,
+        'fulfilled_count': 0,
+        'open_quantity': 0,
+        'quantity_by_category': {},
+    }
+
+
+def _aggregate(needs):
+    """Group needs by area/category/status/priority and fold into per-area totals"""
+    rows = needs.values('area_id', 'product__category_id', 'status', 'priority').annotate(
+        n=Count('id'), qty=Sum('quantity')
+    ).order_by()
+
+    totals = defaultdict(_empty_totals)
+    for row in rows:
+        t = totals[row['area_id']]
+        t['total_count'] += row['n']
+        if row['status'] == 'fulfilled':
+            t['fulfilled_count'] += row['n']
+        if row['status'] in OPEN_STATUSES:
+            t['open_count'] += row['n']
+            t['open_quantity'] += row['qty'] or 0
+            if row['priority'] == 'urgent':
+                t['urgent_count'] += row['n']
+            cat_key = str(row['product__category_id'])
+            by_cat = t['quantity_by_category']
+            by_cat[cat_key] = by_cat.get(cat_key, 0) + (row['qty'] or 0)
+    return totals
+
+
+@contextmanager
+def deferred_summary_refresh():
+    """
+    Collect summary refreshes and run them once on exit.
+
+    Use around bulk operations so deleting 500 needs refreshes each
+    affected area once instead of once per need.
+    """
+    if getattr(_deferred, 'area_ids', None) is not None:
+        # Already deferring further up the stack
+        yield
+        return
+    _deferred.area_ids = set()
+    try:
+        yield
+    finally:
+        area_ids, _deferred.area_ids = _deferred.area_ids, None
+        refresh_area_summaries(area_ids)
+
+
+def refresh_area_summaries(area_ids):
+    """Recompute the summaries of the given areas"""
+    area_ids = {a for a in area_ids if a}
+    if not area_ids:
+        return
+    pending = getattr(_deferred, 'area_ids', None)
+    if pending is not None:
+        pending.update(area_ids)
+        return
+    # Skip areas deleted in the meantime
+    area_ids = set(Area.objects.filter(id__in=area_ids).values_list('id', flat=True))
+    totals = _aggregate(Need.objects.filter(area_id__in=area_ids))
+    with transaction.atomic():
+        for area_id in area_ids:
+            AreaNeedSummary.objects.update_or_create(
+                area_id=area_id,
+                defaults=totals.get(area_id) or _empty_totals(),
+            )
+
+
+def rebuild_all_summaries(batch_size=1000):
+    """Drop and rebuild every summary row from the Need table"""
+    totals = _aggregate(Need.objects.all())
+    summaries = [
+        AreaNeedSummary(area_id=area_id, **(totals.get(area_id) or _empty_totals()))
+        for area_id in Area.objects.values_list('id', flat=True)
+    ]
+    with transaction.atomic():
+        AreaNeedSummary.objects.all().delete()
+        AreaNeedSummary.objects.bulk_create(summaries, batch_size=batch_size)
+    return len(summaries)
@@ -0,0 +1,255 @@
+"""
+Delta sync for offline field clients
+
+GET /api/sync/?since=<token>[&area=<id>] returns the categories,
+products, areas and needs created or changed since the token, and the
+ids of those deleted, in compact columnar batches:
+
+    {
+      "v": 1,
+      "full": false,   true: a complete snapshot, replace local data with it
+      "more": false,   true: call again with "next" straight away
+      "next": "...",   the token to send next time
+      "upserts": {"need": {"fields": ["id", "area_id", ...], "rows": [[...], ...]}, ...},
+      "deletes": {"need": [12, 13], "area": [4]}
+    }
+
+Apply upserts, then deletes. Deleting an area, product or category also
+deletes what belongs to it on the client, as it does here: cascaded
+deletes don't get tombstones of their own. With ?area= only that area's
+needs are sent, and a need moving away from it is sent as a delete.
+So is a need moved to the archive (relief_app/archive.py).
+
+Changes are found by updated_at, deletes by Tombstone rows written in
+signals.py. Each pass over the tables has a fixed upper bound, now minus
+SYNC_COMMIT_LAG_SECONDS, so rows from a transaction still committing are
+left to the next pass instead of being skipped. Pages are cut by
+(updated_at, id), which is indexed on every table, so a page boundary
+never skips or repeats a row.
+
+Tombstones are kept SYNC_TOMBSTONE_RETENTION_DAYS and then removed by
+'manage.py compact_tombstones'. A token older than that could miss
+deletes, so it is answered with a full snapshot instead.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Area, Category, Need, Product, Tombstone
+
+VERSION = 1
+
+# Read in this order, so clients get a need's product and area before the need
+TABLES = [
+    ('category', Category, ('id', 'name', 'description')),
+    ('product', Product, ('id', 'name', 'category_id', 'unit', 'description')),
+    ('area', Area, ('id', 'name', 'description', 'address', 'pincode', 'latitude', 'longitude')),
+    ('need', Need, ('id', 'area_id', 'product_id', 'quantity', 'priority', 'status', 'notes', 'created_at')),
+]
+TOMBSTONE_PHASE = len(TABLES)
+
+
+def _micros(value):
+    return int(value.timestamp() * 1_000_000)
+
+
+def _datetime(micros):
+    return datetime.fromtimestamp(micros / 1_000_000, tz=dt_timezone.utc)
+
+
+def encode_token(state):
+    raw = json.dumps(state, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_token(token):
+    """Token state, or None for a missing or unreadable token"""
+    if not token:
+        return None
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(state, dict) or state.get('v') != VERSION:
+        return None
+    # Tokens come back from clients: anything but the shape _new_pass()
+    # makes gets a full snapshot, not an error
+    if not all(_is_int(state.get(key)) or state.get(key) is None for key in ('s', 'u', 't')):
+        return None
+    if not _is_int(state.get('p')) or not 0 <= state['p'] <= TOMBSTONE_PHASE or not _is_int(state.get('i')):
+        return None
+    try:
+        for key in ('s', 'u', 't'):
+            if state[key] is not None:
+                _datetime(state[key])
+    except (OverflowError, ValueError, OSError):
+        return None
+    return state
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _new_pass(since):
+    # s: changes after this, u: up to this (set on the first page), p: table,
+    # t/i: (updated_at, id) of the last row sent from it
+    return {'v': VERSION, 's': since, 'u': None, 'p': 0, 't': None, 'i': 0}
+
+
+def _page(queryset, time_field, state, since, until, limit):
+    queryset = queryset.filter(**{f'{time_field}__lte': until})
+    if since is not None:
+        queryset = queryset.filter(**{f'{time_field}__gt': since})
+    if state['t'] is not None:
+        last = _datetime(state['t'])
+        queryset = queryset.filter(Q(**{f'{time_field}__gt': last}) | Q(**{time_field: last, 'id__gt': state['i']}))
+    return queryset.order_by(time_field, 'id')[:limit]
+
+
+def _tombstones(area_id):
+    # An archived need restored since is live again
+    tombstones = Tombstone.objects.exclude(kind='need', reason='archived', object_id__in=Need.objects.values('id'))
+    if area_id is None:
+        return tombstones.exclude(reason='moved')
+    # A need that left the area and came back is still there
+    returned = Need.objects.filter(area_id=area_id).values('id')
+    return tombstones.filter(~Q(kind='need') | Q(area_id=area_id)).exclude(
+        reason='moved', object_id__in=returned
+    )
+
+
+def changes(token=None, area_id=None, batch_size=None):
+    """The next batch of changes for a client holding token (see module docstring)"""
+    batch_size = batch_size or getattr(settings, 'SYNC_BATCH_SIZE', 5000)
+    now = timezone.now()
+    oldest = now - timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+
+    state = decode_token(token)
+    if state is not None and (
+        state.get('a') != area_id
+        # Deletes from before the oldest tombstone kept are gone
+        or (state['s'] is not None and _datetime(state['s']) < oldest)
+    ):
+        state = None
+    if state is None:
+        state = _new_pass(None)
+    state['a'] = area_id
+    if state['u'] is None:
+        state['u'] = _micros(now - timedelta(seconds=getattr(settings, 'SYNC_COMMIT_LAG_SECONDS', 5)))
+    since = _datetime(state['s']) if state['s'] is not None else None
+    until = _datetime(state['u'])
+
+    upserts, deletes = {}, {}
+    remaining = batch_size
+    while remaining > 0 and state['p'] <= TOMBSTONE_PHASE:
+        if state['p'] < TOMBSTONE_PHASE:
+            kind, model, fields = TABLES[state['p']]
+            queryset = model.objects.all()
+            if kind == 'need' and area_id is not None:
+                queryset = queryset.filter(area_id=area_id)
+            rows = list(_page(queryset, 'updated_at', state, since, until, remaining)
+                        .values_list('updated_at', *fields))
+            if rows:
+                upserts[kind] = {'fields': list(fields), 'rows': [list(row[1:]) for row in rows]}
+            last = (rows[-1][0], rows[-1][1]) if rows else None
+        elif since is None:
+            # A full snapshot has nothing to delete
+            rows, last = [], None
+        else:
+            rows = list(_page(_tombstones(area_id), 'deleted_at', state, since, until, remaining)
+                        .values_list('deleted_at', 'id', 'kind', 'object_id'))
+            for _, _, kind, object_id in rows:
+                deletes.setdefault(kind, []).append(object_id)
+            last = (rows[-1][0], rows[-1][1]) if rows else None
+
+        remaining -= len(rows)
+        if remaining > 0:
+            # This table is done
+            state.update(p=state['p'] + 1, t=None, i=0)
+        else:
+            state.update(t=_micros(last[0]), i=last[1])
+
+    more = state['p'] <= TOMBSTONE_PHASE
+    full = since is None
+    next_state = state if more else dict(_new_pass(state['u']), a=area_id)
+    return {
+        'v': VERSION,
+        'full': full,
+        'more': more,
+        'next': encode_token(next_state),
+        'upserts': upserts,
+        'deletes': deletes,
+    }
+
+
+# Tombstones
+
+def _cascaded(origin, *models):
+    """Whether a delete started from deleting one (or a queryset) of models"""
+    return isinstance(origin, models) or getattr(origin, 'model', None) in models
+
+
+def record_delete(kind, instance, origin=None):
+    """Tombstone for a deleted object, unless clients delete it with its parent"""
+    if kind == 'need' and _cascaded(origin, Area, Product, Category):
+        return
+    if kind == 'product' and _cascaded(origin, Category):
+        return
+    area_id = instance.area_id if kind == 'need' else None
+    Tombstone.objects.create(kind=kind, object_id=instance.pk, area_id=area_id)
+
+
+def record_moves(moves, reason='moved'):
+    """
+    Tombstones under the old area for needs moved elsewhere, another area
+    or the archive (reason='archived'); moves is [(need_id, old_area_id)]
+    """
+    Tombstone.objects.bulk_create([
+        Tombstone(kind='need', object_id=need_id, area_id=old_area_id, reason=reason)
+        for need_id, old_area_id in moves
+    ], batch_size=500)
+
+
+def compact(days=None):
+    """
+    Drop tombstones no token can still need, returns counts by rule:
+
+    expired     older than SYNC_TOMBSTONE_RETENTION_DAYS (those tokens get a full snapshot)
+    duplicate   all but the newest for the same object, reason and area
+    cascaded    need tombstones under an area deleted later, which deletes them anyway
+    """
+    days = getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30) if days is None else days
+    counts = {}
+    counts['expired'] = Tombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days)).delete()[0]
+
+    newest = {}
+    stale = []
+    for pk, key in ((t[0], t[1:]) for t in Tombstone.objects.order_by('-deleted_at', '-id')
+                    .values_list('id', 'kind', 'object_id', 'reason', 'area_id').iterator()):
+        if key in newest:
+            stale.append(pk)
+        else:
+            newest[key] = pk
+    counts['duplicate'] = _delete_ids(stale)
+
+    area_deleted = dict(Tombstone.objects.filter(kind='area').values_list('object_id', 'deleted_at'))
+    stale = [
+        pk for pk, area_id, deleted_at in
+        Tombstone.objects.filter(kind='need', area_id__in=list(area_deleted)).values_list('id', 'area_id', 'deleted_at')
+        if deleted_at <= area_deleted[area_id]
+    ]
+    counts['cascaded'] = _delete_ids(stale)
+    return counts
+
+
+def _delete_ids(ids, batch_size=500):
+    deleted = 0
+    for start in range(0, len(ids), batch_size):
+        deleted += Tombstone.objects.filter(id__in=ids[start:start + batch_size]).delete()[0]
+    return deleted
@@ -0,0 +1,434 @@
+"""
+Synthetic data generator for load testing and benchmarks
+
+generate(scale) fills the database with a storm's worth of data:
+shelters clustered around Southwest Florida towns, a long-tailed spread
+of needs over shelters (a few shelters carry most of the load), public
+need requests, volunteers, donations, contact messages and articles, all
+under one active incident.
+
+scale=1 is 1,000 shelters, 100k needs and about 133k rows in total; the
+row counts grow linearly, so scale=10 gives 1M needs. Columns are drawn
+with NumPy from one seeded generator, so the same seed and scale always
+produce the same data.
+
+The large tables are written with executemany in batches (like the
+matching engine), because bulk_create spends most of its time building
+model instances and manages only a few thousand rows a second on SQLite.
+Small tables still go through bulk_create.
+"""
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import (
+    ArchivedNeed, Area, AreaAdmin, AreaNeedSummary, Article, Category, Contact, Donation, DonationAllocation,
+    Incident, InventoryBalance, InventoryEntry, Need, NeedRequest, Product, Rollup, Volunteer,
+)
+from . import incidents
+from .dedup import fingerprint
+from .rollups import rebuild_rollups
+from .summaries import rebuild_all_summaries
+
+User = get_user_model()
+
+BATCH_SIZE = 10000
+USERNAME_PREFIX = 'synthetic_'
+DEFAULT_PASSWORD = 'admin123'
+
+# Rows per unit of scale
+ROWS_PER_SCALE = {
+    'areas': 1000,
+    'needs': 100000,
+    'need_requests': 10000,
+    'volunteers': 10000,
+    'donations': 10000,
+    'contacts': 2500,
+    'articles': 100,
+}
+
+# (town, latitude, longitude, relative population)
+TOWNS = [
+    ('Fort Myers', 26.6406, -81.8723, 10),
+    ('Cape Coral', 26.5629, -81.9495, 10),
+    ('Naples', 26.1420, -81.7948, 6),
+    ('Lehigh Acres', 26.6254, -81.6248, 6),
+    ('Port Charlotte', 26.9762, -82.0906, 4),
+    ('Bonita Springs', 26.3398, -81.7787, 3),
+    ('Punta Gorda', 26.9298, -82.0454, 2),
+    ('Estero', 26.4381, -81.8068, 2),
+    ('Immokalee', 26.4187, -81.4173, 2),
+    ('Sanibel', 26.4489, -82.0223, 1),
+    ('Marco Island', 25.9412, -81.7184, 1),
+    ('Fort Myers Beach', 26.4520, -81.9481, 1),
+]
+
+CATEGORY_PRODUCTS = {
+    'Food': [('Bottled Water', 'cases'), ('Canned Food', 'cans'), ('Baby Formula', 'cans'),
+             ('Rice', 'kg'), ('Energy Bars', 'boxes'), ('Pet Food', 'bags')],
+    'Medicine': [('First Aid Kit', 'kits'), ('Pain Relievers', 'boxes'), ('Insulin', 'vials'),
+                 ('Bandages', 'boxes'), ('Prescription Refills', 'orders')],
+    'Shelter': [('Tents', 'units'), ('Tarpaulin', 'sheets'), ('Blankets', 'pieces'), ('Cots', 'units'),
+                ('Sleeping Bags', 'units'), ('Generators', 'units')],
+    'Clothing': [('Clothes', 'pieces'), ('Shoes', 'pairs'), ('Rain Jackets', 'pieces'), ('Socks', 'pairs')],
+    'Hygiene': [('Soap', 'bars'), ('Toothpaste', 'tubes'), ('Diapers', 'packs'),
+                ('Sanitary Pads', 'packs'), ('Hand Sanitizer', 'bottles')],
+    'Cleanup': [('Mops', 'units'), ('Bleach', 'bottles'), ('Trash Bags', 'boxes'),
+                ('Work Gloves', 'pairs'), ('Chainsaws', 'units')],
+}
+
+FIRST_NAMES = ['Maria', 'James', 'Ana', 'Robert', 'Linda', 'Carlos', 'Patricia', 'Michael', 'Rosa',
+               'David', 'Jennifer', 'Luis', 'Susan', 'John', 'Yolanda', 'William', 'Karen', 'Jose']
+LAST_NAMES = ['Smith', 'Garcia', 'Johnson', 'Rodriguez', 'Williams', 'Martinez', 'Brown', 'Lopez',
+              'Jones', 'Hernandez', 'Miller', 'Gonzalez', 'Davis', 'Perez', 'Wilson', 'Sanchez']
+URGENCY_NOTES = ['', '', '', 'Urgent need', 'Elderly residents', 'Families with infants',
+                 'Power still out', 'Road access limited', 'Restock before weekend']
+SKILLS = ['', 'First aid', 'Driving (CDL)', 'Spanish/English', 'Cooking for large groups',
+          'Chainsaw operation', 'Nursing', 'Logistics', 'Childcare']
+AVAILABILITY = ['Weekdays', 'Weekends', 'Evenings', 'Full time', 'Mornings']
+CONTACT_SUBJECTS = ['Shelter hours', 'Donation drop-off', 'Volunteer question', 'Missing supplies',
+                    'Pet policy', 'Transportation']
+
+PRIORITIES = (['low', 'medium', 'high', 'urgent'], [0.3, 0.4, 0.2, 0.1])
+STATUSES = (['pending', 'in_progress', 'fulfilled', 'cancelled'], [0.45, 0.25, 0.25, 0.05])
+URGENCIES = (['low', 'medium', 'high', 'urgent'], [0.2, 0.4, 0.25, 0.15])
+REQUEST_STATUSES = (['new', 'reviewed', 'approved', 'rejected'], [0.5, 0.2, 0.25, 0.05])
+CONTACT_STATUSES = (['new', 'read', 'replied', 'resolved'], [0.4, 0.2, 0.2, 0.2])
+
+# Clearing order: children before parents
+GENERATED_MODELS = [
+    Rollup, ArchivedNeed, DonationAllocation, InventoryEntry, InventoryBalance, AreaNeedSummary, Donation, NeedRequest,
+    Volunteer, Need, AreaAdmin, Contact, Article, Product, Category, Area, Incident,
+]
+
+
+def row_counts(scale):
+    return {name: max(1, int(round(per * scale))) for name, per in ROWS_PER_SCALE.items()}
+
+
+@contextmanager
+def fast_sqlite_writes():
+    """Skip fsyncs while generating; the data is disposable anyway"""
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous')
+        previous = cursor.fetchone()[0]
+        cursor.execute('PRAGMA synchronous = OFF')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA synchronous = {int(previous)}')
+
+
+def _insert(model, fields, columns, batch_size=BATCH_SIZE):
+    """executemany INSERT of column lists (already in database format)"""
+    qn = connection.ops.quote_name
+    names = [model._meta.get_field(f).column for f in fields]
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+        qn(model._meta.db_table), ', '.join(qn(n) for n in names), ', '.join(['%s'] * len(names))
+    )
+    rows = list(zip(*columns))
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+    return len(rows)
+
+
+class Generator:
+    def __init__(self, scale=1, seed=42, days=30, batch_size=BATCH_SIZE):
+        self.counts = row_counts(scale)
+        self.rng = np.random.default_rng(seed)
+        self.batch_size = batch_size
+        self.end = timezone.now().replace(microsecond=0)
+        self.start = self.end - timedelta(days=days)
+        self.span_seconds = days * 86400
+
+    # Column helpers -------------------------------------------------
+
+    def choice(self, options, n, p=None):
+        return np.asarray(options, dtype=object)[self.rng.choice(len(options), size=n, p=p)].tolist()
+
+    def weighted(self, choices, n):
+        """choices is (values, probabilities)"""
+        return self.choice(choices[0], n, p=choices[1])
+
+    def timestamps(self, n, skew=1.5):
+        """
+        Database-format timestamps over the window, denser towards the
+        end (activity ramps up as the storm hits). Returns (strings, offsets).
+        """
+        offsets = np.sort(self.rng.power(skew, size=n) * self.span_seconds)
+        return self._format(offsets), offsets
+
+    def _format(self, offsets):
+        base = np.datetime64(self.start.replace(tzinfo=None), 'us')
+        stamps = base + (offsets * 1e6).astype('timedelta64[us]')
+        # Same text format Django writes for DateTimeField on SQLite
+        return np.char.replace(np.datetime_as_string(stamps, unit='us'), 'T', ' ').tolist()
+
+    def later(self, offsets, mean_seconds):
+        """A second timestamp some time after each offset, capped at now"""
+        delay = self.rng.exponential(mean_seconds, size=len(offsets))
+        return self._format(np.minimum(offsets + delay, self.span_seconds))
+
+    def names(self, n):
+        first = self.choice(FIRST_NAMES, n)
+        last = self.choice(LAST_NAMES, n)
+        return [f'{a} {b}' for a, b in zip(first, last)]
+
+    def emails(self, names, prefix):
+        return [f'{name.lower().replace(" ", ".")}.{prefix}{i}@example.com' for i, name in enumerate(names)]
+
+    def phones(self, n):
+        return [f'239{x:07d}' for x in self.rng.integers(0, 10**7, size=n)]
+
+    def quantities(self, n, median=40, high=5000):
+        return np.clip(self.rng.lognormal(np.log(median), 1.0, size=n), 1, high).astype(int).tolist()
+
+    def area_picks(self, n):
+        """Area ids for n rows: a Zipf-like spread so a few shelters carry most of the load"""
+        weights = 1.0 / np.arange(1, len(self.area_ids) + 1) ** 0.8
+        return self.area_ids_array[self.rng.choice(len(self.area_ids), size=n, p=weights / weights.sum())].tolist()
+
+    # Tables ---------------------------------------------------------
+
+    def make_catalog(self):
+        categories = Category.objects.bulk_create(
+            [Category(name=name, description=f'{name} supplies') for name in CATEGORY_PRODUCTS]
+        )
+        products = Product.objects.bulk_create([
+            Product(name=name, description=f'{name} ({unit})', category=category, unit=unit)
+            for category in categories for name, unit in CATEGORY_PRODUCTS[category.name]
+        ])
+        self.product_ids = [p.pk for p in products]
+        self.product_names = [p.name for p in products]
+        return len(categories) + len(products)
+
+    def make_incident(self):
+        self.incident_id = Incident.objects.create(
+            name='Synthetic storm', slug='synthetic-storm', started_at=self.start,
+        ).pk
+        return 1
+
+    def make_areas(self):
+        n = self.counts['areas']
+        weights = np.array([t[3] for t in TOWNS], dtype=float)
+        towns = self.rng.choice(len(TOWNS), size=n, p=weights / weights.sum())
+        lat = np.array([TOWNS[t][1] for t in towns]) + self.rng.normal(0, 0.04, size=n)
+        lng = np.array([TOWNS[t][2] for t in towns]) + self.rng.normal(0, 0.04, size=n)
+        street_numbers = self.rng.integers(100, 9999, size=n)
+        areas = [
+            Area(
+                incident_id=self.incident_id,
+                name=f'{TOWNS[t][0]} Shelter {i + 1:05d}',
+                description=f'Emergency shelter in {TOWNS[t][0]}',
+                address=f'{street_numbers[i]} Main St, {TOWNS[t][0]}, FL',
+                pincode=f'339{i % 100:02d}',
+                latitude=round(float(lat[i]), 6),
+                longitude=round(float(lng[i]), 6),
+            )
+            for i, t in enumerate(towns)
+        ]
+        areas = Area.objects.bulk_create(areas, batch_size=self.batch_size)
+        self.area_ids = [a.pk for a in areas]
+        self.area_ids_array = np.array(self.area_ids)
+        return n
+
+    def make_users(self):
+        """One super admin and an area admin for each of the busiest shelters"""
+        password = make_password(DEFAULT_PASSWORD)  # hash once, PBKDF2 is slow on purpose
+        n_admins = min(len(self.area_ids), max(1, self.counts['areas'] // 20))
+        users = [User(username=f'{USERNAME_PREFIX}super_admin', email='super_admin@example.com',
+                      password=password, user_type='super_admin', is_staff=True, is_superuser=True)]
+        users += [
+            User(username=f'{USERNAME_PREFIX}area_admin_{i + 1}', email=f'area_admin_{i + 1}@example.com',
+                 password=password, user_type='area_admin', is_staff=True)
+            for i in range(n_admins)
+        ]
+        users = User.objects.bulk_create(users)
+        self.super_admin = users[0]
+        self.area_admin_users = users[1:]
+        AreaAdmin.objects.bulk_create([
+            AreaAdmin(user=user, area_id=self.area_ids[i], name=user.username, email=user.email)
+            for i, user in enumerate(self.area_admin_users)
+        ])
+        return len(users) + n_admins
+
+    def make_needs(self):
+        n = self.counts['needs']
+        created, offsets = self.timestamps(n)
+        statuses = self.weighted(STATUSES, n)
+        open_ = np.isin(np.asarray(statuses, dtype=object), ['pending'])
+        updated = np.where(open_, created, self.later(offsets, 2 * 86400)).tolist()
+        creators = self.choice([None, self.super_admin.pk] + [u.pk for u in self.area_admin_users[:20]], n)
+        return _insert(Need, ['area', 'incident', 'product', 'quantity', 'notes', 'priority', 'status',
+                              'created_by', 'created_at', 'updated_at'], [
+            self.area_picks(n),
+            [self.incident_id] * n,
+            self.choice(self.product_ids, n),
+            self.quantities(n),
+            self.choice(URGENCY_NOTES, n),
+            self.weighted(PRIORITIES, n),
+            statuses,
+            creators,
+            created,
+            updated,
+        ], self.batch_size)
+
+    def make_need_requests(self):
+        n = self.counts['need_requests']
+        names = self.names(n)
+        emails = self.emails(names, 'r')
+        areas = self.area_picks(n)
+        items = self.choice(self.product_names, n)
+        created, _ = self.timestamps(n)
+        return _insert(NeedRequest, ['name', 'email', 'phone', 'area', 'incident', 'item_needed', 'quantity',
+                                     'urgency', 'description', 'status', 'created_at', 'fingerprint',
+                                     'duplicate_count'], [
+            names,
+            emails,
+            self.phones(n),
+            areas,
+            [self.incident_id] * n,
+            items,
+            self.quantities(n, median=5, high=200),
+            self.weighted(URGENCIES, n),
+            self.choice(URGENCY_NOTES, n),
+            self.weighted(REQUEST_STATUSES, n),
+            created,
+            [fingerprint(NeedRequest(email=e, area_id=a, item_needed=i)) for e, a, i in zip(emails, areas, items)],
+            [0] * n,
+        ], self.batch_size)
+
+    def make_volunteers(self):
+        n = self.counts['volunteers']
+        names = self.names(n)
+        emails = self.emails(names, 'v')
+        areas = self.area_picks(n)
+        created, _ = self.timestamps(n)
+        return _insert(Volunteer, ['name', 'email', 'phone', 'area', 'incident', 'skills', 'availability',
+                                   'created_at', 'fingerprint', 'duplicate_count'], [
+            names,
+            emails,
+            self.phones(n),
+            areas,
+            [self.incident_id] * n,
+            self.choice(SKILLS, n),
+            self.choice(AVAILABILITY, n),
+            created,
+            [fingerprint(Volunteer(email=e, area_id=a)) for e, a in zip(emails, areas)],
+            [0] * n,
+        ], self.batch_size)
+
+    def make_donations(self):
+        n = self.counts['donations']
+        names = self.names(n)
+        created, _ = self.timestamps(n)
+        return _insert(Donation, ['donor_name', 'email', 'area', 'incident', 'item_name', 'quantity', 'notes',
+                                  'allocated_quantity', 'created_at'], [
+            names,
+            self.emails(names, 'd'),
+            self.area_picks(n),
+            [self.incident_id] * n,
+            self.choice(self.product_names, n),
+            self.quantities(n, median=20, high=2000),
+            [''] * n,
+            [0] * n,
+            created,
+        ], self.batch_size)
+
+    def make_contacts(self):
+        n = self.counts['contacts']
+        names = self.names(n)
+        created, offsets = self.timestamps(n)
+        return _insert(Contact, ['name', 'email', 'subject', 'message', 'status', 'created_at', 'updated_at'], [
+            names,
+            self.emails(names, 'c'),
+            self.choice(CONTACT_SUBJECTS, n),
+            ['Could you tell me more about this? Thank you.'] * n,
+            self.weighted(CONTACT_STATUSES, n),
+            created,
+            self.later(offsets, 86400),
+        ], self.batch_size)
+
+    def make_articles(self):
+        n = self.counts['articles']
+        created, _ = self.timestamps(n)
+        towns = self.choice([t[0] for t in TOWNS], n)
+        titles = [f'{town} recovery update #{i + 1}' for i, town in enumerate(towns)]
+        body = ('Crews continue to restore power and clear roads. Shelters remain open and are '
+                'accepting donations of water, food and hygiene supplies. ') * 8
+        return _insert(Article, ['title', 'slug', 'content', 'summary', 'is_published', 'created_at',
+                                 'updated_at'], [
+            titles,
+            [slugify(t) for t in titles],
+            [body] * n,
+            [f'Latest news for {town}' for town in towns],
+            [True] * n,
+            created,
+            created,
+        ], self.batch_size)
+
+    def run(self, log=None, rollups=True):
+        steps = [
+            ('catalog', self.make_catalog),
+            ('incident', self.make_incident),
+            ('areas', self.make_areas),
+            ('users', self.make_users),
+            ('needs', self.make_needs),
+            ('need_requests', self.make_need_requests),
+            ('volunteers', self.make_volunteers),
+            ('donations', self.make_donations),
+            ('contacts', self.make_contacts),
+            ('articles', self.make_articles),
+        ]
+        created = {}
+        with fast_sqlite_writes(), transaction.atomic():
+            for name, step in steps:
+                started = time.perf_counter()
+                created[name] = step()
+                if log:
+                    log(f'{name}: {created[name]:,} rows in {time.perf_counter() - started:.1f}s')
+        # Bulk inserts skip the Need signals
+        started = time.perf_counter()
+        rebuild_all_summaries()
+        if log:
+            log(f'need summaries rebuilt in {time.perf_counter() - started:.1f}s')
+        if rollups:
+            started = time.perf_counter()
+            rebuild_rollups()
+            if log:
+                log(f'trend rollups rebuilt in {time.perf_counter() - started:.1f}s')
+        return created
+
+
+def clear_generated_data():
+    """Delete everything generate() creates (and what hangs off it) with plain DELETEs"""
+    qn = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in GENERATED_MODELS:
+            cursor.execute(f'DELETE FROM {qn(model._meta.db_table)}')
+    User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+    # Plain DELETEs skip the signal that drops the cached incident list
+    incidents.invalidate()
+
+
+def generate(scale=1, seed=42, days=30, batch_size=BATCH_SIZE, log=None, rollups=True):
+    """
+    Generate a synthetic dataset. Returns the Generator, whose counts,
+    area_ids, super_admin and area_admin_users describe what was made.
+    rollups=False leaves the trend rollups to 'manage.py backfill_rollups'.
+    """
+    generator = Generator(scale=scale, seed=seed, days=days, batch_size=batch_size)
+    generator.created = generator.run(log=log, rollups=rollups)
+    return generator
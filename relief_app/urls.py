@@ -1,25 +1,33 @@
 """
 URL configuration for relief_app
 """
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# ASGI mode serves async versions of the read-heavy public views
+if getattr(settings, 'ASYNC_PUBLIC_VIEWS', False):
+    from . import async_views as public_views
+else:
+    public_views = views
+
 urlpatterns = [
     # Public/Front Panel
-    path('', views.public_home, name='public_home'),
+    path('', public_views.public_home, name='public_home'),
     path('about/', views.public_about, name='public_about'),
     path('services/', views.public_services, name='public_services'),
     path('contact/', views.public_contact, name='public_contact'),
-    path('areas/', views.public_areas, name='public_areas'),
+    path('areas/', public_views.public_areas, name='public_areas'),
     path('area/<int:area_id>/', views.public_area_detail, name='public_area_detail'),
-    path('map/', views.shelter_map, name='shelter_map'),
+    path('map/', public_views.shelter_map, name='shelter_map'),
     path('volunteer/', views.volunteer_signup, name='volunteer_signup'),
     path('request-help/', views.public_need_request, name='public_need_request'),
     path('donate/', views.donate, name='donate'),
-    path('search/', views.global_search, name='global_search'),
+    path('search/', public_views.global_search, name='global_search'),
     path('faq/', views.faq, name='faq'),
-    path('blog/', views.blog_list, name='blog_list'),
-    path('blog/<slug:slug>/', views.blog_detail, name='blog_detail'),
+    path('weather-alerts/', views.weather_alerts, name='weather_alerts'),
+    path('blog/', public_views.blog_list, name='blog_list'),
+    path('blog/<slug:slug>/', public_views.blog_detail, name='blog_detail'),
     
     # Authentication
     path('login/', views.login_view, name='login'),
@@ -34,6 +42,8 @@ urlpatterns = [
     
     # Super Admin Panel
     path('super-admin/dashboard/', views.super_admin_dashboard, name='super_admin_dashboard'),
+    path('super-admin/incidents/', views.super_admin_incidents, name='super_admin_incidents'),
+    path('super-admin/incidents/select/', views.select_incident, name='select_incident'),
     path('super-admin/areas/', views.super_admin_areas, name='super_admin_areas'),
     path('super-admin/area-admins/', views.super_admin_area_admins, name='super_admin_area_admins'),
     path('super-admin/all-needs/', views.super_admin_all_needs, name='super_admin_all_needs'),
@@ -44,7 +54,12 @@ urlpatterns = [
     path('super-admin/volunteers/', views.super_admin_volunteers, name='super_admin_volunteers'),
     path('super-admin/need-requests/', views.super_admin_need_requests, name='super_admin_need_requests'),
     path('super-admin/donations/', views.super_admin_donations, name='super_admin_donations'),
+    path('super-admin/donations/match/', views.run_donation_matching, name='run_donation_matching'),
+    path('super-admin/transfers/', views.super_admin_transfers, name='super_admin_transfers'),
+    path('super-admin/transfers/data/', views.transfer_suggestions_json, name='transfer_suggestions_json'),
     path('super-admin/charts-data/', views.dashboard_charts_data, name='dashboard_charts_data'),
+    path('charts/trends/', views.trend_data, name='trend_data'),
+    path('changes/stream/', views.change_feed, name='change_feed'),
     path('super-admin/need/<int:need_id>/view/', views.view_need_detail, name='view_need_detail'),
     path('super-admin/need/<int:need_id>/delete/', views.delete_need, name='delete_need'),
     path('super-admin/category/<int:category_id>/delete/', views.delete_category, name='delete_category'),
@@ -52,9 +67,17 @@ urlpatterns = [
     path('super-admin/area-admin/<int:admin_id>/delete/', views.delete_area_admin, name='delete_area_admin'),
     path('super-admin/contact/<int:contact_id>/delete/', views.delete_contact, name='delete_contact'),
     path('super-admin/export-needs/<str:format>/', views.export_needs, name='export_needs'),
+    path('super-admin/bulk/<str:target>/', views.bulk_action, name='bulk_action'),
+    path('super-admin/rate-limits/', views.rate_limit_stats, name='rate_limit_stats'),
+    path('super-admin/profiles/', views.request_profiles, name='request_profiles'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('api/sync/', views.sync_changes, name='sync_changes'),
+    path('api/v1/<str:resource>/', views.api_list, name='api_list'),
+    path('api/v1/<str:resource>/<int:object_id>/', views.api_detail, name='api_detail'),
     path('super-admin/database/', views.database_management, name='database_management'),
     path('super-admin/database/export/', views.export_database, name='export_database'),
     path('super-admin/database/import/', views.import_database, name='import_database'),
+    path('super-admin/import/', views.import_data, name='import_data'),
 ]
 
 
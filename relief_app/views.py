@@ -8,9 +8,12 @@ from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.db.models import Count, Q, Case, When, IntegerField
+from django.db.models.functions import Coalesce
+from django.views.decorators.gzip import gzip_page
 from django.views.decorators.http import require_http_methods
 from django.http import HttpResponse, JsonResponse
 from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.conf import settings
 from pathlib import Path
 import csv
@@ -23,24 +26,31 @@ from datetime import datetime
 # Get BASE_DIR (parent of relief_app, which is parent of relief_system)
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-from .models import Area, Category, Product, Need, AreaAdmin, Contact
+from .models import Area, Category, Product, Need, AreaAdmin, Contact, AreaNeedSummary
+from .caching import stale_while_revalidate
+from . import changefeed, incidents, intake, rollups, serializers
+from .dedup import group_near_duplicates
+from .metrics import count_cache, job_timer
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 
-def get_statistics():
-    """Calculate statistics for dashboard"""
-    total_areas = Area.objects.count()
-    total_needs = Need.objects.count()
+def get_statistics(incident_ids=None):
+    """Calculate statistics for dashboard, for the given incidents (incidents.scope()) or all"""
+    total_areas = Area.objects.for_incident(incident_ids).count()
+    total_needs = Need.objects.for_incident(incident_ids).count()
     total_products = Product.objects.count()
-    total_area_admins = AreaAdmin.objects.filter(is_active=True).count()
+    area_admins = AreaAdmin.objects.filter(is_active=True)
+    if incident_ids is not None:
+        area_admins = area_admins.filter(area__incident_id__in=incident_ids)
+    total_area_admins = area_admins.count()
     total_volunteers = 0
     total_donations = 0
     try:
         from .models import Volunteer, Donation
-        total_volunteers = Volunteer.objects.count()
-        total_donations = Donation.objects.count()
+        total_volunteers = Volunteer.objects.for_incident(incident_ids).count()
+        total_donations = Donation.objects.for_incident(incident_ids).count()
     except Exception:
         pass
     
@@ -55,18 +65,16 @@ def get_statistics():
 
 
 # Public Views
-def public_home(request):
-    """Home page for public users with filtering and sorting"""
-    stats = get_statistics()
-    
-    # Get filter parameters
-    region_filter = request.GET.get('region', '')
-    category_filter = request.GET.get('category', '')
-    priority_filter = request.GET.get('priority', '')
-    sort_by = request.GET.get('sort', '-created_at')
+def public_needs_query(params, incident_ids=None):
+    """Open needs of the incidents, filtered and sorted by the public home page's query parameters"""
+    region_filter = params.get('region', '')
+    category_filter = params.get('category', '')
+    priority_filter = params.get('priority', '')
+    sort_by = params.get('sort', '-created_at')
     
     # Start with all needs
-    needs_query = Need.objects.select_related('product', 'area', 'product__category').filter(status__in=['pending', 'in_progress'])
+    needs_query = Need.objects.for_incident(incident_ids).select_related('product', 'area', 'product__category').filter(
+        status__in=['pending', 'in_progress'])
     
     # Apply filters
     if region_filter:
@@ -96,6 +104,22 @@ def public_home(request):
     else:
         needs_query = needs_query.order_by('-created_at')
     
+    filters = {
+        'selected_region': region_filter,
+        'selected_category': category_filter,
+        'selected_priority': priority_filter,
+        'sort_by': sort_by,
+    }
+    return needs_query, filters
+
+
+@stale_while_revalidate()
+def public_home(request):
+    """Home page for public users with filtering and sorting"""
+    scope = incidents.scope(request)
+    stats = get_statistics(scope)
+    needs_query, filters = public_needs_query(request.GET, scope)
+    
     # Get all filtered needs (for display)
     all_needs = needs_query[:50]  # Limit to 50 for performance
     
@@ -110,7 +134,7 @@ def public_home(request):
         })
     
     # Get filter options
-    all_areas = Area.objects.all().order_by('name')
+    all_areas = Area.objects.for_incident(scope).order_by('name')
     all_categories = Category.objects.all().order_by('name')
     
     context = {
@@ -118,51 +142,56 @@ def public_home(request):
         'recent_needs': enriched_needs,
         'all_areas': all_areas,
         'all_categories': all_categories,
-        'selected_region': region_filter,
-        'selected_category': category_filter,
-        'selected_priority': priority_filter,
-        'sort_by': sort_by,
+        **filters,
     }
     return render(request, 'public/home.html', context)
 
 
+@stale_while_revalidate()
 def public_areas(request):
     """List all areas for public view"""
-    areas = Area.objects.annotate(needs_count=Count('needs')).order_by('name')
+    areas = Area.objects.for_incident(incidents.scope(request)).annotate(
+        needs_count=Coalesce('need_summary__total_count', 0)
+    ).order_by('name')
     context = {
         'areas': areas,
     }
     return render(request, 'public/areas.html', context)
 
 
+@stale_while_revalidate()
 def public_area_detail(request, area_id):
     """Show area detail with needs"""
     area = get_object_or_404(Area, id=area_id)
     
     # Get needs for this area with related data
     area_needs = Need.objects.filter(area=area).select_related('product', 'product__category')
+    summary = AreaNeedSummary.objects.filter(area=area).first()
     
     context = {
         'area': area,
         'needs': area_needs,
-        'total_needs': area_needs.count(),
+        'total_needs': summary.total_count if summary else 0,
+        'summary': summary,
     }
     return render(request, 'public/area_detail.html', context)
 
 
+@stale_while_revalidate()
 def public_about(request):
     """About page for public users"""
-    stats = get_statistics()
+    stats = get_statistics(incidents.scope(request))
     context = {
         'stats': stats,
     }
     return render(request, 'public/about.html', context)
 
 
+@stale_while_revalidate()
 def public_services(request):
     """Services page for public users"""
     categories = Category.objects.all()
-    stats = get_statistics()
+    stats = get_statistics(incidents.scope(request))
     context = {
         'categories': categories,
         'stats': stats,
@@ -181,21 +210,21 @@ def public_contact(request):
         
         if name and email and subject and message:
             try:
-                # Save contact form submission to database
-                contact = Contact.objects.create(
-                    name=name,
-                    email=email,
-                    subject=subject,
-                    message=message,
-                    status='new'
-                )
+                # Save contact form submission (spooled during surges)
+                intake.submit('contact', {
+                    'name': name,
+                    'email': email,
+                    'subject': subject,
+                    'message': message,
+                    'status': 'new',
+                })
                 messages.success(request, 'Thank you for contacting us! We will get back to you soon.')
             except Exception as e:
                 messages.error(request, f'Error saving your message. Please try again.')
         else:
             messages.error(request, 'Please fill in all required fields.')
     
-    areas = Area.objects.all()
+    areas = Area.objects.for_incident(incidents.scope(request))
     context = {
         'areas': areas,
     }
@@ -241,15 +270,14 @@ def logout_view(request):
 @login_required
 def area_admin_dashboard(request):
     """Dashboard for Shelter Admin"""
-    if request.user.user_type != 'area_admin':
+    profile = request.relief_profile
+    if not profile.is_area_admin:
         messages.error(request, 'Access denied. Please login as Shelter Admin.')
         return redirect('login')
     
-    # Get area admin profile
-    try:
-        area_admin_profile = AreaAdmin.objects.get(user=request.user)
-        area = area_admin_profile.area
-    except AreaAdmin.DoesNotExist:
+    # The shelter comes with the session's profile (relief_app/roles.py)
+    area = profile.area
+    if area is None:
         messages.error(request, 'Area admin profile not found')
         return redirect('login')
     
@@ -262,7 +290,6 @@ def area_admin_dashboard(request):
         'total_needs': area_needs.count(),
         'categories': Category.objects.all(),
         'products': Product.objects.select_related('category'),
-        'area_admin_profile': area_admin_profile,
     }
     return render(request, 'area_admin/dashboard.html', context)
 
@@ -270,15 +297,13 @@ def area_admin_dashboard(request):
 @login_required
 def area_admin_needs(request):
     """Manage needs for area admin with filter and sort support"""
-    if request.user.user_type != 'area_admin':
+    profile = request.relief_profile
+    if not profile.is_area_admin:
         messages.error(request, 'Access denied')
         return redirect('login')
     
-    # Get area admin profile
-    try:
-        area_admin_profile = AreaAdmin.objects.get(user=request.user)
-        area = area_admin_profile.area
-    except AreaAdmin.DoesNotExist:
+    area = profile.area
+    if area is None:
         messages.error(request, 'Area admin profile not found')
         return redirect('login')
     
@@ -373,7 +398,7 @@ def area_admin_needs(request):
 @login_required
 def area_admin_categories(request):
     """View categories"""
-    if request.user.user_type != 'area_admin':
+    if not request.relief_profile.is_area_admin:
         return redirect('login')
     
     context = {
@@ -385,7 +410,7 @@ def area_admin_categories(request):
 @login_required
 def area_admin_products(request):
     """View products with filter and sort support"""
-    if request.user.user_type != 'area_admin':
+    if not request.relief_profile.is_area_admin:
         return redirect('login')
 
     # Filter & sort params
@@ -420,30 +445,99 @@ def area_admin_products(request):
 @login_required
 def super_admin_dashboard(request):
     """Dashboard for Super Admin"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         messages.error(request, 'Access denied. Please login as Super Admin.')
         return redirect('login')
     
-    stats = get_statistics()
+    scope = incidents.scope(request)
+    stats = get_statistics(scope)
     
     # Get all needs with area and product info
-    all_needs = Need.objects.select_related('product', 'area', 'product__category').order_by('-created_at')[:10]
+    all_needs = Need.objects.for_incident(scope).select_related('product', 'area', 'product__category').order_by('-created_at')[:10]
     
     context = {
         'stats': stats,
-        'areas': Area.objects.all(),
+        'incident_label': incidents.label(scope),
+        'areas': Area.objects.for_incident(scope),
         'needs': all_needs,
-        'total_area_admins': AreaAdmin.objects.filter(is_active=True).count(),
+        'total_area_admins': stats['total_area_admins'],
+        # The live update stream picks up from here; None when it is off
+        'change_feed_since': changefeed.latest_id() if changefeed.live() else None,
     }
     return render(request, 'super_admin/dashboard.html', context)
 
 
+@login_required
+def super_admin_incidents(request):
+    """Incidents with per-incident statistics; create, close and reopen them"""
+    if not request.relief_profile.is_super_admin:
+        return redirect('login')
+    
+    from .models import Incident
+    from django.utils.text import slugify
+    
+    if request.method == 'POST':
+        action = request.POST.get('action')
+        if action == 'create':
+            name = request.POST.get('name', '').strip()
+            slug = slugify(name)
+            if not slug:
+                messages.error(request, 'Please enter a name for the incident.')
+            elif Incident.objects.filter(slug=slug).exists():
+                messages.error(request, f'An incident called "{name}" already exists.')
+            else:
+                Incident.objects.create(name=name, slug=slug, description=request.POST.get('description', ''))
+                messages.success(request, f'Incident "{name}" created. New shelters join it by default.')
+        elif action == 'toggle':
+            incident = get_object_or_404(Incident, id=request.POST.get('incident_id'))
+            incident.is_active = not incident.is_active
+            incident.ended_at = None if incident.is_active else timezone.now()
+            incident.save()
+            messages.success(request, f'Incident "{incident.name}" {"reopened" if incident.is_active else "closed"}.')
+        return redirect('super_admin_incidents')
+    
+    stats = incidents.statistics()
+    incident_list = []
+    for incident in Incident.objects.all():
+        incident_list.append({'incident': incident, 'stats': stats.get(incident.id, {})})
+    
+    context = {
+        'incidents': incident_list,
+        'unassigned': stats.get(None),
+        'selected': incidents.selected(request),
+        'incident_label': incidents.label(incidents.scope(request)),
+    }
+    return render(request, 'super_admin/incidents.html', context)
+
+
+@login_required
+@require_http_methods(["POST"])
+def select_incident(request):
+    """Pick the incident the super admin pages show: an id, 'all', or '' for the active ones"""
+    if not request.relief_profile.is_super_admin:
+        return redirect('login')
+    
+    choice = request.POST.get('incident', '')
+    if choice == incidents.ALL:
+        request.session[incidents.SESSION_KEY] = incidents.ALL
+    elif choice.isdigit() and int(choice) in incidents.catalog()['names']:
+        request.session[incidents.SESSION_KEY] = int(choice)
+    else:
+        request.session.pop(incidents.SESSION_KEY, None)
+    next_url = request.POST.get('next', '')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = 'super_admin_dashboard'
+    return redirect(next_url)
+
+
 @login_required
 def super_admin_areas(request):
     """Manage areas with filter and sort support"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         return redirect('login')
     
+    scope = incidents.scope(request)
+    
     # Handle POST request to create/update area
     if request.method == 'POST':
         area_id = request.POST.get('area_id')
@@ -461,8 +555,9 @@ def super_admin_areas(request):
                 area.pincode = pincode
                 area.save()
                 messages.success(request, f'Area "{name}" updated successfully!')
-            else:  # Create new
+            else:  # Create new, in the incident being viewed (else the newest active one)
                 area = Area.objects.create(
+                    incident_id=scope[0] if scope and len(scope) == 1 else None,
                     name=name,
                     description=description,
                     address=address,
@@ -495,7 +590,7 @@ def super_admin_areas(request):
     search_query = request.GET.get('search', '')
     sort_by = request.GET.get('sort', 'name')
 
-    areas = Area.objects.annotate(needs_count=Count('needs'))
+    areas = Area.objects.for_incident(scope).annotate(needs_count=Coalesce('need_summary__total_count', 0))
 
     if search_query:
         areas = areas.filter(
@@ -521,7 +616,7 @@ def super_admin_areas(request):
 @login_required
 def super_admin_area_admins(request):
     """Manage area admins with filter and sort support"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         return redirect('login')
     
     # Handle POST request to create/update area admin
@@ -617,7 +712,7 @@ def super_admin_area_admins(request):
 @login_required
 def super_admin_all_needs(request):
     """View all needs across all areas with add/edit functionality and filter/sort support"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         return redirect('login')
     
     # Handle POST request to create or update a need
@@ -671,7 +766,8 @@ def super_admin_all_needs(request):
     priority_filter = request.GET.get('priority', '')
     sort_by = request.GET.get('sort', '-created_at')
 
-    all_needs = Need.objects.select_related('product', 'area', 'product__category')
+    scope = incidents.scope(request)
+    all_needs = Need.objects.for_incident(scope).select_related('product', 'area', 'product__category')
 
     if search_query:
         all_needs = all_needs.filter(product__name__icontains=search_query)
@@ -702,7 +798,7 @@ def super_admin_all_needs(request):
     
     context = {
         'needs': enriched_needs,
-        'areas': Area.objects.all().order_by('name'),
+        'areas': Area.objects.for_incident(scope).order_by('name'),
         'products': Product.objects.select_related('category').order_by('name'),
         'categories': Category.objects.all().order_by('name'),
         'search_query': search_query,
@@ -710,6 +806,7 @@ def super_admin_all_needs(request):
         'category_filter': category_filter,
         'priority_filter': priority_filter,
         'sort_by': sort_by,
+        'change_feed_since': changefeed.latest_id() if changefeed.live() else None,
     }
     return render(request, 'super_admin/all_needs.html', context)
 
@@ -717,7 +814,7 @@ def super_admin_all_needs(request):
 @login_required
 def super_admin_categories(request):
     """Manage categories for super admin"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         return redirect('login')
     
     # Handle POST request to create/update category
@@ -757,7 +854,7 @@ def super_admin_categories(request):
 @login_required
 def super_admin_products(request):
     """Manage products for super admin with filter and sort support"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         return redirect('login')
     
     # Handle POST request to create/update product
@@ -832,7 +929,7 @@ def super_admin_products(request):
 @require_http_methods(["POST"])
 def delete_product(request, product_id):
     """Delete a product"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         if request.headers.get('Content-Type') == 'application/json':
             return JsonResponse({'success': False, 'message': 'Access denied'}, status=403)
         messages.error(request, 'Access denied')
@@ -860,13 +957,12 @@ def delete_product(request, product_id):
 @require_http_methods(["POST"])
 def delete_need_area_admin(request, need_id):
     """Delete a need (area admin only, restricted to own area)"""
-    if request.user.user_type != 'area_admin':
+    profile = request.relief_profile
+    if not profile.is_area_admin:
         return JsonResponse({'success': False, 'message': 'Access denied'}, status=403)
     
-    try:
-        area_admin_profile = AreaAdmin.objects.get(user=request.user)
-        area = area_admin_profile.area
-    except AreaAdmin.DoesNotExist:
+    area = profile.area
+    if area is None:
         return JsonResponse({'success': False, 'message': 'Area admin profile not found'}, status=400)
     
     try:
@@ -882,7 +978,7 @@ def delete_need_area_admin(request, need_id):
 @require_http_methods(["POST"])
 def delete_need(request, need_id):
     """Delete a need (super admin)"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         if request.headers.get('Accept') == 'application/json':
             return JsonResponse({'success': False, 'message': 'Access denied'}, status=403)
         messages.error(request, 'Access denied')
@@ -906,19 +1002,69 @@ def delete_need(request, need_id):
         return redirect('super_admin_all_needs')
 
 
+@login_required
+@require_http_methods(["POST"])
+def bulk_action(request, target):
+    """
+    Apply one action to many rows in a single transaction.
+    
+    Accepts JSON ({"ids": [...], "action": "...", "status": "...", "area_id": ...})
+    or a form post, and returns a result per id.
+    """
+    if not request.relief_profile.is_super_admin:
+        return JsonResponse({'success': False, 'message': 'Access denied'}, status=403)
+    
+    from .bulk import BulkActionError, run_bulk_action
+    
+    if request.content_type == 'application/json':
+        try:
+            payload = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'Invalid JSON'}, status=400)
+        ids = payload.get('ids')
+    else:
+        payload = request.POST
+        # Repeated "ids" fields or one comma-separated value (large batches
+        # would otherwise hit DATA_UPLOAD_MAX_NUMBER_FIELDS)
+        ids = [i for value in request.POST.getlist('ids') for i in value.split(',') if i.strip()]
+    
+    try:
+        outcome = run_bulk_action(
+            target,
+            payload.get('action'),
+            ids,
+            status=payload.get('status'),
+            area_id=payload.get('area_id'),
+        )
+    except BulkActionError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=500)
+    
+    return JsonResponse({
+        'success': True,
+        'target': target,
+        'action': payload.get('action'),
+        'processed': outcome['processed'],
+        'results': {str(k): v for k, v in outcome['results'].items()},
+    })
+
+
 @login_required
 def view_need_detail(request, need_id):
     """View detailed information about a specific need"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         return redirect('login')
     
     need = get_object_or_404(Need.objects.select_related('product', 'area', 'product__category', 'created_by'), id=need_id)
     
+    from .ledger import get_balance
     context = {
         'need': need,
         'product': need.product,
         'area': need.area,
         'category': need.product.category if need.product else None,
+        'stock_on_hand': get_balance(need.area_id, need.product_id),
     }
     return render(request, 'super_admin/need_detail.html', context)
 
@@ -927,7 +1073,7 @@ def view_need_detail(request, need_id):
 @require_http_methods(["POST"])
 def delete_category(request, category_id):
     """Delete a category"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         if request.headers.get('Content-Type') == 'application/json':
             return JsonResponse({'success': False, 'message': 'Access denied'}, status=403)
         messages.error(request, 'Access denied')
@@ -936,7 +1082,9 @@ def delete_category(request, category_id):
     try:
         category = get_object_or_404(Category, id=category_id)
         category_name = category.name
-        category.delete()
+        # Deletes every need of the category's products; recount each rollup bucket once
+        with rollups.deferred_rollup_refresh():
+            category.delete()
         messages.success(request, f'Category "{category_name}" deleted successfully!')
         
         # Return JSON response for AJAX requests
@@ -955,7 +1103,7 @@ def delete_category(request, category_id):
 @require_http_methods(["POST"])
 def delete_area(request, area_id):
     """Delete an area"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         if request.headers.get('Content-Type') == 'application/json':
             return JsonResponse({'success': False, 'message': 'Access denied'}, status=403)
         messages.error(request, 'Access denied')
@@ -983,7 +1131,7 @@ def delete_area(request, area_id):
 @require_http_methods(["POST"])
 def delete_area_admin(request, admin_id):
     """Delete an area admin"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         if request.headers.get('Content-Type') == 'application/json':
             return JsonResponse({'success': False, 'message': 'Access denied'}, status=403)
         messages.error(request, 'Access denied')
@@ -1014,7 +1162,7 @@ def delete_area_admin(request, admin_id):
 @require_http_methods(["POST"])
 def delete_contact(request, contact_id):
     """Delete a contact message"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         if request.headers.get('Content-Type') == 'application/json':
             return JsonResponse({'success': False, 'message': 'Access denied'}, status=403)
         messages.error(request, 'Access denied')
@@ -1042,11 +1190,23 @@ def delete_contact(request, contact_id):
 @login_required
 def export_needs(request, format):
     """Export needs data in various formats"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         return redirect('login')
     
-    # Get all needs
-    needs = Need.objects.select_related('product', 'area', 'product__category').order_by('-created_at')
+    with job_timer('export_needs'):
+        return _export_needs(request, format)
+
+
+def _export_needs(request, format):
+    from .archive import iter_needs
+    
+    # ?scope=all adds archived needs, ?scope=archived exports only those
+    scope = request.GET.get('scope', 'active')
+    if scope not in ('active', 'all', 'archived'):
+        messages.error(request, 'Invalid export scope')
+        return redirect('super_admin_all_needs')
+    # Of the incidents in view; ?incident=<slug> picks one, ?incident=all every one
+    needs = iter_needs(scope, incidents.scope(request))
     
     if format == 'csv':
         response = HttpResponse(content_type='text/csv')
@@ -1102,7 +1262,7 @@ def export_needs(request, format):
         from django.template.loader import render_to_string
         
         context = {
-            'needs': needs,
+            'needs': list(needs),
             'export_date': timezone.now() if hasattr(timezone, 'now') else None,
         }
         
@@ -1118,10 +1278,52 @@ def export_needs(request, format):
         return redirect('super_admin_all_needs')
 
 
+@login_required
+def import_data(request):
+    """Bulk import needs, areas or products from an uploaded CSV/JSON file"""
+    if not request.relief_profile.is_super_admin:
+        messages.error(request, 'Access denied. Please login as Super Admin.')
+        return redirect('login')
+    
+    from .importer import IMPORT_KINDS, ImportFormatError, detect_format, run_import
+    
+    report = None
+    if request.method == 'POST':
+        kind = request.POST.get('kind')
+        uploaded_file = request.FILES.get('data_file')
+        if kind not in IMPORT_KINDS:
+            messages.error(request, 'Please choose what to import.')
+        elif uploaded_file is None:
+            messages.error(request, 'No file uploaded!')
+        else:
+            try:
+                report = run_import(
+                    kind,
+                    uploaded_file.file,
+                    detect_format(uploaded_file.name),
+                    user=request.user,
+                    dry_run=bool(request.POST.get('dry_run')),
+                )
+                if report['failed']:
+                    messages.warning(request, f"{report['created']} rows imported, {report['failed']} rows failed.")
+                else:
+                    messages.success(request, f"{report['created']} rows imported successfully!")
+            except ImportFormatError as e:
+                messages.error(request, str(e))
+            except Exception as e:
+                messages.error(request, f'Error importing file: {str(e)}')
+    
+    context = {
+        'report': report,
+        'kinds': IMPORT_KINDS,
+    }
+    return render(request, 'super_admin/import.html', context)
+
+
 @login_required
 def super_admin_contacts(request):
     """View all contact form submissions for super admin"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         return redirect('login')
     
     # Handle status update
@@ -1173,7 +1375,7 @@ def super_admin_contacts(request):
 @login_required
 def database_management(request):
     """Database management page for Super Admin"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         messages.error(request, 'Access denied. Please login as Super Admin.')
         return redirect('login')
     
@@ -1201,7 +1403,7 @@ def database_management(request):
 @login_required
 def export_database(request):
     """Export database to SQL file"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         messages.error(request, 'Access denied. Please login as Super Admin.')
         return redirect('login')
     
@@ -1221,11 +1423,12 @@ def export_database(request):
         backup_path = BASE_DIR / backup_filename
         
         # Connect and dump
-        conn = sqlite3.connect(db_path)
-        with open(backup_path, 'w', encoding='utf-8') as f:
-            for line in conn.iterdump():
-                f.write('%s\n' % line)
-        conn.close()
+        with job_timer('database_backup'):
+            conn = sqlite3.connect(db_path)
+            with open(backup_path, 'w', encoding='utf-8') as f:
+                for line in conn.iterdump():
+                    f.write('%s\n' % line)
+            conn.close()
         
         # Create HTTP response with file
         with open(backup_path, 'rb') as f:
@@ -1246,7 +1449,7 @@ def export_database(request):
 @login_required
 def import_database(request):
     """Import database from SQL file"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         messages.error(request, 'Access denied. Please login as Super Admin.')
         return redirect('login')
     
@@ -1282,16 +1485,18 @@ def import_database(request):
         safety_backup_path = BASE_DIR / safety_backup
         
         if os.path.exists(db_path):
-            conn_backup = sqlite3.connect(db_path)
-            with open(safety_backup_path, 'w', encoding='utf-8') as f:
-                for line in conn_backup.iterdump():
-                    f.write('%s\n' % line)
-            conn_backup.close()
+            with job_timer('database_backup'):
+                conn_backup = sqlite3.connect(db_path)
+                with open(safety_backup_path, 'w', encoding='utf-8') as f:
+                    for line in conn_backup.iterdump():
+                        f.write('%s\n' % line)
+                conn_backup.close()
         
         # Connect to database and execute SQL
-        conn = sqlite3.connect(db_path)
-        conn.executescript(file_content)
-        conn.close()
+        with job_timer('database_import'):
+            conn = sqlite3.connect(db_path)
+            conn.executescript(file_content)
+            conn.close()
         
         messages.success(request, f'Database imported successfully! A safety backup was created: {safety_backup}')
         return redirect('database_management')
@@ -1311,28 +1516,31 @@ def import_database(request):
 from .models import Volunteer, NeedRequest
 
 
+# The map's shelters, encoded straight from values_list() rows
+SHELTER_LOOKUPS = ['id', 'name', 'address', 'pincode', 'latitude', 'longitude', 'needs_count']
+SHELTER_SCHEMA = serializers.Schema.for_model(
+    Area, SHELTER_LOOKUPS, names=['id', 'name', 'address', 'pincode', 'lat', 'lng', 'needs_count'],
+    kinds={'needs_count': 'int'},
+)
+
+
+def map_shelters(rows):
+    """(JSON of the shelters with coordinates, number of shelters) from SHELTER_LOOKUPS rows"""
+    located = [row for row in rows if row[4] and row[5]]
+    # Embedded in a <script> on the map page
+    return SHELTER_SCHEMA.encode_rows(located, html_safe=True).decode(), len(rows)
+
+
+@stale_while_revalidate()
 def shelter_map(request):
     """Interactive map showing all shelter locations"""
-    areas = Area.objects.all()
-    
-    # Build list of shelters with coordinates for the map
-    shelters = []
-    for area in areas:
-        if area.latitude and area.longitude:
-            needs_count = Need.objects.filter(area=area).count()
-            shelters.append({
-                'id': area.id,
-                'name': area.name,
-                'address': area.address,
-                'pincode': area.pincode,
-                'lat': area.latitude,
-                'lng': area.longitude,
-                'needs_count': needs_count,
-            })
+    areas = Area.objects.for_incident(incidents.scope(request)).annotate(
+        needs_count=Coalesce('need_summary__total_count', 0))
+    shelters, total_shelters = map_shelters(list(areas.values_list(*SHELTER_LOOKUPS)))
     
     context = {
-        'shelters': json.dumps(shelters),
-        'total_shelters': areas.count(),
+        'shelters': shelters,
+        'total_shelters': total_shelters,
     }
     return render(request, 'public/map.html', context)
 
@@ -1349,15 +1557,14 @@ def volunteer_signup(request):
         
         if name and email and phone and area_id:
             try:
-                area = Area.objects.get(id=area_id)
-                Volunteer.objects.create(
-                    name=name,
-                    email=email,
-                    phone=phone,
-                    area=area,
-                    skills=skills,
-                    availability=availability,
-                )
+                intake.submit('volunteer', {
+                    'name': name,
+                    'email': email,
+                    'phone': phone,
+                    'area_id': int(area_id),
+                    'skills': skills,
+                    'availability': availability,
+                })
                 messages.success(request, 'Thank you for signing up as a volunteer! We will contact you soon.')
                 return redirect('volunteer_signup')
             except Area.DoesNotExist:
@@ -1367,7 +1574,7 @@ def volunteer_signup(request):
         else:
             messages.error(request, 'Please fill in all required fields.')
     
-    areas = Area.objects.all().order_by('name')
+    areas = Area.objects.for_incident(incidents.scope(request)).order_by('name')
     context = {
         'areas': areas,
     }
@@ -1388,17 +1595,16 @@ def public_need_request(request):
         
         if name and email and area_id and item_needed and quantity:
             try:
-                area = Area.objects.get(id=area_id)
-                NeedRequest.objects.create(
-                    name=name,
-                    email=email,
-                    phone=phone,
-                    area=area,
-                    item_needed=item_needed,
-                    quantity=int(quantity),
-                    urgency=urgency,
-                    description=description,
-                )
+                intake.submit('need_request', {
+                    'name': name,
+                    'email': email,
+                    'phone': phone,
+                    'area_id': int(area_id),
+                    'item_needed': item_needed,
+                    'quantity': int(quantity),
+                    'urgency': urgency,
+                    'description': description,
+                })
                 messages.success(request, 'Your request has been submitted! Our team will review it shortly.')
                 return redirect('public_need_request')
             except Area.DoesNotExist:
@@ -1408,48 +1614,55 @@ def public_need_request(request):
         else:
             messages.error(request, 'Please fill in all required fields.')
     
-    areas = Area.objects.all().order_by('name')
+    areas = Area.objects.for_incident(incidents.scope(request)).order_by('name')
     context = {
         'areas': areas,
     }
     return render(request, 'public/need_request.html', context)
 
 
+CHART_AREA_SCHEMA = serializers.Schema.for_model(
+    AreaNeedSummary, ['area_id', 'area__name', 'total_count'], names=['area_id', 'area', 'count'],
+)
+
+
 @login_required
 def dashboard_charts_data(request):
     """API endpoint to provide chart data for dashboards"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         return JsonResponse({'error': 'Access denied'}, status=403)
     
-    # Needs by area
-    areas = Area.objects.all()
-    needs_by_area = []
-    for area in areas:
-        count = Need.objects.filter(area=area).count()
-        if count > 0:
-            needs_by_area.append({'area': area.name, 'count': count})
+    scope = incidents.scope(request)
+    needs = Need.objects.for_incident(scope)
     
-    # Needs by priority
+    # Needs by area
+    summaries = AreaNeedSummary.objects.filter(total_count__gt=0)
+    if scope is not None:
+        summaries = summaries.filter(area__incident_id__in=scope)
+    summaries = summaries.order_by('area__name').values_list('area_id', 'area__name', 'total_count')
+    # One entry per shelter, so encoded straight from the rows
+    needs_by_area = CHART_AREA_SCHEMA.encode_rows(summaries)
+    
+    # Needs by priority (one grouped query instead of one count per value)
     priorities = ['urgent', 'high', 'medium', 'low']
-    needs_by_priority = []
-    for p in priorities:
-        count = Need.objects.filter(priority=p).count()
-        needs_by_priority.append({'priority': p.capitalize(), 'count': count})
+    priority_counts = dict(needs.values_list('priority').annotate(n=Count('id')).order_by())
+    needs_by_priority = [{'priority': p.capitalize(), 'count': priority_counts.get(p, 0)} for p in priorities]
     
     # Needs by category
-    categories = Category.objects.all()
-    needs_by_category = []
-    for cat in categories:
-        count = Need.objects.filter(product__category=cat).count()
-        if count > 0:
-            needs_by_category.append({'category': cat.name, 'count': count})
+    category_counts = (
+        needs.values_list('product__category_id', 'product__category__name').annotate(n=Count('id'))
+        .order_by('product__category__name')
+    )
+    needs_by_category = [
+        {'category_id': category_id, 'category': name, 'count': count} for category_id, name, count in category_counts
+    ]
     
     # Needs by status
     statuses = ['pending', 'in_progress', 'fulfilled', 'cancelled']
-    needs_by_status = []
-    for s in statuses:
-        count = Need.objects.filter(status=s).count()
-        needs_by_status.append({'status': s.replace('_', ' ').capitalize(), 'count': count})
+    status_counts = dict(needs.values_list('status').annotate(n=Count('id')).order_by())
+    needs_by_status = [
+        {'status': s.replace('_', ' ').capitalize(), 'count': status_counts.get(s, 0)} for s in statuses
+    ]
     
     data = {
         'needs_by_area': needs_by_area,
@@ -1457,16 +1670,120 @@ def dashboard_charts_data(request):
         'needs_by_category': needs_by_category,
         'needs_by_status': needs_by_status,
     }
-    return JsonResponse(data)
+    return serializers.json_response(serializers.dumps_object(data))
+
+
+@login_required
+def trend_data(request):
+    """Chart API: needs, donations or volunteers created per hour or day, from the rollups only (relief_app/rollups.py)"""
+    from datetime import timedelta
+    from .models import Rollup
+    from .rollups import trends
+    
+    profile = request.relief_profile
+    if profile.is_super_admin:
+        area_ids = request.GET.get('area', '')
+    elif profile.is_area_admin:
+        # Shelter admins only see their own shelter's trends
+        area_ids = str(profile.area_id or '')
+        if not area_ids:
+            return JsonResponse({'error': 'Access denied'}, status=403)
+    else:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    kind = request.GET.get('kind', 'need')
+    period = request.GET.get('period', 'hour')
+    group = request.GET.get('group') or None
+    priority = request.GET.get('priority') or None
+    if kind not in dict(Rollup.KIND_CHOICES) or period not in dict(Rollup.PERIOD_CHOICES):
+        return JsonResponse({'error': 'Invalid kind or period'}, status=400)
+    if group not in (None, 'area', 'category', 'priority') or priority not in (None, *dict(Need.PRIORITY_CHOICES)):
+        return JsonResponse({'error': 'Invalid group or priority'}, status=400)
+    try:
+        area_ids = [int(a) for a in area_ids.split(',') if a]
+        category_id = int(request.GET['category']) if request.GET.get('category') else None
+        count = int(request.GET.get('buckets', 72 if period == 'hour' else 30))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid area, category or buckets'}, status=400)
+    count = max(1, min(count, getattr(settings, 'TRENDS_MAX_BUCKETS', 2000)))
+    
+    # The last `count` buckets, the current (partial) one included
+    until = timezone.now()
+    since = until - (timedelta(hours=count - 1) if period == 'hour' else timedelta(days=count - 1))
+    starts, series = trends(kind, period, since, until, area_ids=area_ids, category_id=category_id,
+                            priority=priority, group=group)
+    
+    labels = {}
+    if group == 'area':
+        labels = dict(Area.objects.filter(id__in=list(series)).values_list('id', 'name'))
+    elif group == 'category':
+        labels = dict(Category.objects.filter(id__in=[k for k in series if k]).values_list('id', 'name'))
+    return serializers.json_response({
+        'kind': kind,
+        'period': period,
+        'buckets': starts,
+        'series': [
+            {'key': key, 'label': labels.get(key, key), 'count': counts, 'quantity': quantities}
+            for key, (counts, quantities) in sorted(series.items(), key=lambda item: str(item[0]))
+        ],
+    })
+
+
+@login_required
+def change_feed(request):
+    """Server-Sent Events stream of need, request, donation and volunteer changes (relief_app/changefeed.py)"""
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import StreamingHttpResponse
+
+    profile = request.relief_profile
+    incident_ids = None
+    if profile.is_super_admin:
+        area_id = request.GET.get('area')
+        # The incidents the dashboard's counts cover
+        incident_ids = incidents.scope(request)
+    elif profile.is_area_admin:
+        # Shelter admins only see their own shelter's changes
+        area_id = profile.area_id
+        if area_id is None:
+            return JsonResponse({'error': 'Access denied'}, status=403)
+    else:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    if not changefeed.live():
+        # A stream would hold a sync worker until gunicorn kills it
+        return JsonResponse({'error': 'Live updates are off'}, status=404)
+
+    # Browsers send Last-Event-ID when they reconnect; pages pass ?since= on first connect
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    try:
+        after_id = int(last_event_id) if last_event_id else None
+        area_id = int(area_id) if area_id else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid event id or area'}, status=400)
+
+    if isinstance(request, ASGIRequest):
+        body = changefeed.astream(after_id, area_id, incident_ids)
+    else:
+        body = changefeed.stream(after_id, area_id, incident_ids)
+    response = StreamingHttpResponse(body, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep nginx from buffering events
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @login_required
 def super_admin_volunteers(request):
     """View all volunteers for super admin"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         return redirect('login')
     
-    volunteers = Volunteer.objects.select_related('area').all()
+    scope = incidents.scope(request)
+    volunteers = Volunteer.objects.for_incident(scope).select_related('area').annotate(linked_count=Count('duplicates'))
+    
+    # Linked resubmissions are listed under their original unless asked for
+    show_duplicates = request.GET.get('show_duplicates') == '1'
+    if not show_duplicates:
+        volunteers = volunteers.filter(duplicate_of__isnull=True)
     
     # Filter by area
     area_filter = request.GET.get('area', '')
@@ -1474,9 +1791,10 @@ def super_admin_volunteers(request):
         volunteers = volunteers.filter(area_id=area_filter)
     
     context = {
-        'volunteers': volunteers,
-        'areas': Area.objects.all().order_by('name'),
+        'volunteers': group_near_duplicates(volunteers),
+        'areas': Area.objects.for_incident(scope).order_by('name'),
         'area_filter': area_filter,
+        'show_duplicates': show_duplicates,
     }
     return render(request, 'super_admin/volunteers.html', context)
 
@@ -1484,7 +1802,7 @@ def super_admin_volunteers(request):
 @login_required
 def super_admin_need_requests(request):
     """View and manage public need requests"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         return redirect('login')
     
     # Handle status update
@@ -1499,7 +1817,13 @@ def super_admin_need_requests(request):
         except NeedRequest.DoesNotExist:
             messages.error(request, 'Request not found.')
     
-    need_requests = NeedRequest.objects.select_related('area').all()
+    need_requests = NeedRequest.objects.for_incident(incidents.scope(request)).select_related('area').annotate(
+        linked_count=Count('duplicates'))
+    
+    # Linked resubmissions are listed under their original unless asked for
+    show_duplicates = request.GET.get('show_duplicates') == '1'
+    if not show_duplicates:
+        need_requests = need_requests.filter(duplicate_of__isnull=True)
     
     # Filter by status
     status_filter = request.GET.get('status', '')
@@ -1507,8 +1831,9 @@ def super_admin_need_requests(request):
         need_requests = need_requests.filter(status=status_filter)
     
     context = {
-        'need_requests': need_requests,
+        'need_requests': group_near_duplicates(need_requests),
         'status_filter': status_filter,
+        'show_duplicates': show_duplicates,
     }
     return render(request, 'super_admin/need_requests.html', context)
 
@@ -1529,15 +1854,14 @@ def donate(request):
         
         if donor_name and area_id and item_name and quantity:
             try:
-                area = Area.objects.get(id=area_id)
-                Donation.objects.create(
-                    donor_name=donor_name,
-                    email=email,
-                    area=area,
-                    item_name=item_name,
-                    quantity=int(quantity),
-                    notes=notes,
-                )
+                intake.submit('donation', {
+                    'donor_name': donor_name,
+                    'email': email,
+                    'area_id': int(area_id),
+                    'item_name': item_name,
+                    'quantity': int(quantity),
+                    'notes': notes,
+                })
                 messages.success(request, 'Thank you for your donation! Your contribution has been recorded.')
                 return redirect('donate')
             except Area.DoesNotExist:
@@ -1547,9 +1871,11 @@ def donate(request):
         else:
             messages.error(request, 'Please fill in all required fields.')
     
-    areas = Area.objects.all().order_by('name')
-    recent_donations = Donation.objects.select_related('area').all()[:10]
-    total_donations = Donation.objects.count()
+    scope = incidents.scope(request)
+    areas = Area.objects.for_incident(scope).order_by('name')
+    donations = Donation.objects.for_incident(scope)
+    recent_donations = donations.select_related('area')[:10]
+    total_donations = donations.count()
     
     context = {
         'areas': areas,
@@ -1562,10 +1888,11 @@ def donate(request):
 @login_required
 def super_admin_donations(request):
     """View all donations for super admin"""
-    if request.user.user_type != 'super_admin':
+    if not request.relief_profile.is_super_admin:
         return redirect('login')
     
-    donations = Donation.objects.select_related('area').all()
+    scope = incidents.scope(request)
+    donations = Donation.objects.for_incident(scope).select_related('area', 'product')
     
     # Filter by area
     area_filter = request.GET.get('area', '')
@@ -1574,13 +1901,182 @@ def super_admin_donations(request):
     
     context = {
         'donations': donations,
-        'areas': Area.objects.all().order_by('name'),
+        'areas': Area.objects.for_incident(scope).order_by('name'),
         'area_filter': area_filter,
         'total_donations': donations.count(),
     }
     return render(request, 'super_admin/donations.html', context)
 
 
+@login_required
+@require_http_methods(["POST"])
+def run_donation_matching(request):
+    """Match unallocated donations to open needs on demand"""
+    if not request.relief_profile.is_super_admin:
+        messages.error(request, 'Access denied')
+        return redirect('login')
+    
+    from .matching import run_matching
+    try:
+        stats = run_matching()
+        messages.success(
+            request,
+            f"Matching complete: {stats['quantity_allocated']} units allocated across "
+            f"{stats['allocations']} allocations, {stats['needs_fulfilled']} needs fulfilled, "
+            f"{stats['donations_unresolved']} donations could not be matched to a product."
+        )
+    except Exception as e:
+        messages.error(request, f'Error: {str(e)}')
+    return redirect('super_admin_donations')
+
+
+def _get_transfer_suggestions(request):
+    """Suggested surplus transfers, cached for a few minutes per parameter set"""
+    from django.core.cache import cache
+    from .allocation import suggest_transfers
+    
+    try:
+        k = max(1, min(int(request.GET.get('k', 5)), 50))
+    except ValueError:
+        k = 5
+    try:
+        max_distance = float(request.GET['max_km']) if request.GET.get('max_km') else None
+    except ValueError:
+        max_distance = None
+    
+    cache_key = f'transfer_suggestions:{k}:{max_distance}'
+    suggestions = cache.get(cache_key)
+    count_cache('transfer_suggestions', suggestions is not None)
+    if suggestions is None:
+        suggestions = suggest_transfers(k=k, max_distance_km=max_distance)
+        cache.set(cache_key, suggestions, 300)
+    return suggestions, k, max_distance
+
+
+@login_required
+def super_admin_transfers(request):
+    """Suggested transfers of surplus stock between nearby shelters"""
+    if not request.relief_profile.is_super_admin:
+        return redirect('login')
+    
+    suggestions, k, max_distance = _get_transfer_suggestions(request)
+    
+    context = {
+        'transfers': suggestions,
+        'total_quantity': sum(t['quantity'] for t in suggestions),
+        'k': k,
+        'max_km': max_distance or '',
+    }
+    return render(request, 'super_admin/transfers.html', context)
+
+
+@login_required
+def transfer_suggestions_json(request):
+    """JSON version of the suggested shelter-to-shelter transfers"""
+    if not request.relief_profile.is_super_admin:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    suggestions, k, max_distance = _get_transfer_suggestions(request)
+    return JsonResponse({
+        'count': len(suggestions),
+        'k': k,
+        'max_km': max_distance,
+        'transfers': suggestions,
+    })
+
+
+@login_required
+def rate_limit_stats(request):
+    """JSON counters of allowed/rejected requests per rate-limited endpoint"""
+    if not request.relief_profile.is_super_admin:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    from .ratelimit import get_metrics
+    return JsonResponse({'endpoints': get_metrics()})
+
+
+def metrics(request):
+    """Prometheus scrape endpoint (local scrapers, METRICS_TOKEN bearer, or super admins)"""
+    from .metrics import collect, render
+    from .ratelimit import client_ip
+    
+    # The address nginx passes in RATE_LIMIT_CLIENT_IP_HEADER; '' when unknown
+    ip = client_ip(request)
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    allowed = (
+        (ip and ip in getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1']))
+        or (token and request.headers.get('Authorization') == f'Bearer {token}')
+        or request.relief_profile.is_super_admin
+    )
+    if not allowed:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(render(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@gzip_page
+@require_http_methods(["GET"])
+def sync_changes(request):
+    """Delta sync for offline field clients: changes since the client's token (relief_app/sync.py)"""
+    from . import sync
+
+    area = request.GET.get('area')
+    try:
+        area_id = int(area) if area else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid area'}, status=400)
+    return serializers.json_response(sync.changes(request.GET.get('since'), area_id))
+
+
+@gzip_page
+@require_http_methods(["GET"])
+def api_list(request, resource):
+    """Read-only JSON API: a page of areas, needs, products or categories (relief_app/api.py)"""
+    from . import api
+    return api.list_response(request, resource)
+
+
+@gzip_page
+@require_http_methods(["GET"])
+def api_detail(request, resource, object_id):
+    """Read-only JSON API: one area, need, product or category"""
+    from . import api
+    return api.detail_response(request, resource, object_id)
+
+
+@login_required
+def request_profiles(request):
+    """Slowest endpoints and requests recorded by the profiling middleware"""
+    if not request.relief_profile.is_super_admin:
+        messages.error(request, 'Access denied. Please login as Super Admin.')
+        return redirect('login')
+    
+    from . import profiling
+    if request.method == 'POST' and request.POST.get('action') == 'clear':
+        profiling.clear_profiles()
+        messages.success(request, 'Stored profiles cleared.')
+        return redirect('request_profiles')
+    
+    records = profiling.load_profiles()
+    endpoint = request.GET.get('endpoint', '')
+    if endpoint:
+        records = [r for r in records if (r['url_name'] or r['path']) == endpoint]
+    selected = None
+    profile_id = request.GET.get('id')
+    if profile_id:
+        selected = next((r for r in records if r['id'] == profile_id), None)
+    
+    context = {
+        'enabled': getattr(settings, 'PROFILING_ENABLED', False),
+        'sample_rate': getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0),
+        'total': len(records),
+        'endpoints': profiling.endpoint_summary(records),
+        'slowest': sorted(records, key=lambda r: -r['wall_ms'])[:25],
+        'endpoint': endpoint,
+        'selected': selected,
+    }
+    return render(request, 'super_admin/profiles.html', context)
+
+
 
 def global_search(request):
     """Search across shelters, products, and needs"""
@@ -1593,8 +2089,9 @@ def global_search(request):
     }
     
     if query:
+        scope = incidents.scope(request)
         # Search areas/shelters
-        results['areas'] = Area.objects.filter(
+        results['areas'] = Area.objects.for_incident(scope).filter(
             Q(name__icontains=query) |
             Q(address__icontains=query) |
             Q(pincode__icontains=query)
@@ -1608,7 +2105,7 @@ def global_search(request):
         ).select_related('category')[:10]
         
         # Search needs
-        results['needs'] = Need.objects.filter(
+        results['needs'] = Need.objects.for_incident(scope).filter(
             Q(product__name__icontains=query) |
             Q(area__name__icontains=query) |
             Q(notes__icontains=query)
@@ -1625,11 +2122,30 @@ def global_search(request):
 
 
 
+def weather_alerts(request):
+    """Cached weather alerts for a zone, served as JSON with an ETag"""
+    from .weather import allowed_zones, get_alerts, is_valid_zone
+    
+    zone = request.GET.get('zone') or allowed_zones()[0]
+    if not is_valid_zone(zone):
+        return JsonResponse({'error': 'Unknown zone'}, status=400)
+    
+    entry = get_alerts(zone)
+    if request.headers.get('If-None-Match') == entry['etag']:
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(entry['body'], content_type='application/json')
+    response['ETag'] = entry['etag']
+    response['Cache-Control'] = 'public, max-age=60'
+    return response
+
+
 def faq(request):
     """FAQ page"""
     return render(request, 'public/faq.html')
 
 
+@stale_while_revalidate()
 def blog_list(request):
     """List all blog articles"""
     from .models import Article
@@ -1638,6 +2154,7 @@ def blog_list(request):
     return render(request, 'public/blog.html', context)
 
 
+@stale_while_revalidate()
 def blog_detail(request, slug):
     """View a single blog article"""
     from .models import Article
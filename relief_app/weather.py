@@ -0,0 +1,146 @@
+"""
+Weather alert ingestion for Hurricane Heroes
+
+Instead of every visitor's browser calling api.weather.gov, the server
+polls the alert feed per zone (see the poll_weather_alerts command),
+normalizes the alerts and keeps them in the cache. Pages read them from
+the local /weather-alerts/ endpoint.
+
+The feed URL is a setting so the poller can be pointed at a local
+stand-in feed for testing.
+"""
+import hashlib
+import json
+import logging
+import re
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import count_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEED_URL = 'https://api.weather.gov/alerts/active?zone={zone}'
+DEFAULT_ZONES = ['FLC071']
+DEFAULT_TTL = 600
+DEFAULT_FETCH_TIMEOUT = 5
+USER_AGENT = 'HurricaneHeroes/1.0 (weather alert proxy)'
+
+ZONE_RE = re.compile(r'^[A-Z]{2}[CZ]\d{3}$')
+
+
+def allowed_zones():
+    return getattr(settings, 'WEATHER_ALERT_ZONES', DEFAULT_ZONES)
+
+
+def is_valid_zone(zone):
+    return bool(ZONE_RE.match(zone or '')) and zone in allowed_zones()
+
+
+def _cache_key(zone):
+    return f'weather_alerts:{zone}'
+
+
+def normalize_alerts(payload):
+    """Reduce a GeoJSON alert collection to the fields our pages use"""
+    alerts = []
+    for feature in payload.get('features') or []:
+        props = feature.get('properties') or {}
+        alerts.append({
+            'id': props.get('id') or feature.get('id', ''),
+            'event': props.get('event', ''),
+            'headline': props.get('headline') or '',
+            'severity': props.get('severity', ''),
+            'urgency': props.get('urgency', ''),
+            'area': props.get('areaDesc', ''),
+            'effective': props.get('effective'),
+            'expires': props.get('expires'),
+        })
+    return alerts
+
+
+def _make_entry(zone, alerts, upstream_etag=None, upstream_modified=None):
+    body = json.dumps({'zone': zone, 'alerts': alerts}, sort_keys=True, separators=(',', ':'))
+    return {
+        'zone': zone,
+        'alerts': alerts,
+        'body': body,
+        'etag': '"%s"' % hashlib.sha1(body.encode('utf-8')).hexdigest(),
+        'fetched_at': time.time(),
+        'upstream_etag': upstream_etag,
+        'upstream_modified': upstream_modified,
+    }
+
+
+def get_cached_alerts(zone):
+    return cache.get(_cache_key(zone))
+
+
+def refresh_zone(zone, timeout=None):
+    """
+    Fetch one zone from the feed and store the normalized alerts.
+
+    Sends the upstream ETag/Last-Modified back so an unchanged feed costs
+    a 304. On failure the previous entry is kept (stale alerts beat no
+    alerts during a storm) and None is returned.
+    """
+    ttl = getattr(settings, 'WEATHER_ALERTS_TTL', DEFAULT_TTL)
+    url = getattr(settings, 'WEATHER_ALERTS_URL', DEFAULT_FEED_URL).format(zone=zone)
+    timeout = timeout or getattr(settings, 'WEATHER_ALERTS_FETCH_TIMEOUT', DEFAULT_FETCH_TIMEOUT)
+    previous = get_cached_alerts(zone)
+
+    headers = {'User-Agent': USER_AGENT, 'Accept': 'application/geo+json'}
+    if previous and previous.get('upstream_etag'):
+        headers['If-None-Match'] = previous['upstream_etag']
+    if previous and previous.get('upstream_modified'):
+        headers['If-Modified-Since'] = previous['upstream_modified']
+
+    try:
+        req = urllib.request.Request(url, headers=headers)
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            payload = json.loads(response.read())
+            entry = _make_entry(
+                zone,
+                normalize_alerts(payload),
+                upstream_etag=response.headers.get('ETag'),
+                upstream_modified=response.headers.get('Last-Modified'),
+            )
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and previous:
+            entry = dict(previous, fetched_at=time.time())
+        else:
+            logger.warning('Weather alert feed returned %s for zone %s', e.code, zone)
+            return None
+    except Exception as e:
+        logger.warning('Weather alert fetch failed for zone %s: %s', zone, e)
+        return None
+
+    cache.set(_cache_key(zone), entry, ttl)
+    return entry
+
+
+def get_alerts(zone):
+    """
+    Cached alerts for a zone. If nothing is cached (poller not running)
+    one request fetches the feed while concurrent callers get an empty
+    list instead of piling onto the upstream API.
+    """
+    entry = get_cached_alerts(zone)
+    count_cache('weather', entry is not None)
+    if entry is not None:
+        return entry
+    lock_key = f'{_cache_key(zone)}:lock'
+    if cache.add(lock_key, 1, DEFAULT_FETCH_TIMEOUT * 2):
+        try:
+            entry = refresh_zone(zone)
+            if entry is None:
+                # Remember the failure briefly so we don't retry on every request
+                entry = _make_entry(zone, [])
+                cache.set(_cache_key(zone), entry, 60)
+        finally:
+            cache.delete(lock_key)
+    return entry or _make_entry(zone, [])
@@ -12,6 +12,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'relief_system.settings')
+# Serve the async public views (relief_app/async_views.py)
+os.environ.setdefault('ASYNC_PUBLIC_VIEWS', 'True')
+# Event loop workers can hold the dashboards' live update streams open
+os.environ.setdefault('CHANGE_FEED_LIVE', 'True')
 
 application = get_asgi_application()
 
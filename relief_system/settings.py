@@ -37,13 +37,20 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its latency covers the whole middleware stack
+    'relief_app.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # After authentication, so super admins can ask for a profile with X-Profile
+    'relief_app.profiling.ProfilingMiddleware',
+    # After authentication: request.relief_profile, cached in the session
+    'relief_app.roles.ReliefProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'relief_app.ratelimit.RateLimitMiddleware',
 ]
 
 ROOT_URLCONF = 'relief_system.urls'
@@ -76,6 +83,163 @@ DATABASES = {
 }
 
 
+# Cache
+# Local memory is enough for development. Under DJANGO_ENV=production every
+# gunicorn worker must see the same entries (page cache, refresh locks, rate
+# limit counters), so the cache is a file cache there. Set here rather than
+# in settings_production.py, whose values are overridden by this file.
+# Its add() is not atomic, so refresh locks are best effort across workers;
+# point CACHE_REDIS_URL at a Redis server where they must be exact.
+if os.getenv('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_REDIS_URL'),
+        }
+    }
+elif os.getenv('DJANGO_ENV') == 'production':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'cache',
+            # Rate limit counters add a few keys per active client
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'hurricane-heroes',
+        }
+    }
+
+# Stale-while-revalidate page cache for public views (seconds)
+VIEW_CACHE_FRESH_TIMEOUT = 60
+VIEW_CACHE_STALE_TIMEOUT = 600
+VIEW_CACHE_LOCK_TIMEOUT = 30
+VIEW_CACHE_WAIT_TIMEOUT = 5
+
+# Weather alerts (polled by 'manage.py poll_weather_alerts', served from cache)
+WEATHER_ALERTS_URL = os.getenv('WEATHER_ALERTS_URL', 'https://api.weather.gov/alerts/active?zone={zone}')
+WEATHER_ALERT_ZONES = ['FLC071']  # Lee County, FL
+WEATHER_ALERTS_TTL = 600
+WEATHER_ALERTS_FETCH_TIMEOUT = 5
+
+# Public intake spool: form posts are appended to local files and written
+# to the database in batches by 'manage.py drain_intake'. Only enable it
+# with the drainer running, or submissions will wait in the spool.
+INTAKE_SPOOL_ENABLED = os.getenv('INTAKE_SPOOL_ENABLED', 'False') == 'True'
+INTAKE_SPOOL_DIR = BASE_DIR / 'spool'
+INTAKE_SPOOL_FSYNC = False
+
+# Resubmissions of the same need request / volunteer signup within this
+# window are folded into the original (see relief_app/dedup.py)
+DEDUP_WINDOW_HOURS = 24
+
+# Async public read views (relief_app/async_views.py); relief_system/asgi.py
+# turns this on, so the same code base serves both WSGI and ASGI workers
+ASYNC_PUBLIC_VIEWS = os.getenv('ASYNC_PUBLIC_VIEWS', 'False') == 'True'
+
+# Per-client rate limits by URL name (see relief_app/ratelimit.py)
+RATE_LIMIT_ENABLED = True
+RATE_LIMITS = {
+    'public_contact': {'methods': ['POST'], 'rate': '5/m'},
+    'volunteer_signup': {'methods': ['POST'], 'rate': '5/m'},
+    'public_need_request': {'methods': ['POST'], 'rate': '10/m'},
+    'donate': {'methods': ['POST'], 'rate': '10/m'},
+    'global_search': {'methods': ['GET'], 'rate': '30/m'},
+    # A first sync of a large dataset takes a few dozen pages
+    'sync_changes': {'methods': ['GET'], 'rate': '120/m'},
+    'api_list': {'methods': ['GET'], 'rate': '120/m'},
+    'api_detail': {'methods': ['GET'], 'rate': '300/m'},
+}
+# Request header holding the real client IP when behind a proxy. Under
+# DJANGO_ENV=production nginx proxies over gunicorn's unix socket, where
+# REMOTE_ADDR is empty, and passes the address in X-Real-IP
+# (docs/AWS_DEPLOYMENT_GUIDE.md). Never trust a header no proxy overwrites.
+RATE_LIMIT_CLIENT_IP_HEADER = os.getenv('RATE_LIMIT_CLIENT_IP_HEADER') or (
+    'HTTP_X_REAL_IP' if os.getenv('DJANGO_ENV') == 'production' else None
+)
+
+# Opt-in request profiling: requests with an X-Profile header (super admins,
+# or PROFILING_SECRET as the value) plus a random sample are profiled and
+# shown on the Request Profiles page
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_SECRET = os.getenv('PROFILING_SECRET') or None
+PROFILING_CPROFILE = True
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_MAX_FILE_BYTES = 2 * 1024 * 1024
+
+# Prometheus metrics at /metrics/ (relief_app/metrics.py). Each worker
+# writes its values to METRICS_DIR; the endpoint adds them up.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_DIR = BASE_DIR / 'metrics'
+METRICS_FLUSH_INTERVAL = 5
+# Scrapers allowed without the token, matched against the same client
+# address as rate limiting: behind nginx that is X-Real-IP (see
+# RATE_LIMIT_CLIENT_IP_HEADER), so a scraper on the host itself matches
+# 127.0.0.1. Without a client address only the token gets in.
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_TOKEN = os.getenv('METRICS_TOKEN') or None
+
+# Slow-query log (relief_app/slowqueries.py); report with 'manage.py slow_query_report'
+SLOW_QUERY_LOG_ENABLED = True
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_EXPLAIN = True
+SLOW_QUERY_LOG_DIR = BASE_DIR / 'slow_queries'
+
+# Change feed streamed to dashboards (relief_app/changefeed.py); prune old
+# events with 'manage.py prune_change_feed'
+CHANGE_FEED_ENABLED = True
+# Dashboards open the stream only where the server can hold it open: ASGI
+# (relief_system/asgi.py turns this on) or gunicorn gthread workers
+# (GUNICORN_THREADS in gunicorn_config.py). Gunicorn's sync workers would
+# be tied up by each open dashboard and killed at their 30s timeout.
+CHANGE_FEED_LIVE = os.getenv('CHANGE_FEED_LIVE', 'False') == 'True'
+CHANGE_FEED_POLL_SECONDS = 1
+CHANGE_FEED_HEARTBEAT_SECONDS = 15
+# Each open stream holds a worker thread; the browser reconnects after this
+CHANGE_FEED_MAX_STREAM_SECONDS = 300
+CHANGE_FEED_REPLAY_LIMIT = 1000
+CHANGE_FEED_RETENTION_DAYS = 7
+
+# Delta sync API for offline clients (relief_app/sync.py); expire old
+# tombstones with 'manage.py compact_tombstones'
+SYNC_BATCH_SIZE = 5000
+# Changes newer than this are left to the next sync, so rows from
+# transactions still committing are never skipped
+SYNC_COMMIT_LAG_SECONDS = 5
+# Clients that last synced before this get a full snapshot
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+# Read-only JSON API at /api/v1/ (relief_app/api.py)
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+
+# JSON encoding for the API, sync, map and chart responses
+# (relief_app/serializers.py): 'auto' uses orjson when it is installed
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+
+# Trend charts read hourly/daily rollups (relief_app/rollups.py); rebuild
+# them with 'manage.py backfill_rollups'. Most buckets one chart may ask for
+TRENDS_MAX_BUCKETS = 2000
+
+# Fulfilled and cancelled needs unchanged for this long are moved to the
+# archive table by 'manage.py archive_needs' (relief_app/archive.py)
+NEED_ARCHIVE_AFTER_DAYS = 90
+NEED_ARCHIVE_BATCH_SIZE = 1000
+
+# Pages show the active incidents' data (relief_app/incidents.py); the
+# incident list they scope by is cached this long
+INCIDENT_CACHE_TIMEOUT = 300
+
+# Sessions keep the user's role and shelter (relief_app/roles.py), resolved
+# again after AreaAdmin or Area changes or at the latest after this long
+RELIEF_PROFILE_TIMEOUT = 300
+
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -108,6 +108,9 @@ LOGGING = {
 LOGS_DIR = BASE_DIR / 'logs'
 LOGS_DIR.mkdir(exist_ok=True)
 
+# Slow-query records next to the other logs (see relief_app/slowqueries.py)
+SLOW_QUERY_LOG_DIR = LOGS_DIR / 'slow_queries'
+
 # Email Configuration (for production)
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
@@ -117,13 +120,10 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@hurricaneheroes.org')
 
-# Cache Configuration (optional, for better performance)
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-#         'LOCATION': 'redis://127.0.0.1:6379/1',
-#     }
-# }
+# Cache Configuration
+# The shared cache and the client IP header nginx sets are chosen in
+# settings.py (DJANGO_ENV=production), since settings.py overrides what is
+# set here.
 
 # Session Configuration
 SESSION_COOKIE_AGE = 86400  # 24 hours